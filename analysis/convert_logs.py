@@ -0,0 +1,54 @@
+"""
+Convert SensorTile logs between binary session logs ('.stlog') and the CSV
+layout used by the analysis notebooks. The direction of the conversion is
+determined by the extension of each input file, e.g.:
+
+    python analysis/convert_logs.py renders/A_dorian_bpm100_00_motion.stlog
+    python analysis/convert_logs.py analysis/renderExamples/*_motion.csv
+"""
+
+# Python Libraries
+import argparse
+import os
+import sys
+
+# Local Files
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             '..', 'lib'))
+import session_log
+
+
+def convert(in_path: str, out_folder: str = None) -> str:
+    """
+    Convert a log file, writing the result next to it (or into out_folder).
+    Returns the path of the converted file.
+    """
+    base, extension = os.path.splitext(in_path)
+    if out_folder:
+        base = os.path.join(out_folder, os.path.basename(base))
+
+    if extension == session_log.EXTENSION:
+        out_path = base + '.csv'
+        count = session_log.export_csv(in_path, out_path)
+    else:
+        out_path = base + session_log.EXTENSION
+        count = session_log.import_csv(in_path, out_path)
+
+    print(f"\t{in_path} -> {out_path} ({count} records)")
+    return out_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert between binary session logs and CSV logs."
+    )
+    parser.add_argument('paths', nargs='+', help="Log files to convert.")
+    parser.add_argument('-o', '--out_folder', type=str, default=None,
+                        help="Folder for converted files.")
+    args = parser.parse_args()
+
+    if args.out_folder and not os.path.exists(args.out_folder):
+        os.makedirs(args.out_folder)
+
+    for path in args.paths:
+        convert(path, args.out_folder)
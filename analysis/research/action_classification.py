@@ -12,6 +12,11 @@ from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import LSTM, Dense
 from tensorflow.keras.callbacks import TensorBoard
 import argparse
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, os.pardir, 'lib'))
+from ring_buffer import WindowRing
 
 
 '''
@@ -226,7 +231,9 @@ def prob_viz(res, actions, input_frame, colors):
 
 
 def test_in_real_time(model, actions):
-    sequence = []
+    # Last frames of keypoints (both hands), viewed as a (frames, 126) array
+    # without rebuilding it every frame.
+    sequence = WindowRing(sequence_length, 2 * 21 * 3)
     sentence = []
     threshold = 0.5
     predictions = []
@@ -247,10 +254,9 @@ def test_in_real_time(model, actions):
             # 2. Prediction logic
             keypoints = extract_keypoints(results)
             sequence.append(keypoints)
-            sequence = sequence[-30:]
 
-            if len(sequence) == 30:
-                res = model.predict(np.expand_dims(sequence, axis=0))[0]
+            if sequence.full:
+                res = model.predict(sequence.window()[np.newaxis])[0]
                 print(actions[np.argmax(res)])
                 predictions.append(np.argmax(res))
 
@@ -0,0 +1,98 @@
+"""
+Synth parameter updates sent and suppressed by the tolerances of the
+mappings (see param_binding.py and ST_MAPPINGS in constants.py), while the
+ST moves and while it rests.
+
+The mappings are applied once per pulse, to the latest motion sample of a
+synthetic moving session, and of a resting ST whose accelerometer only
+measures noise. The synth is a stand-in (see common.py), so the time per
+tick does not include the pyo calls that are saved. Every parameter is
+checked to stay within its tolerance of its exact value.
+"""
+
+# Python Libraries
+import argparse
+import time
+
+# Third-Party Libraries
+import numpy as np
+
+# Local Files
+from common import NoSynth, report
+from constants import ST_MAPPINGS, ST_SETTINGS
+from param_mapping import ParameterMapper
+from st_simulator import ReplayStream
+
+
+def resting(count: int, noise: float = 5.0, seed: int = 0) -> np.ndarray:
+    """
+    (r, theta, phi) of a resting ST tilted by 30 degrees, with noise in mg
+    on every accelerometer axis.
+    """
+    rng = np.random.default_rng(seed)
+    tilt = np.radians(30)
+    acc = np.array([1000 * np.sin(tilt), 0.0, 1000 * np.cos(tilt)]) \
+        + rng.normal(0, noise, (count, 3))
+    r = np.sqrt((acc ** 2).sum(axis=1))
+    theta = np.degrees(np.arccos(acc[:, 2] / r))
+    phi = np.degrees(np.arctan2(acc[:, 1], acc[:, 2]))
+    return np.column_stack([r, theta, phi])
+
+
+def run(rows: np.ndarray) -> None:
+    """ Apply the mappings to every row, and report their updates. """
+    exact = ParameterMapper(ST_MAPPINGS, NoSynth(), ST_SETTINGS)
+    mapper = ParameterMapper(ST_MAPPINGS, NoSynth(), ST_SETTINGS)
+    values = {}
+    # Largest difference between a parameter and its exact value, as a
+    # fraction of its tolerance.
+    worst = np.zeros(len(mapper.specs))
+    tolerances = [spec.tolerance for spec in mapper.specs]
+    durations = np.empty(len(rows))
+    clock = time.perf_counter
+    for i, (r, theta, phi) in enumerate(rows.tolist()):
+        values["r"], values["theta"], values["phi"] = r, theta, phi
+        start = clock()
+        mapper.apply(values)
+        durations[i] = clock() - start
+
+        for j, (value, binding, spec) in enumerate(zip(
+                exact.evaluate(values), mapper.bindings, mapper.specs)):
+            limit = tolerances[j] * abs(binding.last) if spec.relative \
+                else tolerances[j]
+            if limit:
+                worst[j] = max(worst[j], abs(binding.last - value) / limit)
+
+    assert (worst <= 1 + 1e-9).all(), worst
+    print(mapper.report())
+    sent = sum(binding.sent for binding in mapper.bindings)
+    total = sent + sum(binding.suppressed for binding in mapper.bindings)
+    print(f"\t{sent} of {total} updates sent, every parameter within its "
+          "tolerance")
+    report("mapping per tick", durations)
+
+
+def main() -> None:
+    """ Report the updates of a moving and a resting ST. """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-s', '--seconds', type=float, default=600,
+                        help="Duration of every session.")
+    parser.add_argument('-p', '--pulse', type=float, default=0.15,
+                        help="Seconds between pulses of the synth.")
+    args = parser.parse_args()
+
+    step = max(1, round(args.pulse * 100))
+    stream = ReplayStream.synthetic('motion', args.seconds)
+    moving = np.column_stack([
+        stream.columns[name] for name in ('r', 'theta', 'phi')
+    ])[::step]
+    still = resting(len(moving))
+
+    print(f"\nMoving ST, {len(moving)} pulses")
+    run(moving)
+    print(f"\nResting ST, {len(still)} pulses")
+    run(still)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Throughput of decoding SensorTile notifications one packet at a time and
+in NumPy blocks from a PacketRing, and a check that both paths produce
+bit-for-bit identical values.
+"""
+
+# Python Libraries
+import argparse
+import time
+
+# Third-Party Libraries
+import numpy as np
+
+# Local Files
+import common  # noqa: F401 (sets up the import path)
+from bench_decode import packets
+from st_decode import decode_motion, decode_motion_block, \
+    decode_quaternions, decode_quaternions_block, MOTION_FORMAT, \
+    PacketRing, QUATERNIONS_FORMAT
+
+
+def block_decode(data, packet_size: int, decode, block_size: int):
+    """
+    Append every packet to a ring, decoding a block each block_size
+    packets. Returns the decoded columns of every block.
+    """
+    ring = PacketRing(packet_size, block_size)
+    blocks = []
+    for index, packet in enumerate(data, 1):
+        ring.append(packet)
+        if index % block_size == 0:
+            blocks.append(decode(ring.take()))
+    if len(ring):
+        blocks.append(decode(ring.take()))
+    return blocks
+
+
+def columns_of(blocks) -> dict:
+    """ Concatenate the columns of decoded blocks. """
+    return {
+        name: np.concatenate([block[name] for block in blocks])
+        for name in blocks[0]
+    }
+
+
+def compare(label: str, per_packet: list, block: dict, seconds: tuple) -> None:
+    """ Print throughput and the number of values that differ. """
+    count = len(per_packet)
+    mismatches = 0
+    for name, column in block.items():
+        if name == 'ticks':
+            values = np.array([packet[0] for packet in per_packet])
+        else:
+            values = np.array([packet[1][name] for packet in per_packet])
+        mismatches += int(np.sum(
+            (values != column) & ~(np.isnan(values) & np.isnan(column))
+            if values.dtype.kind == 'f' else values != column
+        ))
+    print(f"\n{label} ({count} packets)")
+    print(f"\tper-packet {count / seconds[0]:12.0f} packets/s | "
+          f"block {count / seconds[1]:12.0f} packets/s | "
+          f"speedup {seconds[0] / seconds[1]:.1f}x | "
+          f"mismatched values {mismatches}")
+
+
+def main() -> None:
+    """ Decode the same packets with both paths. """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-n', '--packets', type=int, default=1000000,
+                        help="Number of packets per stream.")
+    parser.add_argument('-b', '--block_size', type=int, default=4096,
+                        help="Packets per decoded block.")
+    args = parser.parse_args()
+
+    motion, quaternions = packets(args.packets)
+    clock = time.perf_counter
+
+    start = clock()
+    per_packet = [decode_motion(data) for data in motion]
+    scalar_time = clock() - start
+    start = clock()
+    blocks = block_decode(motion, MOTION_FORMAT.size,
+                          decode_motion_block, args.block_size)
+    block_time = clock() - start
+    compare("motion", per_packet, columns_of(blocks),
+            (scalar_time, block_time))
+
+    start = clock()
+    quat_w, per_packet = 1, []
+    for data in quaternions:
+        time_stamp, values, quat_w = decode_quaternions(data, quat_w)
+        per_packet.append((time_stamp, values))
+    scalar_time = clock() - start
+
+    state = {'quat_w': 1}
+
+    def decode(block):
+        columns, state['quat_w'] = \
+            decode_quaternions_block(block, state['quat_w'])
+        return columns
+
+    start = clock()
+    blocks = block_decode(quaternions, QUATERNIONS_FORMAT.size,
+                          decode, args.block_size)
+    block_time = clock() - start
+    compare("quaternions", per_packet, columns_of(blocks),
+            (scalar_time, block_time))
+
+
+if __name__ == "__main__":
+    main()
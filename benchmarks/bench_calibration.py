@@ -0,0 +1,130 @@
+"""
+Accuracy and cost of the auto-calibration of ST mapping ranges (see
+st_calibration.py).
+
+The histogram estimates of the calibrated percentiles of a synthetic motion
+session, updated in blocks, are compared to the exact percentiles. Costs
+are measured on the notification callback, with and without the packet
+ring that buffers the notifications for calibration, and on the block
+updates of the calibrator in the performance loop.
+"""
+
+# Python Libraries
+import argparse
+import asyncio
+import time
+from typing import Tuple
+
+# Third-Party Libraries
+import numpy as np
+
+# Local Files
+from common import report
+from constants import ST_CALIBRATION_BINS, ST_CALIBRATION_RANGES, \
+    ST_CALIBRATION_SETTINGS, ST_HANDLES, ST_SETTINGS
+from st_ble import SensorTile
+from st_calibration import RangeCalibrator
+from st_simulator import ReplayStream
+
+
+class _NoClient:
+    """ Stand-in for the BleakClient, which only accepts registrations. """
+
+    async def start_notify(self, char, callback) -> None:
+        pass
+
+
+def motion_tile(rings: bool) -> SensorTile:
+    """ SensorTile receiving motion, optionally buffering the packets. """
+    tile = SensorTile("00:00:00:00:00:00")
+    tile.client = _NoClient()
+    asyncio.run(tile.start_notification(ST_HANDLES['motion']))
+    if rings:
+        tile.enable_packet_rings(('motion',))
+    return tile
+
+
+def callback_times(packets, repeat: int = 9) -> Tuple[float, float]:
+    """
+    Mean time of the motion notification callback without and with the
+    packet ring, in the fastest of a few runs over every packet. Runs
+    alternate between both, so that they see the same machine load.
+    """
+    handle = ST_HANDLES['motion']
+    best = [np.inf, np.inf]
+    for _ in range(repeat):
+        for rings in (False, True):
+            callback = motion_tile(rings)._notification_callback
+            start = time.perf_counter()
+            for packet in packets:
+                callback(handle, packet)
+            best[rings] = min(best[rings], time.perf_counter() - start)
+    return best[0] / len(packets), best[1] / len(packets)
+
+
+def update_times(packets, block: int) -> np.ndarray:
+    """
+    Time the loop work of the calibration: taking a block of buffered
+    notifications every block packets, and updating the calibrator.
+    """
+    tile = motion_tile(True)
+    calibrator = RangeCalibrator(
+        ST_CALIBRATION_RANGES, ST_SETTINGS, ST_CALIBRATION_BINS, warmup=0
+    )
+    handle = ST_HANDLES['motion']
+    callback = tile._notification_callback
+    clock = time.perf_counter
+    durations = []
+    for i, packet in enumerate(packets):
+        callback(handle, packet)
+        if (i + 1) % block == 0:
+            start = clock()
+            calibrator.update_block(tile.take_block('motion'))
+            durations.append(clock() - start)
+    return np.array(durations)
+
+
+def main() -> None:
+    """ Compare the estimates to the exact percentiles, and time them. """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-s', '--seconds', type=float, default=600,
+                        help="Duration of the synthetic session.")
+    parser.add_argument('-b', '--block', type=int, default=4,
+                        help="Notifications per loop iteration.")
+    args = parser.parse_args()
+
+    stream = ReplayStream.synthetic('motion', args.seconds)
+    low, high = ST_CALIBRATION_SETTINGS["low"], ST_CALIBRATION_SETTINGS["high"]
+    calibrator = RangeCalibrator(
+        ST_CALIBRATION_RANGES, ST_SETTINGS, ST_CALIBRATION_BINS, low, high,
+        warmup=0
+    )
+    for start in range(0, len(stream), args.block):
+        calibrator.update_block({
+            field: stream.columns[field][start:start + args.block]
+            for field in ST_CALIBRATION_RANGES
+        })
+    calibrator._set_ranges()
+
+    print(f"\n{len(stream)} motion samples, percentiles {low} and {high}")
+    for field, (low_key, high_key) in ST_CALIBRATION_RANGES.items():
+        values = stream.columns[field]
+        exact = np.nanpercentile(values, (low * 100, high * 100))
+        spread = np.nanmax(values) - np.nanmin(values)
+        estimate = (calibrator.settings[low_key], calibrator.settings[high_key])
+        errors = np.abs(np.subtract(estimate, exact)) / spread * 100
+        print(f"\t{field:<6} exact {exact[0]:9.2f} to {exact[1]:9.2f} | "
+              f"estimate {estimate[0]:9.2f} to {estimate[1]:9.2f} | "
+              f"error {errors.max():.2f}% of the value range")
+
+    packets = stream.packets
+    without, with_rings = callback_times(packets)
+    print(f"\nMotion callback: {without * 1e6:.2f} us, "
+          f"{with_rings * 1e6:.2f} us with the packet ring "
+          f"(+{(with_rings - without) * 1e9:.0f} ns, "
+          f"+{(with_rings / without - 1) * 100:.0f}%)")
+    report(f"loop update per {args.block} samples", update_times(
+        packets, args.block))
+
+if __name__ == "__main__":
+    main()
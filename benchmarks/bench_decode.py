@@ -0,0 +1,160 @@
+"""
+Per-packet cost of decoding SensorTile motion and quaternion notifications
+with the previous NumPy scalar implementation and with st_decode, and a
+check that both produce the same values: identical motion values, and
+quaternion values within 0.01, which counts the rounding ties separately
+(see st_decode.py).
+"""
+
+# Python Libraries
+import argparse
+import math
+from struct import pack, unpack_from
+import time
+
+# Third-Party Libraries
+import numpy as np
+
+# Local Files
+import common  # noqa: F401 (sets up the import path)
+from st_decode import decode_motion, decode_quaternions
+
+
+def legacy_motion(data: bytearray):
+    """ Previous SensorTile._motion_callback decoding. """
+    motion_data = {}
+    result = unpack_from('<hhhhhhhhhh', data)
+    time_stamp = result[0]
+    motion_data['acc_x'] = result[1]
+    motion_data['acc_y'] = result[2]
+    motion_data['acc_z'] = result[3]
+    motion_data['gyr_x'] = result[4] * 100
+    motion_data['gyr_y'] = result[5] * 100
+    motion_data['gyr_z'] = result[6] * 100
+    motion_data['mag_x'] = result[7]
+    motion_data['mag_y'] = result[8]
+    motion_data['mag_z'] = result[9]
+    motion_data['r'] = np.round(
+        np.sqrt(np.dot(result[1:4], result[1:4])), 2)
+    motion_data['theta'] = np.round(
+        np.degrees(np.arccos(motion_data['acc_z'] / motion_data['r'])), 2)
+    motion_data['phi'] = np.round(
+        np.degrees(np.arctan2(motion_data['acc_y'], motion_data['acc_z'])), 2)
+    return time_stamp, motion_data
+
+
+def legacy_quaternions(data: bytearray, quat_w: float):
+    """ Previous SensorTile._quaternions_callback decoding. """
+    quat_data = {}
+    result = unpack_from('<hhhh', data)
+    time_stamp = result[0]
+    quat_data['raw_i'] = result[1]
+    quat_data['raw_j'] = result[2]
+    quat_data['raw_k'] = result[3]
+    norm = np.sqrt(np.dot(result[1:], result[1:]))
+    vec_q = list(i / norm for i in result[1:]) \
+        if norm > 0 else list(result[1:])
+    quat = [quat_w] + vec_q
+    norm = np.sqrt(np.dot(quat, quat))
+    quat = list(i / norm for i in quat)
+    quat_data['norm_w'] = np.round(quat[0], 2)
+    quat_data['norm_i'] = np.round(quat[1], 2)
+    quat_data['norm_j'] = np.round(quat[2], 2)
+    quat_data['norm_k'] = np.round(quat[3], 2)
+    quat_data['roll'] = np.round(np.degrees(np.arctan2(
+        2 * (quat[0] * quat[1] + quat[2] * quat[3]),
+        1 - 2 * (quat[1] ** 2 + quat[2] ** 2))), 2)
+    pitch = 2 * (quat[0] * quat[2] - quat[1] * quat[3])
+    if pitch > 1:
+        quat_data['pitch'] = np.round(np.degrees(np.arcsin(1)), 2)
+    elif pitch < -1:
+        quat_data['pitch'] = np.round(np.degrees(np.arcsin(-1)), 2)
+    else:
+        quat_data['pitch'] = np.round(np.degrees(np.arcsin(pitch)), 2)
+    quat_data['yaw'] = np.round(np.degrees(np.arctan2(
+        2 * (quat[0] * quat[3] + quat[1] * quat[2]),
+        1 - 2 * (quat[2] ** 2 + quat[3] ** 2))), 2)
+    return time_stamp, quat_data, quat[0]
+
+
+def packets(count: int, seed: int = 0):
+    """ Random motion and quaternion payloads. """
+    rng = np.random.default_rng(seed)
+    motion = rng.integers(-2000, 2000, size=(count, 10))
+    quaternions = rng.integers(-10000, 10000, size=(count, 4))
+    # Include still and null readings.
+    motion[::97, 1:3] = 0
+    quaternions[::89, 1:] = 0
+    return (
+        [bytearray(pack('<10h', *row)) for row in motion],
+        [bytearray(pack('<4h', *row)) for row in quaternions],
+    )
+
+
+def same(first: dict, second: dict, tolerance: float = 0.0) -> bool:
+    """
+    Compare decoded values, treating NaN as equal, and values that differ
+    by up to tolerance as equal.
+    """
+    return all(
+        abs(first[key] - second[key]) <= tolerance
+        or (math.isnan(first[key]) and math.isnan(second[key]))
+        for key in first
+    )
+
+
+def main() -> None:
+    """ Time and compare both implementations. """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-n', '--packets', type=int, default=200000,
+                        help="Number of packets per stream.")
+    args = parser.parse_args()
+
+    motion, quaternions = packets(args.packets)
+    clock = time.perf_counter
+
+    with np.errstate(all='ignore'):
+        start = clock()
+        legacy = [legacy_motion(data) for data in motion]
+        legacy_time = clock() - start
+    start = clock()
+    fast = [decode_motion(data) for data in motion]
+    fast_time = clock() - start
+    mismatches = sum(
+        a[0] != b[0] or not same(a[1], b[1]) for a, b in zip(legacy, fast)
+    )
+    print(f"\nmotion ({args.packets} packets)")
+    print(f"\tlegacy {legacy_time / args.packets * 1e6:7.2f} us/packet | "
+          f"st_decode {fast_time / args.packets * 1e6:7.2f} us/packet | "
+          f"speedup {legacy_time / fast_time:.1f}x | "
+          f"mismatches {mismatches}")
+
+    with np.errstate(all='ignore'):
+        start = clock()
+        quat_w, legacy = 1, []
+        for data in quaternions:
+            time_stamp, values, quat_w = legacy_quaternions(data, quat_w)
+            legacy.append((time_stamp, values))
+        legacy_time = clock() - start
+    start = clock()
+    quat_w, fast = 1, []
+    for data in quaternions:
+        time_stamp, values, quat_w = decode_quaternions(data, quat_w)
+        fast.append((time_stamp, values))
+    fast_time = clock() - start
+    # The norms are not summed in the order of np.dot (see st_decode.py),
+    # so rounded values may differ by one step of 0.01 at rounding ties.
+    ties = sum(not same(a[1], b[1]) for a, b in zip(legacy, fast))
+    mismatches = sum(
+        a[0] != b[0] or not same(a[1], b[1], 0.01 + 1e-9)
+        for a, b in zip(legacy, fast)
+    )
+    print(f"\nquaternions ({args.packets} packets)")
+    print(f"\tlegacy {legacy_time / args.packets * 1e6:7.2f} us/packet | "
+          f"st_decode {fast_time / args.packets * 1e6:7.2f} us/packet | "
+          f"speedup {legacy_time / fast_time:.1f}x | "
+          f"mismatches {mismatches} | rounding ties {ties}")
+
+
+if __name__ == "__main__":
+    main()
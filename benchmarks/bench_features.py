@@ -0,0 +1,115 @@
+"""
+Cost and consistency of the incremental motion features (see
+st_features.py).
+
+A synthetic motion session, with a few gaps of dropped notifications, is fed
+sample by sample to a MotionFeatures extractor, as the motion notification
+callback does. Its features are compared to the batch features of the whole
+session, and its cost per sample to recomputing the features from a list of
+the latest samples, as a loop would without the extractor.
+"""
+
+# Python Libraries
+import argparse
+from collections import deque
+import math
+import time
+
+# Third-Party Libraries
+import numpy as np
+
+# Local Files
+from common import report
+from constants import ST_FEATURE_SETTINGS, ST_TICK_PERIOD
+from st_features import MotionFeatures
+from st_simulator import ReplayStream
+
+
+def with_gaps(stream: ReplayStream, gaps: int, seed: int = 0) -> ReplayStream:
+    """ Stream without a few runs of 5 to 50 notifications. """
+    rng = np.random.default_rng(seed)
+    keep = np.ones(len(stream), dtype=bool)
+    for start in rng.integers(0, len(stream) - 50, gaps):
+        keep[start:start + rng.integers(5, 50)] = False
+    return ReplayStream(stream.stream, stream.words[keep], {
+        name: column[keep] for name, column in stream.columns.items()
+    })
+
+
+def naive(window: deque) -> tuple:
+    """
+    Features recomputed from the latest samples, with the nominal interval
+    of the extractor.
+    """
+    interval = 0.01
+    samples = list(window)
+    jerks = [
+        math.sqrt((b.acc_x - a.acc_x) ** 2 + (b.acc_y - a.acc_y) ** 2
+                  + (b.acc_z - a.acc_z) ** 2) / interval
+        for a, b in zip(samples, samples[1:])
+    ]
+    jerk = math.sqrt(sum(j * j for j in jerks) / len(jerks)) if jerks else 0.0
+    radii = [sample.r for sample in samples[-(window.maxlen - 1):]]
+    mean = sum(radii) / len(radii)
+    energy = math.sqrt(sum((r - mean) ** 2 for r in radii) / len(radii))
+    last = samples[-1]
+    angular_velocity = math.sqrt(
+        last.gyr_x ** 2 + last.gyr_y ** 2 + last.gyr_z ** 2) / 1000
+    tilt_rate = (last.theta - samples[-2].theta) / interval \
+        if len(samples) > 1 else 0.0
+    return jerk, energy, angular_velocity, tilt_rate
+
+
+def main() -> None:
+    """ Compare the streaming and batch features, and time them. """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-s', '--seconds', type=float, default=600,
+                        help="Duration of the synthetic session.")
+    parser.add_argument('-g', '--gaps', type=int, default=20,
+                        help="Runs of dropped notifications.")
+    args = parser.parse_args()
+
+    stream = with_gaps(ReplayStream.synthetic('motion', args.seconds),
+                       args.gaps)
+    times = (stream.ticks * ST_TICK_PERIOD).tolist()
+    samples = [sample for _, sample in stream.samples]
+
+    features = MotionFeatures(**ST_FEATURE_SETTINGS)
+    streamed = np.empty((len(samples), len(features)))
+    clock = time.perf_counter
+    durations = np.empty(len(samples))
+    for i, (sample, device_time) in enumerate(zip(samples, times)):
+        start = clock()
+        features.update(sample, device_time)
+        durations[i] = clock() - start
+        streamed[i] = [features[name] for name in features]
+
+    start = clock()
+    batch = MotionFeatures(**ST_FEATURE_SETTINGS).batch(
+        stream.columns, stream.ticks * ST_TICK_PERIOD)
+    batch_time = clock() - start
+
+    print(f"\n{len(samples)} motion samples, windows of {features.size} "
+          f"samples, batch features in {batch_time * 1e3:.1f} ms")
+    for column, name in enumerate(features):
+        difference = np.abs(streamed[:, column] - batch[name])
+        scale = max(np.abs(batch[name]).max(), 1e-12)
+        print(f"\t{name:<16} max {scale:12.2f} | streaming vs batch max "
+              f"difference {difference.max() / scale:.1e} of the maximum")
+
+    report("incremental update per sample", durations)
+
+    # Recomputing the features every sample from the list of the latest
+    # samples, over the same window.
+    window = deque(maxlen=features.size + 1)
+    durations = np.empty(len(samples))
+    for i, sample in enumerate(samples):
+        start = clock()
+        window.append(sample)
+        naive(window)
+        durations[i] = clock() - start
+    report("recomputation from a list per sample", durations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Per-sample cost of the smoothing filters of st_filters.py, and how much
+they reduce distinct parameter updates of the motion values mapped to the
+synth, over a synthetic session at 100Hz (or the given motion logs).
+The batch variant is timed as well, and checked against the streaming one.
+"""
+
+# Python Libraries
+import argparse
+import time
+
+# Third-Party Libraries
+import numpy as np
+
+# Local Files
+import common  # noqa: F401 (sets up the import path)
+from constants import ST_FILTER_RESOLUTION, ST_FILTER_SETTINGS, \
+    ST_TICK_PERIOD
+from st_filters import FilterStage, FILTERS, make_filter
+from st_simulator import ReplayStream
+
+
+FIELDS = ('r', 'theta', 'phi')
+
+
+def main() -> None:
+    """ Run every filter over the same samples. """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('logs', nargs='*', help="Motion logs to filter.")
+    parser.add_argument('-s', '--seconds', type=float, default=600,
+                        help="Duration of the synthetic session.")
+    args = parser.parse_args()
+
+    streams = [ReplayStream.from_log(path) for path in args.logs] \
+        or [ReplayStream.synthetic('motion', args.seconds)]
+    samples = [sample for stream in streams for _, sample in stream.samples]
+    times = np.concatenate([
+        stream.ticks * ST_TICK_PERIOD for stream in streams
+    ])
+    values = np.column_stack([
+        np.concatenate([stream.columns[field] for stream in streams])
+        for field in FIELDS
+    ]).astype(np.float64)
+    resolution = [ST_FILTER_RESOLUTION[field] for field in FIELDS]
+    print(f"\n{len(samples)} motion samples, resolution "
+          + ", ".join(f"{f} {r}" for f, r in zip(FIELDS, resolution)))
+
+    clock = time.perf_counter
+    for name in FILTERS:
+        stage = FilterStage(
+            FIELDS, make_filter(name, len(FIELDS), **ST_FILTER_SETTINGS[name]),
+            resolution
+        )
+        streamed = np.empty_like(values)
+        start = clock()
+        for i, (sample, sample_time) in enumerate(
+                zip(samples, times.tolist())):
+            streamed[i] = stage.update(sample, sample_time)
+        stream_time = clock() - start
+
+        smoothing = make_filter(name, len(FIELDS), **ST_FILTER_SETTINGS[name])
+        start = clock()
+        batch = smoothing.batch(values, times)
+        batch_time = clock() - start
+
+        raw, filtered = sum(stage.raw_updates), sum(stage.filtered_updates)
+        print(f"\n{name}")
+        print(f"\tstreaming {stream_time / len(samples) * 1e6:6.2f} us/sample"
+              f" | batch {batch_time / len(samples) * 1e6:6.2f} us/sample"
+              f" | batch matches streaming: "
+              f"{np.array_equal(batch, streamed, equal_nan=True)}")
+        print(f"\tdistinct updates {raw} -> {filtered} "
+              f"({(1 - filtered / raw) * 100:.1f}% fewer)")
+        print(f"\t{stage.report()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Age of the ST motion samples used by the performance loop, with the
+SensorTile running in the main process or in an ingestion process (see
+st_ingest.py), under a simulated CPU load.
+
+A synthetic session is replayed in real time by a simulated SensorTile,
+scheduled to start at a known time.monotonic() value, so that the age of
+every consumed sample is measured from the time its notification was due.
+The consumer mimics the performance loop: it retrieves the latest motion
+sample, renders a frame (a busy loop holding the GIL), and sleeps until the
+next pulse. Optional threads hold the GIL in the background, like the
+Python parts of the CV thread.
+"""
+
+# Python Libraries
+import argparse
+import asyncio
+import threading
+import time
+
+# Third-Party Libraries
+import numpy as np
+
+# Local Files
+from common import report
+from constants import ST_HANDLES, ST_TICK_PERIOD
+from st_clock import TickUnwrapper
+from st_ingest import RemoteSensorTile
+from st_simulator import ReplayStream, SimulatedSensorTile
+
+
+def busy(seconds: float) -> None:
+    """ Hold the GIL for a given time, like pure Python frame processing. """
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        for value in range(200):
+            total += value * value
+
+
+def spin(stop: threading.Event) -> None:
+    """ Background thread competing for the GIL. """
+    while not stop.is_set():
+        busy(0.05)
+
+
+async def run(streams, remote: bool, seconds: float, pulse: float,
+              load: float, threads: int, delay: float = 5.0) -> dict:
+    """
+    Consume motion samples for seconds, once per pulse. Returns the ages of
+    the consumed samples, and the delivery latency of the motion stream.
+    """
+    start = time.monotonic() + delay
+    replay = {"streams": streams, "speed": 1, "start_time": start}
+    tile = RemoteSensorTile("SIMULATED", replay=replay) if remote \
+        else SimulatedSensorTile(**replay)
+    await tile.ble_connect()
+    for stream in streams:
+        await tile.start_notification(ST_HANDLES[stream.stream])
+
+    motion = next(stream for stream in streams if stream.stream == "motion")
+    unwrapper = TickUnwrapper()
+    unwrapper.last = int(motion.ticks[0])
+
+    stop = threading.Event()
+    workers = [threading.Thread(target=spin, args=(stop,), daemon=True)
+               for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+
+    await asyncio.sleep(max(0.0, start - time.monotonic()))
+    ages = []
+    while time.monotonic() < start + seconds:
+        sample = await tile.motion_data.get()
+        now = time.monotonic()
+        due = start + (unwrapper.unwrap(sample[0]) - motion.ticks[0]) \
+            * ST_TICK_PERIOD
+        ages.append(now - due)
+        busy(load)
+        await asyncio.sleep(pulse)
+
+    stop.set()
+    for worker in workers:
+        worker.join()
+    latency = tile.clocks[ST_HANDLES["motion"]].latency
+    if remote:
+        await tile.ble_disconnect()
+    else:
+        tile.closing = True
+        await tile.client.disconnect()
+    return {"ages": np.array(ages), "latency": latency}
+
+
+def main() -> None:
+    """ Compare both paths with and without load. """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-s', '--seconds', type=float, default=20,
+                        help="Duration of every run.")
+    parser.add_argument('-p', '--pulse', type=float, default=0.0375,
+                        help="Sleep of the loop between frames (the synth "
+                             "pulse rate at 100 BPM in 16ths).")
+    parser.add_argument('-l', '--load', type=float, default=0.02,
+                        help="Frame time holding the GIL in the loop.")
+    parser.add_argument('-t', '--threads', type=int, default=1,
+                        help="Background threads holding the GIL.")
+    args = parser.parse_args()
+
+    streams = [
+        ReplayStream.synthetic(stream, args.seconds + 10, seed=seed)
+        for seed, stream in enumerate(ST_HANDLES)
+    ]
+    for load, threads in ((0.0, 0), (args.load, args.threads)):
+        print(f"\nFrame load {load * 1000:.0f}ms, {threads} busy threads")
+        for remote in (False, True):
+            result = asyncio.run(run(
+                streams, remote, args.seconds, args.pulse, load, threads
+            ))
+            name = "ingestion process" if remote else "in-process"
+            report(f"{name} age at use", result["ages"])
+            latency = result["latency"].summary()
+            print(f"\t{name} delivery latency over the fastest: mean "
+                  f"{latency['mean']}ms, std {latency['std']}ms, "
+                  f"max {latency['max']}ms")
+
+
+if __name__ == "__main__":
+    main()
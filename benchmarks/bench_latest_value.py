@@ -0,0 +1,131 @@
+"""
+Cost of the LatestValue cell (see latest_value.py) that holds the latest
+sample of every ST stream, compared to the DroppingLifoQueue it replaces.
+
+Each container is timed on the operations of the notification callbacks
+and of the performance loop: puts that overwrite an unread sample, puts
+followed by a non-blocking retrieval, and the wake-up of a consumer
+awaiting the next sample.
+"""
+
+# Python Libraries
+import argparse
+import asyncio
+import time
+from typing import Any
+
+# Third-Party Libraries
+import numpy as np
+
+# Local Files
+from common import report
+from latest_value import LatestValue
+
+
+class DroppingLifoQueue(asyncio.LifoQueue):
+    """
+    Queue the ST streams used before LatestValue, kept as the baseline:
+    a LifoQueue that drops the previous item when a new one is put.
+    """
+    def _init(self, maxsize: int) -> None:
+        self._queue = []
+
+    def _put(self, item):
+        self._queue.append(item)
+
+    def _get(self) -> Any:
+        return self._queue.pop()
+
+    def __drop(self):
+        # drop the last item from the queue
+        self._queue.pop()
+        # no consumer will get a chance to process this item, so
+        # count must decrement manually
+        self.task_done()
+
+    def put_nowait(self, item):
+        # Make space for incoming items
+        if self.full():
+            self.__drop()
+        super().put_nowait(item)
+
+    async def put(self, item):
+        # Since put_nowait never raises QueueFull, it can be called directly
+        self.put_nowait(item)
+
+
+CONTAINERS = {
+    "DroppingLifoQueue": lambda: DroppingLifoQueue(maxsize=1),
+    "LatestValue": LatestValue,
+}
+
+
+def overwrite(container, items) -> float:
+    """ Time per put that replaces an unread item. """
+    put = container.put_nowait
+    start = time.perf_counter()
+    for item in items:
+        put(item)
+    return (time.perf_counter() - start) / len(items)
+
+
+def put_get(container, items) -> float:
+    """ Time per put followed by a non-blocking retrieval. """
+    put, get = container.put_nowait, container.get_nowait
+    start = time.perf_counter()
+    for item in items:
+        put(item)
+        get()
+    return (time.perf_counter() - start) / len(items)
+
+
+async def wake_ups(make, count: int, interval: float) -> np.ndarray:
+    """
+    Time from a put to the return of a consumer awaiting get(), with a
+    producer putting an item every interval seconds.
+    """
+    container = make()
+    latencies = []
+
+    async def consume() -> None:
+        for _ in range(count):
+            stamp = await container.get()
+            latencies.append(time.perf_counter() - stamp)
+
+    consumer = asyncio.create_task(consume())
+    while not consumer.done():
+        await asyncio.sleep(interval)
+        container.put_nowait(time.perf_counter())
+    return np.array(latencies)
+
+
+def main() -> None:
+    """ Time every container. """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-n', '--count', type=int, default=200000,
+                        help="Items put by the non-blocking benchmarks.")
+    parser.add_argument('-w', '--wake_ups', type=int, default=2000,
+                        help="Items awaited by the consumer.")
+    args = parser.parse_args()
+
+    items = [(tick, None) for tick in range(args.count)]
+    for name, make in CONTAINERS.items():
+        print(f"\n{name}")
+        print(f"\tput over an unread item   "
+              f"{overwrite(make(), items) * 1e9:6.0f} ns")
+        print(f"\tput and get_nowait        "
+              f"{put_get(make(), items) * 1e9:6.0f} ns")
+        report("wake-up of an awaiting get",
+               asyncio.run(wake_ups(make, args.wake_ups, 0.001)))
+
+    # What the cell tells consumers, which the queue cannot.
+    cell = LatestValue()
+    for item in items[:100]:
+        cell.put_nowait(item)
+    cell.get_nowait()
+    print(f"\nLatestValue after 100 puts and a get: sequence {cell.seq}, "
+          f"{cell.overwritten} overwritten, age {cell.age() * 1e6:.0f} us")
+
+
+if __name__ == "__main__":
+    main()
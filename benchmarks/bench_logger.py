@@ -0,0 +1,122 @@
+"""
+Benchmark of the motion Logger against the previous implementation, which
+built a one-row DataFrame per record, concatenated it to the accumulated
+DataFrame, and wrote it to the file within the loop.
+
+Records are generated for a number of seconds at synthetic rates of 100Hz
+(the ST motion rate) and 1kHz. The time spent adding records, including
+the automatic writes once max_record is reached, is the time taken from the
+asyncio loop that also triggers notes.
+"""
+
+# Python Libraries
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import Tuple
+import uuid
+
+# Third-Party Libraries
+import numpy as np
+import pandas as pd
+
+# Local Files
+from common import report, synthetic_motion
+from constants import ST_LOG_FIELDS
+from logger import Logger
+
+
+class LegacyLogger:
+    """ Previous Logger implementation, kept for comparison. """
+
+    def __init__(self, file_path: str, max_record: int = 10000) -> None:
+        self.data_frame_logger = None
+        self.file_path = file_path
+        self.max_record = max_record
+
+    async def add_record(self, data_frame: pd.DataFrame) -> None:
+        if self.data_frame_logger is None:
+            self.data_frame_logger = data_frame
+        else:
+            self.data_frame_logger = pd.concat(
+                [self.data_frame_logger, data_frame],
+                axis=0, join='outer'
+            )
+
+        if len(self.data_frame_logger) > self.max_record:
+            await self.write_log()
+            self.data_frame_logger = None
+
+    async def write_log(self) -> None:
+        if self.data_frame_logger is None:
+            return
+        self.data_frame_logger.to_csv(
+            self.file_path, mode='a',
+            header=not os.path.isfile(self.file_path)
+        )
+
+    def new_record(self, data) -> pd.DataFrame:
+        columns = ['ticks'] + list(data[1].keys())
+        all_data = [data[0]] + list(data[1].values())
+        record = dict(zip(columns, all_data))
+        return pd.DataFrame(record, index=[str(uuid.uuid4())])
+
+
+async def run_legacy(records, file_path: str) -> Tuple[np.ndarray, None]:
+    """ Time every new_record + add_record call of the legacy Logger. """
+    logger = LegacyLogger(file_path)
+    durations = np.empty(len(records))
+    clock = time.perf_counter
+    for i, record in enumerate(records):
+        start = clock()
+        await logger.add_record(logger.new_record(record))
+        durations[i] = clock() - start
+    await logger.write_log()
+    return durations, None
+
+
+async def run_columnar(records, file_path: str) -> Tuple[np.ndarray, str]:
+    """
+    Time every add_record call of the columnar Logger, whose writes happen
+    in a writer thread.
+    """
+    logger = Logger(file_path, ST_LOG_FIELDS['motion'])
+    durations = np.empty(len(records))
+    clock = time.perf_counter
+    for i, record in enumerate(records):
+        start = clock()
+        await logger.add_record(record)
+        durations[i] = clock() - start
+    await logger.close()
+    return durations, logger.report()
+
+
+def main() -> None:
+    """ Run the benchmark for every rate. """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-s', '--seconds', type=float, default=10,
+                        help="Duration of the simulated session.")
+    parser.add_argument('--rates', type=int, nargs='+', default=[100, 1000],
+                        help="Synthetic sample rates in Hz.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        for rate in args.rates:
+            records = list(synthetic_motion(int(rate * args.seconds)))
+            print(f"\n{rate}Hz for {args.seconds}s ({len(records)} records)")
+
+            for label, run in (("legacy (DataFrame concat)", run_legacy),
+                               ("columnar", run_columnar)):
+                file_path = os.path.join(folder, f"{label[:6]}_{rate}.csv")
+                durations, summary = asyncio.run(run(records, file_path))
+                report(label, durations)
+                print(f"\t{'':<32} loop time used: "
+                      f"{durations.sum() / args.seconds * 100:.2f}%")
+                if summary:
+                    print(f"\t{'':<32} {summary}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Cost per tick of mapping ST motion values to synth parameters: with the
+np.interp calls the performance loop used to make, or with the mapping table
+ST_MAPPINGS compiled by a ParameterMapper (see param_mapping.py).
+
+The synth is a stand-in whose setters record their values (see
+common.py), so that both versions are checked to set the same parameters,
+without an audio server.
+"""
+
+# Python Libraries
+import argparse
+import time
+
+# Third-Party Libraries
+import numpy as np
+
+# Local Files
+from common import NoSynth, report
+from constants import ST_MAPPINGS, ST_SETTINGS
+from param_mapping import ParameterMapper
+from st_simulator import ReplayStream
+
+
+def interp_mappings(synth, ranges, r, theta, phi) -> None:
+    """ Mappings of the performance loop before the mapping table. """
+    synth.amp_env.setAttack(float(np.interp(
+        r,
+        (ranges["min_acc_magnitude"], ranges["max_acc_magnitude"]),
+        (synth.pulse_rate * 0.9, 0.01)
+    )))
+    synth.amp_env.setMul(float(np.interp(
+        r,
+        (ranges["min_acc_magnitude"], ranges["max_acc_magnitude"]),
+        (0.25, 0.707)
+    )))
+    synth.amp_env.setDur(float(np.interp(
+        r,
+        (ranges["min_acc_magnitude"], ranges["max_acc_magnitude"]),
+        (synth.pulse_rate * 0.9, 0.1)
+    )))
+    synth.mixer.setAmp(1, 0, float(np.interp(
+        r,
+        (ranges["min_acc_magnitude"], ranges["max_acc_magnitude"]),
+        (0.1, 0.5)
+    )))
+    synth.filt.setFreq(synth.filt_map.get(float(np.interp(
+        theta,
+        (ranges["min_tilt"], ranges["max_tilt"]),
+        (0, 1)
+    ))))
+    synth.reverb.setBal(float(np.interp(
+        phi,
+        (ranges["min_azimuth"], ranges["max_azimuth"]),
+        (0, 0.707)
+    )))
+
+
+def main() -> None:
+    """ Check and time both versions over a synthetic session. """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-s', '--seconds', type=float, default=100,
+                        help="Duration of the synthetic session.")
+    args = parser.parse_args()
+
+    stream = ReplayStream.synthetic('motion', args.seconds)
+    rows = list(zip(*(stream.columns[name].tolist()
+                      for name in ('r', 'theta', 'phi'))))
+    clock = time.perf_counter
+
+    interp_synth, mapped_synth = NoSynth(), NoSynth()
+    # Without tolerances, every changed value is sent, like np.interp did
+    # (see bench_bindings.py for the tolerances).
+    mapper = ParameterMapper(
+        [dict(mapping, tolerance=0.0, relative=False)
+         for mapping in ST_MAPPINGS],
+        mapped_synth, ST_SETTINGS
+    )
+    values = {}
+    interp_times = np.empty(len(rows))
+    mapper_times = np.empty(len(rows))
+    for i, (r, theta, phi) in enumerate(rows):
+        start = clock()
+        interp_mappings(interp_synth, ST_SETTINGS, r, theta, phi)
+        interp_times[i] = clock() - start
+
+        start = clock()
+        values["r"], values["theta"], values["phi"] = r, theta, phi
+        mapper.apply(values)
+        mapper_times[i] = clock() - start
+
+        if i % 97 == 0:
+            expected, state = interp_synth.state(), mapped_synth.state()
+            assert expected.keys() == state.keys()
+            for key, value in expected.items():
+                assert abs(state[key] - value) <= 1e-9 * max(1, abs(value)), \
+                    (key, value, state[key])
+
+    print(f"\n{len(rows)} ticks of {len(mapper.compiled)} mappings, both "
+          "versions set the same parameters")
+    report("np.interp per tick", interp_times)
+    report("ParameterMapper per tick", mapper_times)
+
+
+if __name__ == "__main__":
+    main()
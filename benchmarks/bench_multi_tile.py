@@ -0,0 +1,125 @@
+"""
+Host cost of ingesting the notifications of several SensorTiles, to estimate
+how many STs one host can sustain.
+
+Every simulated ST sends motion notifications at 100Hz (and optionally
+environment and quaternion notifications), which go through the
+notification dispatch and decoding of its own SensorTile object. The
+performance loop then retrieves the latest motion of every ST and adds it
+to its logger. No BLE connection is made, so the estimate only covers the
+host CPU: BLE adapters usually limit the number of concurrent connections
+well before that.
+"""
+
+# Python Libraries
+import argparse
+import asyncio
+import os
+from struct import pack
+import tempfile
+import time
+
+# Third-Party Libraries
+import numpy as np
+
+# Local Files
+import common  # noqa: F401 (sets up the import path)
+from constants import ST_HANDLES, ST_LOG_FIELDS
+from logger import Logger, LogWriter
+from st_ble import SensorTile
+
+
+class _NoClient:
+    """ Stand-in for the BleakClient, which only accepts registrations. """
+
+    async def start_notify(self, char, callback) -> None:
+        pass
+
+
+async def session(tiles: int, seconds: float, all_streams: bool, folder: str):
+    """
+    Simulate a session with a number of STs. Returns the time spent in the
+    notification callbacks and in the performance loop.
+    """
+    rng = np.random.default_rng(tiles)
+    steps = int(seconds * 100)
+    motion = [bytearray(pack('<10h', *row))
+              for row in rng.integers(-2000, 2000, size=(steps, 10))]
+    quaternions = [bytearray(pack('<4h', *row))
+                   for row in rng.integers(-10000, 10000, size=(steps, 4))]
+    environment = bytearray(pack('<5h', 0, 1013, 45, 25, 26))
+
+    writer = LogWriter()
+    sensor_tiles, loggers = [], []
+    for n in range(tiles):
+        sensor_tile = SensorTile(f"00:00:00:00:00:{n:02X}")
+        sensor_tile.client = _NoClient()
+        for stream in (ST_HANDLES if all_streams else ('motion',)):
+            await sensor_tile.start_notification(ST_HANDLES[stream])
+        sensor_tiles.append(sensor_tile)
+        loggers.append(Logger(
+            os.path.join(folder, f"st{n}_motion.stlog"),
+            ST_LOG_FIELDS['motion'], writer=writer, stream='motion'
+        ))
+
+    clock = time.perf_counter
+    ingest = loop = 0.0
+    for step in range(steps):
+        start = clock()
+        for sensor_tile in sensor_tiles:
+            callback = sensor_tile._notification_callback
+            callback(ST_HANDLES['motion'], motion[step])
+            if all_streams:
+                callback(ST_HANDLES['environment'], environment)
+                # Quaternions arrive every 10ms, like motion.
+                callback(ST_HANDLES['quaternions'], quaternions[step])
+        middle = clock()
+        for sensor_tile, logger in zip(sensor_tiles, loggers):
+            await logger.add_record(sensor_tile.motion_data.get_nowait())
+        loop += clock() - middle
+        ingest += middle - start
+
+    for logger in loggers:
+        await logger.write_log()
+    await writer.close()
+    return ingest, loop
+
+
+def main() -> None:
+    """ Run the simulated session for every number of STs. """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-s', '--seconds', type=float, default=60,
+                        help="Duration of the simulated session.")
+    parser.add_argument('-t', '--tiles', type=int, nargs='+',
+                        default=[1, 2, 4, 8, 16],
+                        help="Numbers of simulated STs.")
+    parser.add_argument('--all_streams', action='store_true',
+                        help="Also send environment and quaternion data.")
+    parser.add_argument('--budget', type=float, default=0.25,
+                        help="Share of one core available for ST ingest.")
+    args = parser.parse_args()
+
+    print(f"\n{args.seconds}s sessions, "
+          f"{'all streams' if args.all_streams else 'motion only'}")
+    per_tile = []
+    with tempfile.TemporaryDirectory() as folder:
+        for tiles in args.tiles:
+            ingest, loop = asyncio.run(
+                session(tiles, args.seconds, args.all_streams, folder)
+            )
+            load = (ingest + loop) / args.seconds
+            per_tile.append(load / tiles)
+            print(f"\t{tiles:3d} STs | "
+                  f"callbacks {ingest / args.seconds * 100:6.2f}% | "
+                  f"loop {loop / args.seconds * 100:6.2f}% | "
+                  f"total {load * 100:6.2f}% of a core | "
+                  f"{load / tiles * 100:.3f}% per ST")
+
+    cost = float(np.median(per_tile))
+    print(f"\n\tAbout {cost * 100:.3f}% of a core per ST: "
+          f"{int(args.budget / cost)} STs fit in "
+          f"{args.budget * 100:.0f}% of a core.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Host CPU of ingesting ST notifications that pack N samples each (see
+st_decode.py), compared to a notification per sample.
+
+A synthetic session of the three streams is packed with N samples per
+notification. The packed notifications are checked to unpack into the
+regular ones, then timed through the notification callback of a
+SensorTile, and finally replayed in real time by a simulated SensorTile,
+where the process CPU time includes the event loop wake-ups of every
+notification.
+"""
+
+# Python Libraries
+import argparse
+import asyncio
+import time
+
+# Local Files
+import common  # noqa: F401 (sets up the import path)
+from constants import ST_HANDLES
+from st_ble import SensorTile
+from st_decode import PackedLayout
+from st_simulator import ReplayStream, SimulatedSensorTile
+
+
+class _NoClient:
+    """ Stand-in for the BleakClient, which only accepts registrations. """
+
+    async def start_notify(self, char, callback) -> None:
+        pass
+
+
+def notifications(streams, packing):
+    """ (handle, payload) of every notification, in the order they are sent. """
+    events = []
+    for stream in streams:
+        if packing:
+            ticks, payloads = stream.packed(packing)
+        else:
+            ticks, payloads = stream.ticks, stream.packets
+        events += zip(ticks.tolist(), [stream.handle] * len(payloads),
+                      payloads)
+    events.sort(key=lambda event: event[0])
+    return [(handle, payload) for _, handle, payload in events]
+
+
+def check(streams, packing: int) -> None:
+    """ Unpacked notifications must match the regular ones. """
+    for stream in streams:
+        layout = PackedLayout(stream.words.shape[1] - 1)
+        _, payloads = stream.packed(packing)
+        unpacked = [bytearray(payload) for packed in payloads
+                    for payload in layout.unpack(packed)]
+        assert unpacked == stream.packets, f"{stream.stream} x{packing}"
+
+
+def callback_time(streams, packing, repeat: int = 3) -> float:
+    """
+    Fastest time of a few runs of the notification callback over every
+    notification of the session.
+    """
+    events = notifications(streams, packing)
+    best = float('inf')
+    for _ in range(repeat):
+        tile = SensorTile("00:00:00:00:00:00")
+        tile.client = _NoClient()
+        for stream in streams:
+            asyncio.run(tile.start_notification(stream.handle))
+        callback = tile._notification_callback
+        start = time.perf_counter()
+        for handle, payload in events:
+            callback(handle, payload)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+async def replay_cpu(streams, packing, seconds: float) -> float:
+    """ Process CPU time per second of a real-time replay. """
+    tile = SimulatedSensorTile(streams, packing=packing)
+    await tile.ble_connect()
+    for stream in streams:
+        await tile.start_notification(stream.handle)
+    cpu, wall = time.process_time(), time.perf_counter()
+    await asyncio.sleep(seconds)
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    tile.closing = True
+    await tile.client.disconnect()
+    return cpu / wall
+
+
+def main() -> None:
+    """ Compare every packing. """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-s', '--seconds', type=float, default=60,
+                        help="Duration of the synthetic session.")
+    parser.add_argument('-r', '--realtime', type=float, default=10,
+                        help="Duration of the real-time replays.")
+    parser.add_argument('-n', '--packing', type=int, nargs='+',
+                        default=[1, 4, 8],
+                        help="Samples per packed notification.")
+    args = parser.parse_args()
+
+    streams = [
+        ReplayStream.synthetic(stream, args.seconds, seed=seed)
+        for seed, stream in enumerate(ST_HANDLES)
+    ]
+    samples = sum(len(stream) for stream in streams)
+    for packing in args.packing:
+        check(streams, packing)
+    print(f"\n{samples} samples, packed notifications unpack to the "
+          "regular ones")
+
+    for packing in [None] + args.packing:
+        name = f"packed x{packing}" if packing else "regular"
+        count = len(notifications(streams, packing))
+        duration = callback_time(streams, packing)
+        cpu = asyncio.run(replay_cpu(streams, packing, args.realtime))
+        print(f"\t{name:<10} {count:6d} notifications | callback "
+              f"{duration / samples * 1e6:5.2f} us/sample, "
+              f"{duration / args.seconds * 100:5.2f}% of a core | "
+              f"real-time replay {cpu * 100:5.2f}% of a core")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Throughput and latency of the ST path of main(), fed by a simulated
+SensorTile instead of Bluetooth, so that runs are reproducible on any
+machine.
+
+A synthetic session (or the given logs) is replayed as raw GATT
+notifications at a multiple of real time. The notifications are decoded by
+the SensorTile callbacks, and a consumer that mimics the performance loop
+retrieves the latest motion, logs it and computes the synth mappings.
+Latency is the time from a notification being queued to its retrieval.
+"""
+
+# Python Libraries
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+# Third-Party Libraries
+import numpy as np
+
+# Local Files
+from common import report
+from constants import ST_HANDLES, ST_LOG_FIELDS, ST_SETTINGS
+from latest_value import LatestValue
+from logger import Logger
+from st_simulator import ReplayStream, SimulatedSensorTile
+
+
+async def run(streams, speed: float, interval: float, folder: str):
+    """
+    Replay the streams once, consuming motion data every interval seconds.
+    Returns the consumed count, the queueing latencies and the duration.
+    """
+    tile = SimulatedSensorTile(streams, speed=speed)
+    # Time the values with the clock of the latencies.
+    tile.motion_data = LatestValue(clock=time.perf_counter)
+    logger = Logger(os.path.join(folder, "motion.stlog"),
+                    ST_LOG_FIELDS['motion'], stream='motion')
+
+    await tile.ble_connect()
+    for stream in streams:
+        await tile.start_notification(ST_HANDLES[stream.stream])
+
+    start = time.perf_counter()
+    consumed = 0
+    latencies = []
+    while not tile.replay_done.is_set():
+        try:
+            motion = await asyncio.wait_for(tile.motion_data.get(), 0.5)
+        except asyncio.TimeoutError:
+            continue
+        latencies.append(tile.motion_data.age(time.perf_counter()))
+        await logger.add_record(motion)
+        # Same mappings as the performance loop.
+        for value, source in (
+                (motion[1].r, (ST_SETTINGS["min_acc_magnitude"],
+                               ST_SETTINGS["max_acc_magnitude"])),
+                (motion[1].theta, (ST_SETTINGS["min_tilt"],
+                                   ST_SETTINGS["max_tilt"])),
+                (motion[1].phi, (ST_SETTINGS["min_azimuth"],
+                                 ST_SETTINGS["max_azimuth"]))):
+            float(np.interp(value, source, (0, 1)))
+        consumed += 1
+        if interval:
+            await asyncio.sleep(interval)
+    duration = time.perf_counter() - start
+
+    tile.closing = True
+    await tile.client.disconnect()
+    await logger.close()
+    return consumed, np.array(latencies), duration
+
+
+def main() -> None:
+    """ Replay a session at every speed. """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('logs', nargs='*',
+                        help="Logs to replay. Defaults to a synthetic session.")
+    parser.add_argument('-s', '--seconds', type=float, default=60,
+                        help="Duration of the synthetic session.")
+    parser.add_argument('--speeds', type=float, nargs='+', default=[1, 10],
+                        help="Replay speeds relative to real time.")
+    parser.add_argument('-i', '--interval', type=float, default=0,
+                        help="Sleep of the consumer between retrievals.")
+    args = parser.parse_args()
+
+    streams = [ReplayStream.from_log(path) for path in args.logs] or [
+        ReplayStream.synthetic(stream, args.seconds, seed=seed)
+        for seed, stream in enumerate(ST_HANDLES)
+    ]
+    notifications = sum(len(stream) for stream in streams)
+    print(f"\n{notifications} notifications "
+          f"({', '.join(stream.stream for stream in streams)})")
+
+    with tempfile.TemporaryDirectory() as folder:
+        for speed in args.speeds:
+            consumed, latencies, duration = asyncio.run(
+                run(streams, speed, args.interval, folder)
+            )
+            print(f"\n{speed}x real time: {duration:.2f}s, "
+                  f"{notifications / duration:.0f} notifications/s, "
+                  f"{consumed} motion records consumed")
+            report("queue latency", latencies)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Cost per frame of keeping the latest window of rows as an array: with a
+Python list trimmed and converted every frame, as the research code did
+(see analysis/research/action_classification.py), or with a WindowRing
+(see ring_buffer.py).
+
+Two windows are timed: 30 frames of hand landmarks (2 hands of 21 3D
+points), and 1 second of ST motion samples, appended one at a time or in
+blocks of notifications as taken by the performance loop.
+"""
+
+# Python Libraries
+import argparse
+import time
+
+# Third-Party Libraries
+import numpy as np
+
+# Local Files
+from common import report
+from ring_buffer import WindowRing
+from st_samples import MotionSample
+from st_simulator import ReplayStream
+
+
+def list_windows(rows, length: int) -> np.ndarray:
+    """ Per-frame time of appending to a list and building the window. """
+    window = []
+    durations = np.empty(len(rows))
+    clock = time.perf_counter
+    for i, row in enumerate(rows):
+        start = clock()
+        window.append(row)
+        window = window[-length:]
+        if len(window) == length:
+            batch = np.expand_dims(window, axis=0)
+        durations[i] = clock() - start
+    assert np.array_equal(batch[0], np.array(rows[-length:]))
+    return durations
+
+
+def ring_windows(rows, length: int) -> np.ndarray:
+    """ Per-frame time of appending to a WindowRing and viewing the window. """
+    ring = WindowRing(length, len(rows[0]))
+    durations = np.empty(len(rows))
+    clock = time.perf_counter
+    for i, row in enumerate(rows):
+        start = clock()
+        ring.append(row)
+        if ring.full:
+            batch = ring.window()[np.newaxis]
+        durations[i] = clock() - start
+    assert np.array_equal(batch[0], np.array(rows[-length:]))
+    assert batch.base is not None and batch[0].flags.c_contiguous
+    return durations
+
+
+def ring_blocks(columns, fields, length: int, block: int) -> np.ndarray:
+    """ Per-block time of appending columns and viewing the window. """
+    ring = WindowRing.for_fields(fields, length)
+    count = len(columns[fields[0]])
+    durations = []
+    clock = time.perf_counter
+    for offset in range(0, count, block):
+        start = clock()
+        ring.extend_columns({
+            field: columns[field][offset:offset + block] for field in fields
+        })
+        window = ring.window()
+        durations.append(clock() - start)
+    expected = np.column_stack([columns[field][-length:] for field in fields])
+    assert np.array_equal(window, expected)
+    return np.array(durations)
+
+
+def main() -> None:
+    """ Time both windows with both containers. """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-f', '--frames', type=int, default=20000,
+                        help="Frames of landmarks.")
+    parser.add_argument('-s', '--seconds', type=float, default=200,
+                        help="Duration of the ST motion session.")
+    parser.add_argument('-b', '--block', type=int, default=4,
+                        help="Notifications per loop iteration.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    landmarks = list(rng.random((args.frames, 2 * 21 * 3)))
+    print(f"\nHand landmarks, windows of 30 x {landmarks[0].size}")
+    report("list per frame", list_windows(landmarks, 30))
+    report("WindowRing per frame", ring_windows(landmarks, 30))
+
+    stream = ReplayStream.synthetic('motion', args.seconds)
+    fields = MotionSample.FIELDS
+    rows = list(np.column_stack([stream.columns[field] for field in fields]))
+    print(f"\nST motion, windows of 100 x {len(fields)}")
+    report("list per sample", list_windows(rows, 100))
+    report("WindowRing per sample", ring_windows(rows, 100))
+    report(f"WindowRing per block of {args.block}",
+           ring_blocks(stream.columns, fields, 100, args.block))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Memory and time of the per-packet dictionaries previously put in the
+SensorTile queues, against the slotted samples of st_samples.py, over a
+simulated session of motion notifications at 100Hz (1 hour by default).
+
+Three costs are compared: building the record of every notification in the
+callback, reading the values used by the main loop ('r', 'theta', 'phi'),
+and adding the record to a Logger. Memory is measured for all the records
+of the session held at once (e.g., by a replay or an analysis window).
+"""
+
+# Python Libraries
+import argparse
+import asyncio
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Third-Party Libraries
+import numpy as np
+
+# Local Files
+from common import report, synthetic_motion, time_calls
+from constants import ST_LOG_FIELDS
+from logger import Logger
+from st_samples import MotionSample
+
+
+def motion_dict(values: tuple) -> dict:
+    """ Previous record built by SensorTile._motion_callback. """
+    return {
+        'acc_x': values[0], 'acc_y': values[1], 'acc_z': values[2],
+        'gyr_x': values[3], 'gyr_y': values[4], 'gyr_z': values[5],
+        'mag_x': values[6], 'mag_y': values[7], 'mag_z': values[8],
+        'r': values[9], 'theta': values[10], 'phi': values[11],
+    }
+
+
+def motion_sample(values: tuple) -> MotionSample:
+    """ Record built by st_decode.decode_motion. """
+    return MotionSample(*values)
+
+
+def held_bytes(build, rows) -> int:
+    """ Memory allocated to hold a record per row. """
+    gc.collect()
+    tracemalloc.start()
+    records = [build(row) for row in rows]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del records
+    return size
+
+
+async def log(records, file_path: str):
+    """ Time every add_record call of a motion Logger. """
+    logger = Logger(file_path, ST_LOG_FIELDS['motion'])
+    durations = np.empty(len(records))
+    clock = time.perf_counter
+    for i, record in enumerate(records):
+        start = clock()
+        await logger.add_record(record)
+        durations[i] = clock() - start
+    await logger.close()
+    return durations
+
+
+def main() -> None:
+    """ Run every comparison. """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-s', '--seconds', type=float, default=3600,
+                        help="Duration of the simulated session.")
+    parser.add_argument('-r', '--rate', type=int, default=100,
+                        help="Motion sample rate in Hz.")
+    args = parser.parse_args()
+
+    generated = list(synthetic_motion(int(args.rate * args.seconds)))
+    rows = [tuple(values.values()) for _, values in generated]
+    ticks = [time_stamp for time_stamp, _ in generated]
+    del generated
+    print(f"\n{args.rate}Hz for {args.seconds}s ({len(rows)} records)")
+
+    for label, build in (("dict", motion_dict), ("MotionSample", motion_sample)):
+        print(f"\n{label}")
+        print(f"\t{'size of one record':<32} "
+              f"{sys.getsizeof(build(rows[0])):10d} bytes")
+        print(f"\t{'memory held by all records':<32} "
+              f"{held_bytes(build, rows) / 2 ** 20:10.2f} MiB")
+
+        report("build (callback)", time_calls(build, rows))
+
+        records = [build(row) for row in rows]
+        if label == "dict":
+            def read(values):
+                return values['r'], values['theta'], values['phi']
+        else:
+            def read(values):
+                return values.r, values.theta, values.phi
+        report("read r/theta/phi (main loop)", time_calls(read, records))
+
+        with tempfile.TemporaryDirectory() as folder:
+            durations = asyncio.run(log(
+                list(zip(ticks, records)), os.path.join(folder, "m.stlog")
+            ))
+        report("Logger.add_record", durations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Size and throughput of binary session logs compared to CSV logs, measured
+on the logs in analysis/renderExamples and on a synthetic 1 hour motion
+session at 100Hz.
+"""
+
+# Python Libraries
+import glob
+import os
+import tempfile
+import time
+
+# Third-Party Libraries
+import numpy as np
+import pandas as pd
+
+# Local Files
+from common import ROOT, synthetic_motion
+from constants import ST_LOG_FIELDS
+import session_log
+
+
+def best_of(function, repeat: int = 5) -> float:
+    """ Shortest duration of several calls, in seconds. """
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+def compare(csv_path: str, folder: str) -> None:
+    """ Convert a CSV log and print size and parsing throughput. """
+    log_path = os.path.join(
+        folder, os.path.basename(csv_path)[:-4] + session_log.EXTENSION
+    )
+    count = session_log.import_csv(csv_path, log_path)
+
+    csv_size = os.path.getsize(csv_path)
+    log_size = os.path.getsize(log_path)
+    csv_read = best_of(lambda: pd.read_csv(csv_path, index_col=0))
+    log_read = best_of(lambda: session_log.read_records(log_path))
+    export = best_of(
+        lambda: session_log.export_csv(log_path, log_path + '.csv'), 1
+    )
+
+    print(f"\n{os.path.basename(csv_path)} ({count} records)")
+    print(f"\tsize: csv {csv_size / 1024:9.1f} KiB | "
+          f"stlog {log_size / 1024:9.1f} KiB | "
+          f"ratio {csv_size / log_size:.2f}x")
+    print(f"\tread: csv {count / csv_read:12.0f} rec/s | "
+          f"stlog {count / log_read:12.0f} rec/s | "
+          f"speedup {csv_read / log_read:.1f}x")
+    print(f"\texport to csv: {count / export:.0f} rec/s")
+
+
+def main() -> None:
+    """ Run the comparison on the example logs and a synthetic session. """
+    with tempfile.TemporaryDirectory() as folder:
+        examples = sorted(glob.glob(
+            os.path.join(ROOT, 'analysis', 'renderExamples', '*.csv')
+        ))
+        for csv_path in examples:
+            compare(csv_path, folder)
+
+        # One hour of motion data at the full 100Hz rate.
+        fields = ST_LOG_FIELDS['motion']
+        records = list(synthetic_motion(100 * 3600))
+        columns = {
+            'ticks': np.array([record[0] for record in records])
+        }
+        for name, _ in fields[1:]:
+            columns[name] = np.array([record[1][name] for record in records])
+
+        csv_path = os.path.join(folder, 'synthetic_1h_motion.csv')
+        log_path = os.path.join(folder, 'synthetic_1h' + session_log.EXTENSION)
+        start = time.perf_counter()
+        session_log.records_to_data_frame(columns).to_csv(csv_path)
+        csv_write = time.perf_counter() - start
+        start = time.perf_counter()
+        session_log.append_records(
+            log_path, 'motion', fields, columns, len(records)
+        )
+        log_write = time.perf_counter() - start
+        print(f"\nsynthetic 1h session: write csv {csv_write:.2f}s | "
+              f"write stlog {log_write:.3f}s")
+        compare(csv_path, folder)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Time the performance loop spends retrieving ST data when every stream is
+enabled: awaiting the queue of every stream in turn, as the loop used to,
+or reading the latest sample of every stream at once with a StreamReader
+(see st_streams.py).
+
+A synthetic session of the three streams is replayed in real time by a
+simulated SensorTile, at the notification rate of every stream (see
+ST_NOTIFICATION_INTERVAL in constants.py).
+"""
+
+# Python Libraries
+import argparse
+import asyncio
+import time
+
+# Third-Party Libraries
+import numpy as np
+
+# Local Files
+from common import report
+from constants import ST_HANDLES, ST_NOTIFICATION_INTERVAL
+from st_simulator import ReplayStream, SimulatedSensorTile
+from st_streams import StreamReader
+
+
+RATES = {
+    stream: 1 / interval
+    for stream, interval in ST_NOTIFICATION_INTERVAL.items()
+}
+
+
+async def run(streams, reader: bool, seconds: float, pulse: float) -> dict:
+    """
+    Run the loop for seconds. Returns the retrieval time of every iteration,
+    and the staleness of the samples of every stream.
+    """
+    tile = SimulatedSensorTile(streams)
+    await tile.ble_connect()
+    for stream in streams:
+        await tile.start_notification(ST_HANDLES[stream.stream])
+    stream_reader = StreamReader(tile)
+    queues = {stream: getattr(tile, f"{stream}_data") for stream in ST_HANDLES}
+
+    # Let every stream deliver a first sample.
+    await asyncio.sleep(0.1)
+    waits = []
+    staleness = {stream: [] for stream in ST_HANDLES}
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        start = time.perf_counter()
+        if reader:
+            for stream, reading in stream_reader.read().items():
+                if reading is not None and reading.staleness is not None:
+                    staleness[stream].append(reading.staleness)
+        else:
+            for stream, queue in queues.items():
+                item = await queue.get()
+                age = tile.clocks[ST_HANDLES[stream]].age(
+                    item[0], time.monotonic())
+                if age is not None:
+                    staleness[stream].append(age)
+        waits.append(time.perf_counter() - start)
+        await asyncio.sleep(pulse)
+
+    tile.closing = True
+    await tile.client.disconnect()
+    return {"waits": np.array(waits), "staleness": staleness}
+
+
+def main() -> None:
+    """ Compare serial awaits with a StreamReader. """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-s', '--seconds', type=float, default=10,
+                        help="Duration of every run.")
+    parser.add_argument('-p', '--pulse', type=float, default=0.01,
+                        help="Sleep of the loop between iterations, as "
+                             "long as the 10ms between notifications by "
+                             "default.")
+    args = parser.parse_args()
+
+    streams = [
+        ReplayStream.synthetic(stream, args.seconds + 5, RATES[stream], seed)
+        for seed, stream in enumerate(ST_HANDLES)
+    ]
+    for reader in (False, True):
+        name = "StreamReader" if reader else "serial awaits"
+        result = asyncio.run(run(streams, reader, args.seconds, args.pulse))
+        print(f"\n{name}: {len(result['waits'])} iterations")
+        report("retrieval per iteration", result["waits"])
+        for stream, ages in result["staleness"].items():
+            report(f"{stream} staleness", np.array(ages))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Shared helpers for the benchmark scripts. Benchmarks are run from the
+project's root folder, e.g.: `python benchmarks/bench_logger.py`
+"""
+
+# Python Libraries
+import os
+import sys
+import time
+from typing import Callable, Iterator, Tuple
+
+# Third-Party Libraries
+import numpy as np
+
+# Make the modules in 'lib' importable the same way main.py does.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, 'lib'))
+
+# Local Files
+from constants import SYNTH_FILTER_RANGE
+
+
+def synthetic_motion(count: int, seed: int = 0) -> Iterator[Tuple[int, dict]]:
+    """
+    Generate motion records shaped like the ones put in
+    SensorTile.motion_data. Ticks advance 1 per 10ms sample (8ms per tick
+    in the ST), and wrap around as a signed 2-byte value.
+    """
+    rng = np.random.default_rng(seed)
+    acc = rng.integers(-2000, 2000, size=(count, 3))
+    gyr = rng.integers(-300, 300, size=(count, 3)) * 100
+    mag = rng.integers(-600, 600, size=(count, 3))
+
+    for i in range(count):
+        acc_x, acc_y, acc_z = (int(v) for v in acc[i])
+        r = round((acc_x ** 2 + acc_y ** 2 + acc_z ** 2) ** 0.5, 2)
+        yield (
+            (i * 5 // 4 + 2 ** 15) % 2 ** 16 - 2 ** 15,
+            {
+                'acc_x': acc_x, 'acc_y': acc_y, 'acc_z': acc_z,
+                'gyr_x': int(gyr[i, 0]), 'gyr_y': int(gyr[i, 1]),
+                'gyr_z': int(gyr[i, 2]),
+                'mag_x': int(mag[i, 0]), 'mag_y': int(mag[i, 1]),
+                'mag_z': int(mag[i, 2]),
+                'r': r,
+                'theta': round(float(np.degrees(np.arccos(acc_z / r))), 2)
+                if r else 0.0,
+                'phi': round(float(np.degrees(np.arctan2(acc_y, acc_z))), 2),
+            }
+        )
+
+
+def time_calls(function: Callable, items) -> np.ndarray:
+    """
+    Call a function once per item, and return the duration of every call
+    in seconds.
+    """
+    durations = np.empty(len(items))
+    clock = time.perf_counter
+    for i, item in enumerate(items):
+        start = clock()
+        function(item)
+        durations[i] = clock() - start
+    return durations
+
+
+def report(label: str, durations: np.ndarray) -> None:
+    """
+    Print summary statistics of per-call durations in microseconds.
+    """
+    micros = durations * 1e6
+    print(
+        f"\t{label:<32} total {durations.sum() * 1e3:10.2f} ms | "
+        f"mean {micros.mean():9.2f} us | "
+        f"p99 {np.percentile(micros, 99):9.2f} us | "
+        f"max {micros.max():10.2f} us"
+    )
+
+
+class _Parameter:
+    """ Stand-in for a pyo object, whose setters record their values. """
+
+    def __init__(self) -> None:
+        self.values = {}
+
+    def __getattr__(self, name: str):
+        if not name.startswith('set'):
+            raise AttributeError(name)
+        values = self.values
+
+        def setter(*args) -> None:
+            values[(name,) + args[:-1]] = args[-1]
+        return setter
+
+
+class _Map:
+    """ Stand-in for pyo.Map with a logarithmic scale. """
+
+    def __init__(self, minimum: float, maximum: float) -> None:
+        self.minimum, self.maximum = minimum, maximum
+
+    def get(self, x: float) -> float:
+        return self.minimum * (self.maximum / self.minimum) ** x
+
+
+class NoSynth:
+    """
+    Stand-in for the Synth objects set by the mappings of ST values (see
+    ST_MAPPINGS in constants.py), without an audio server.
+    """
+
+    def __init__(self) -> None:
+        self.pulse_rate = 0.15
+        self.filt_map = _Map(*SYNTH_FILTER_RANGE)
+        self.amp_env = _Parameter()
+        self.mixer = _Parameter()
+        self.filt = _Parameter()
+        self.reverb = _Parameter()
+
+    def state(self) -> dict:
+        return {
+            (name,) + key: value
+            for name in ("amp_env", "mixer", "filt", "reverb")
+            for key, value in getattr(self, name).values.items()
+        }
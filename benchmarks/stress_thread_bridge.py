@@ -0,0 +1,190 @@
+"""
+Stress test of the CoalescingBridge (see thread_bridge.py) with many
+producer threads publishing into a running event loop.
+
+Every producer publishes (producer, counter) values, either as fast as it
+can or at a given rate. Meanwhile, a heartbeat task measures how late the
+event loop runs its timers, and a consumer awaits the delivered values.
+The run checks that:
+* every published value is either delivered or coalesced,
+* the values of every producer are delivered in order,
+* the last published value is delivered,
+* the loop is woken up at most once per pending batch.
+The same producers calling call_soon_threadsafe() once per value are run
+for comparison, with a consumer polling the latest value every millisecond,
+which only counts the values it had not seen yet.
+"""
+
+# Python Libraries
+import argparse
+import asyncio
+import threading
+import time
+
+# Third-Party Libraries
+import numpy as np
+
+# Local Files
+from common import report
+from thread_bridge import CoalescingBridge
+
+
+class _PerValue:
+    """ Handoff that schedules a callback in the loop for every value. """
+
+    def __init__(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.value = None
+        self.published = 0
+        self.deliveries = 0
+        self._lock = threading.Lock()
+
+    def publish(self, value) -> None:
+        with self._lock:
+            self.published += 1
+        self.loop.call_soon_threadsafe(self._deliver, value)
+
+    def _deliver(self, value) -> None:
+        self.deliveries += 1
+        self.value = value
+
+    def read(self):
+        return self.value
+
+
+def produce(bridge, producer: int, stop: threading.Event, rate: float,
+            published: list) -> None:
+    """ Publish values until stopped, at a rate in Hz (0 for no pause). """
+    counter = 0
+    period = 1 / rate if rate else 0
+    while not stop.is_set():
+        counter += 1
+        bridge.publish((producer, counter))
+        if period:
+            time.sleep(period)
+    published[producer] = counter
+
+
+async def heartbeat(stop: asyncio.Event, period: float = 0.001) -> list:
+    """ Lateness of a timer of period seconds, until stopped. """
+    loop = asyncio.get_running_loop()
+    lateness = []
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(period)
+        lateness.append(loop.time() - start - period)
+    return lateness
+
+
+async def run(bridged: bool, producers: int, rate: float,
+              seconds: float) -> dict:
+    """ Run the producers for seconds, and check the deliveries. """
+    bridge = CoalescingBridge() if bridged else _PerValue()
+    stopping = asyncio.Event()
+    beats = asyncio.create_task(heartbeat(stopping))
+
+    # Last counter seen for every producer, which must only grow.
+    seen = [0] * producers
+    disordered = 0
+
+    async def consume() -> int:
+        nonlocal disordered
+        received = 0
+        while not stopping.is_set():
+            if bridged:
+                try:
+                    value = await asyncio.wait_for(bridge.get(), 0.1)
+                except asyncio.TimeoutError:
+                    continue
+            else:
+                await asyncio.sleep(0.001)
+                value = bridge.read()
+                if value is None:
+                    continue
+            producer, counter = value
+            if counter == seen[producer]:
+                # Polled again before a new value was delivered.
+                continue
+            if counter < seen[producer]:
+                disordered += 1
+            seen[producer] = counter
+            received += 1
+        return received
+
+    consumer = asyncio.create_task(consume())
+    stop = threading.Event()
+    published = [0] * producers
+    threads = [
+        threading.Thread(target=produce,
+                         args=(bridge, producer, stop, rate, published))
+        for producer in range(producers)
+    ]
+    cpu = time.process_time()
+    for thread in threads:
+        thread.start()
+    await asyncio.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        await asyncio.to_thread(thread.join)
+    # Let the pending deliveries run.
+    coalesced = getattr(bridge, "coalesced", 0)
+    while bridge.deliveries + coalesced < sum(published):
+        await asyncio.sleep(0.01)
+        coalesced = getattr(bridge, "coalesced", 0)
+    cpu = time.process_time() - cpu
+    stopping.set()
+    lateness = await beats
+    received = await consumer
+
+    result = {
+        "published": sum(published),
+        "deliveries": bridge.deliveries,
+        "received": received,
+        "disordered": disordered,
+        "cpu": cpu / seconds,
+        "lateness": np.array(lateness),
+    }
+    if bridged:
+        assert bridge.published == sum(published)
+        assert bridge.deliveries + bridge.coalesced == bridge.published, \
+            "values lost"
+        result["coalesced"] = bridge.coalesced
+    assert disordered == 0, f"{disordered} values delivered out of order"
+    last = bridge.read()
+    assert last is not None and last[1] == published[last[0]], \
+        "the last value of its producer was not delivered"
+    return result
+
+
+def main() -> None:
+    """ Stress the bridge, then the per-value handoff. """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-p', '--producers', type=int, default=32,
+                        help="Producer threads.")
+    parser.add_argument('-r', '--rate', type=float, default=30,
+                        help="Values per second of every producer, like the "
+                             "frames of a camera, or 0 for as fast as "
+                             "possible (use few producers, since the values "
+                             "handed over one by one take long to drain).")
+    parser.add_argument('-s', '--seconds', type=float, default=5,
+                        help="Duration of every run.")
+    args = parser.parse_args()
+
+    for bridged in (True, False):
+        name = "CoalescingBridge" if bridged else "call_soon_threadsafe " \
+            "per value"
+        result = asyncio.run(run(bridged, args.producers, args.rate,
+                                 args.seconds))
+        print(f"\n{name}, {args.producers} producers: "
+              f"{result['published']} values published, "
+              f"{result['deliveries']} loop callbacks, "
+              f"{result['received']} values consumed, "
+              f"{result['cpu'] * 100:.0f}% of a core")
+        if bridged:
+            print(f"\t{result['coalesced']} coalesced, none lost or out of "
+                  f"order, last value delivered")
+        report("loop timer lateness", result["lateness"])
+
+
+if __name__ == "__main__":
+    main()
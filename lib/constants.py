@@ -28,6 +28,176 @@ ST_SETTINGS = {
     "max_azimuth": 180
 }
 
+# Every ST notification starts with a time stamp in ticks. The firmware
+# sends HAL_GetTick() >> 3 (i.e., 8ms per tick) as a 2-byte value, so the
+# time stamp wraps around every 65536 ticks (approximately 524 seconds).
+ST_TICK_PERIOD = 0.008
+ST_TICK_WRAP = 2 ** 16
+
+# Nominal time between notifications of each ST stream, in seconds.
+# Quaternions are sent one at a time every 10ms, as set by the firmware
+# flags QUAT_UPDATE_MUL_10MS=1 and SEND_N_QUATERNIONS=1 (see
+# ALLMEMS1_config.h). Other flags change the quaternion interval.
+ST_NOTIFICATION_INTERVAL = {
+    "environment": 0.01,
+    "motion": 0.01,
+    "quaternions": 0.01,
+}
+
+# Field layout of the logged data of each ST stream. Every field is stored
+# in its own typed column, in the order listed below. Dtypes are explicitly
+# little-endian to match the byte order of the GATT transfer.
+# Gyroscope values are multiplied by 100 upon arrival, so they need 4 bytes.
+# Computed values are rounded to 2 decimals, so 4-byte floats suffice.
+ST_LOG_FIELDS = {
+    "environment": (
+        ("ticks", "<i2"),
+        ("pressure", "<i2"), ("humidity", "<i2"),
+        ("temp1", "<i2"), ("temp2", "<i2"),
+    ),
+    "motion": (
+        ("ticks", "<i2"),
+        ("acc_x", "<i2"), ("acc_y", "<i2"), ("acc_z", "<i2"),
+        ("gyr_x", "<i4"), ("gyr_y", "<i4"), ("gyr_z", "<i4"),
+        ("mag_x", "<i2"), ("mag_y", "<i2"), ("mag_z", "<i2"),
+        ("r", "<f4"), ("theta", "<f4"), ("phi", "<f4"),
+    ),
+    "quaternions": (
+        ("ticks", "<i2"),
+        ("raw_i", "<i2"), ("raw_j", "<i2"), ("raw_k", "<i2"),
+        ("norm_w", "<f4"), ("norm_i", "<f4"),
+        ("norm_j", "<f4"), ("norm_k", "<f4"),
+        ("roll", "<f4"), ("pitch", "<f4"), ("yaw", "<f4"),
+    ),
+}
+
+# Resolution of the delta mode of slow streams. A record of these streams
+# is only logged when a value changes by more than its resolution, in the
+# units received from the ST. Only session logs use delta mode.
+ST_LOG_RESOLUTION = {
+    "environment": {
+        "pressure": 0,
+        "humidity": 0,
+        "temp1": 0,
+        "temp2": 0,
+    },
+}
+
+# Layout of the GATT notification of each ST stream, as 2-byte values in
+# the order in which they are received. Gyroscope values are divided by 100
+# in the firmware, and the temperatures are swapped.
+ST_RAW_FIELDS = {
+    "environment": (
+        ("ticks", "<i2"),
+        ("pressure", "<i2"), ("humidity", "<i2"),
+        ("temp2", "<i2"), ("temp1", "<i2"),
+    ),
+    "motion": (
+        ("ticks", "<i2"),
+        ("acc_x", "<i2"), ("acc_y", "<i2"), ("acc_z", "<i2"),
+        ("gyr_x", "<i2"), ("gyr_y", "<i2"), ("gyr_z", "<i2"),
+        ("mag_x", "<i2"), ("mag_y", "<i2"), ("mag_z", "<i2"),
+    ),
+    "quaternions": (
+        ("ticks", "<i2"),
+        ("raw_i", "<i2"), ("raw_j", "<i2"), ("raw_k", "<i2"),
+    ),
+}
+
+# Smoothing filters of the ST motion values mapped to synth parameters
+# (see st_filters.py), and the smallest change of each value that counts as
+# a distinct parameter update.
+ST_FILTER_SETTINGS = {
+    "ema": {"alpha": 0.2},
+    "one_euro": {"min_cutoff": 1.0, "beta": 0.01, "d_cutoff": 1.0},
+    "median": {"size": 5},
+}
+ST_FILTER_RESOLUTION = {
+    "r": 1.0,
+    "theta": 0.5,
+    "phi": 0.5,
+}
+
+# File with the addresses of the STs of the last session, which are tried
+# first when connecting, before falling back to a scan.
+ST_ADDRESS_CACHE = 'st_addresses.json'
+
+# Auto-calibration of the mapping ranges in ST_SETTINGS (see
+# st_calibration.py). Every calibrated value is mapped between two
+# percentiles of its recent values, instead of the range between these
+# settings.
+ST_CALIBRATION_RANGES = {
+    "r": ("min_acc_magnitude", "max_acc_magnitude"),
+    "theta": ("min_tilt", "max_tilt"),
+    "phi": ("min_azimuth", "max_azimuth"),
+}
+# Minimum, maximum and resolution of the histogram of every calibrated
+# value, in the units of the samples.
+ST_CALIBRATION_BINS = {
+    "r": (0, 16000, 4.0),
+    "theta": (0, 180, 0.5),
+    "phi": (-180, 180, 0.5),
+}
+# Percentiles mapped to the ends of the ranges, seconds of data before the
+# calibrated ranges are used, and seconds after which the weight of a sample
+# is halved (None keeps the whole session).
+ST_CALIBRATION_SETTINGS = {
+    "low": 0.05,
+    "high": 0.95,
+    "warmup": 20.0,
+    "half_life": 120.0,
+}
+
+# File with the calibrated ranges of every performer.
+ST_PROFILES = 'st_profiles.json'
+
+# Range of the cutoff frequency of the low-pass filter of the Synth, in Hz,
+# on a logarithmic scale (see Synth.filt_map and ST_MAPPINGS).
+SYNTH_FILTER_RANGE = (200.0, 20000.0)
+
+# Mappings of ST values to synth parameters (see param_mapping.py). Input
+# ends are keys of ST_SETTINGS (or of the calibrated ranges), and
+# [attribute, scale] output ends scale an attribute of the Synth. Changes
+# within the tolerance of a parameter are not sent to pyo: 1ms for times,
+# 0.002 for amplitudes and balances, and 1% (about 17 cents) for the
+# cutoff frequency.
+ST_MAPPINGS = [
+    # The magnitude of acceleration controls various parameters of the
+    # envelope generator, including attack, amplitude multiplier, and
+    # duration, and the amplitude of the delay effect in the mixer.
+    {"source": "r", "input": ["min_acc_magnitude", "max_acc_magnitude"],
+     "output": [["pulse_rate", 0.9], 0.01], "target": "amp_env.setAttack",
+     "tolerance": 0.001},
+    {"source": "r", "input": ["min_acc_magnitude", "max_acc_magnitude"],
+     "output": [0.25, 0.707], "target": "amp_env.setMul",
+     "tolerance": 0.002},
+    {"source": "r", "input": ["min_acc_magnitude", "max_acc_magnitude"],
+     "output": [["pulse_rate", 0.9], 0.1], "target": "amp_env.setDur",
+     "tolerance": 0.001},
+    {"source": "r", "input": ["min_acc_magnitude", "max_acc_magnitude"],
+     "output": [0.1, 0.5], "target": "mixer.setAmp", "args": [1, 0],
+     "tolerance": 0.002},
+    # The polar angle controls the low-pass filter cutoff frequency, on the
+    # logarithmic scale of Synth.filt_map.
+    {"source": "theta", "input": ["min_tilt", "max_tilt"],
+     "output": list(SYNTH_FILTER_RANGE), "curve": "log",
+     "target": "filt.setFreq",
+     "tolerance": 0.01, "relative": True},
+    # The Azimuth angle controls the balance of reverb's dry and wet
+    # signals (i.e., unaffected and affected signals respectively).
+    {"source": "phi", "input": ["min_azimuth", "max_azimuth"],
+     "output": [0, 0.707], "target": "reverb.setBal",
+     "tolerance": 0.002},
+]
+
+# Incremental motion features (see st_features.py): seconds of the windows
+# of jerk and energy, and number of notification intervals without motion
+# samples that counts as a gap.
+ST_FEATURE_SETTINGS = {
+    "window": 0.2,
+    "gap_intervals": 3,
+}
+
 # Hand wearing the ST
 ST_WEARING_HAND = {
     "Left": 0,
@@ -7,14 +7,36 @@ detecting the tip of the index finger as a feature to control GUI elements.
 import os
 from threading import Thread
 import time
+from typing import NamedTuple, Union
 
 # Third-Party Libraries
 import cv2
+import numpy as np
 
 # Local Files
 from constants import SCALES
 import gui_assets
 from hand_tracking import HandDetector
+from thread_bridge import CoalescingBridge
+
+
+class ScreenControls(NamedTuple):
+    """ Values of the GUI controls of the Synth. """
+    bpm: int
+    subdivision: int
+    oct_base: int
+    oct_range: int
+    scale: str
+
+
+class ScreenUpdate(NamedTuple):
+    """
+    Processed camera frame, with the view and the control values after
+    processing it, published by the frame thread.
+    """
+    frame: np.ndarray
+    header_index: int
+    controls: ScreenControls
 
 
 class Screen:
@@ -71,6 +93,13 @@ class Screen:
 
         self._init_gui_controls()
 
+        # Frames and control values processed by the frame thread are handed
+        # to the event loop through a bridge, so that the loop never reads
+        # attributes the thread is changing. Must be created in a coroutine.
+        self.updates = CoalescingBridge()
+        # Sequence number of the latest update whose controls were read.
+        self._controls_seq = 0
+
         # Run frame retrieval through a separate thread.
         self.thread = Thread(target=self._update, args=())
         # A daemon thread flag is used to allow the program to exit when
@@ -166,6 +195,29 @@ class Screen:
         # self.pulse_sustain_menu.init_value(list(SYNTH_MODE.keys())[0])
         # self.st_wearing_hand_menu.init_value(list(ST_WEARING_HAND.keys())[0])
 
+    def _controls(self) -> ScreenControls:
+        """ Current values of the GUI controls. """
+        return ScreenControls(
+            self.bpm_slider.bpm,
+            self.subdivision_buttons.value,
+            self.oct_base_buttons.value,
+            self.oct_range_buttons.value,
+            self.scales_menu.get_value(),
+        )
+
+    def new_controls(self) -> Union[ScreenControls, None]:
+        """
+        Values of the GUI controls after the latest frame delivered to the
+        event loop, or None if no frame was delivered since the previous
+        call. Controls are then applied once per frame, instead of again
+        at every pulse until the next frame.
+        """
+        update = self.updates.latest.read()
+        if update.seq == self._controls_seq:
+            return None
+        self._controls_seq = update.seq
+        return update.value.controls
+
     def _update(self) -> None:
         """
         Computer Vision drawing and GUI operation logic.
@@ -194,21 +246,34 @@ class Screen:
                 if self.sensitivity > 500:
                     self.sensitivity = 0
 
+                # Hand the frame to the event loop. The thread does not
+                # change it afterwards, since every frame is a new image.
+                self.updates.publish(ScreenUpdate(
+                    self.frame, self.header_index, self._controls()
+                ))
+
             # time.sleep(self.fps)
 
     def render(self) -> None:
         """
-        Render logic
+        Render logic, run in the event loop on the latest frame delivered
+        by the frame thread.
         """
+        update = self.updates.read()
+        if update is None:
+            return
+        frame = update.frame
+
         # Display GUI controllers.
-        if self.header_index == 0:
-            self._draw_performance_gui()
+        if update.header_index == 0:
+            frame = self._draw_performance_gui(frame)
         else:
-            self._draw_settings_gui()
+            frame = self._draw_settings_gui(frame)
 
         # Overwrites a subsection of the camera image using the button
         # images that were retrieved.
-        self.frame[0: self.header.shape[0], 0: self.header.shape[1]] = self.header
+        header = self.overlay_list[update.header_index]
+        frame[0: header.shape[0], 0: header.shape[1]] = header
 
         if self.show_fps:
             self.cur_time = time.time()
@@ -218,30 +283,32 @@ class Screen:
             self.prev_tick = self.cur_tick
 
             cv2.putText(
-                self.frame, f"FPS: {int(fps)}", (25, 670),
+                frame, f"FPS: {int(fps)}", (25, 670),
                 cv2.FONT_HERSHEY_PLAIN, 3, (255, 255, 255), 2
             )
 
         # Display image in the screen context.
-        cv2.imshow('frame', self.frame)
+        cv2.imshow('frame', frame)
         cv2.waitKey(self.fps_ms)
 
-    def _draw_performance_gui(self) -> None:
+    def _draw_performance_gui(self, frame: np.ndarray) -> np.ndarray:
         """
         Draw the performance GUI controls.
         """
-        self.frame = self.bpm_slider.render(self.frame)
-        self.frame = self.subdivision_buttons.render(self.frame)
-        self.frame = self.oct_range_buttons.render(self.frame)
-        self.frame = self.oct_base_buttons.render(self.frame)
+        frame = self.bpm_slider.render(frame)
+        frame = self.subdivision_buttons.render(frame)
+        frame = self.oct_range_buttons.render(frame)
+        frame = self.oct_base_buttons.render(frame)
+        return frame
 
-    def _draw_settings_gui(self) -> None:
+    def _draw_settings_gui(self, frame: np.ndarray) -> np.ndarray:
         """
         Draw the settings GUI controls.
         """
-        self.frame = self.scales_menu.render(self.frame)
-        # self.frame = self.pulse_sustain_menu.render(self.frame)
-        # self.frame = self.st_wearing_hand_menu.render(self.frame)
+        frame = self.scales_menu.render(frame)
+        # frame = self.pulse_sustain_menu.render(frame)
+        # frame = self.st_wearing_hand_menu.render(frame)
+        return frame
 
     def _event_processing(self, lm_list):
         """
@@ -0,0 +1,122 @@
+"""
+Single-slot cell holding the latest value of a stream. Every new value
+replaces the previous one, with a sequence number and the host time it was
+put, so that consumers always use the most recent value and can tell how
+fresh it is.
+"""
+
+# Python Libraries
+import asyncio
+import time
+from typing import Any, Callable, List, NamedTuple, Union
+
+
+class Snapshot(NamedTuple):
+    """
+    Value of a LatestValue.
+    seq is the sequence number of the value, from 1 (0 before any value)
+    value is the value
+    time is the host time when the value was put, in seconds
+    """
+    seq: int
+    value: Any
+    time: float
+
+
+class LatestValue:
+    """
+    Latest value of a stream, replacing the DroppingLifoQueue the ST
+    streams used before (see bench_latest_value.py): put_nowait() only
+    overwrites the slot and wakes up waiting consumers, without queue
+    bookkeeping. get() and get_nowait() keep the interface of the queues
+    (the latest value not retrieved yet), read() and wait_newer() let any
+    number of consumers follow the values by sequence number.
+    overwritten counts the values replaced before they were retrieved with
+    get() or get_nowait().
+    Like asyncio queues, it must be used from the thread of the event loop.
+    """
+
+    __slots__ = ('seq', 'value', 'time', 'retrieved', 'overwritten',
+                 '_clock', '_waiters')
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        """ clock gives the host time of the values. """
+        self.seq = 0
+        self.value = None
+        self.time = 0.0
+        # Sequence number of the last value retrieved with get().
+        self.retrieved = 0
+        self.overwritten = 0
+        self._clock = clock
+        self._waiters: List[asyncio.Future] = []
+
+    def put_nowait(self, item: Any, host_time: Union[float, None] = None
+                   ) -> None:
+        """
+        Replace the value. host_time is when the value was captured, and
+        defaults to now.
+        """
+        if self.seq > self.retrieved:
+            self.overwritten += 1
+        self.seq += 1
+        self.value = item
+        self.time = self._clock() if host_time is None else host_time
+        if self._waiters:
+            waiters, self._waiters = self._waiters, []
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+
+    async def put(self, item: Any) -> None:
+        self.put_nowait(item)
+
+    def empty(self) -> bool:
+        """ Whether there is no value that was not retrieved yet. """
+        return self.seq == self.retrieved
+
+    def qsize(self) -> int:
+        return 0 if self.seq == self.retrieved else 1
+
+    def get_nowait(self) -> Any:
+        """
+        Latest value, if it was not retrieved yet. Raises asyncio.QueueEmpty
+        otherwise, like the queues.
+        """
+        if self.seq == self.retrieved:
+            raise asyncio.QueueEmpty
+        self.retrieved = self.seq
+        return self.value
+
+    async def get(self) -> Any:
+        """ Latest value, waiting for a new one if it was retrieved. """
+        while self.seq == self.retrieved:
+            await self._wait()
+        self.retrieved = self.seq
+        return self.value
+
+    def read(self) -> Snapshot:
+        """ Latest value, without retrieving it. """
+        return Snapshot(self.seq, self.value, self.time)
+
+    async def wait_newer(self, seq: int) -> Snapshot:
+        """ Latest value, waiting until its sequence number is above seq. """
+        while self.seq <= seq:
+            await self._wait()
+        return Snapshot(self.seq, self.value, self.time)
+
+    def age(self, host_time: Union[float, None] = None) -> float:
+        """ Seconds since the latest value was put, or inf without any. """
+        if not self.seq:
+            return float('inf')
+        return (self._clock() if host_time is None else host_time) \
+            - self.time
+
+    async def _wait(self) -> None:
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        finally:
+            # Woken waiters are already removed, cancelled ones are not.
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
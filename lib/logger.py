@@ -1,89 +1,467 @@
 """
-Logger stores sensor data into a CSV file.
+Logger stores sensor data into a CSV file or a binary session log.
 """
 
 # Python Libraries
+import asyncio
 import os
-from typing import Tuple
-import uuid
+import queue
+from operator import attrgetter, itemgetter
+from threading import Thread
+import time
+from typing import Any, Callable, Mapping, Sequence, Tuple, Union
 
 # Third-Patry Libraries
+import numpy as np
 import pandas as pd
 
+# Local Files
+import session_log
+
+
+class LogWriter:
+    """
+    Dedicated thread that writes the chunks handed over by loggers, so that
+    writing files never blocks the asyncio loop that triggers notes.
+    A single writer can be shared by the loggers of every ST stream.
+    """
+
+    def __init__(self, max_pending: int = 4) -> None:
+        """
+        max_pending is the maximum number of chunks that can wait to be
+        written. When the handoff queue is full, chunks handed over while
+        logging are dropped (and accounted for by their logger) instead of
+        blocking the loop. Final flushes wait for room instead (see
+        hand_over()).
+        """
+        self.pending = queue.Queue(maxsize=max_pending)
+
+        # Records discarded on the way in, and records that failed to be
+        # written, by every logger of the writer.
+        self.dropped_records = 0
+        self.failed_records = 0
+
+        self.thread = Thread(target=self._run, args=())
+        # A daemon thread flag is used to allow the program to exit even
+        # if a write is stuck.
+        self.thread.daemon = True
+        self.thread.start()
+
+    def submit(self, logger: "Logger", chunk: "_Chunk") -> bool:
+        """
+        Hand a chunk over to the writer thread without blocking.
+        Returns False if the handoff queue is full.
+        """
+        try:
+            self.pending.put_nowait((logger, chunk))
+        except queue.Full:
+            self.dropped_records += chunk.length
+            return False
+        return True
+
+    async def hand_over(self, logger: "Logger", chunk: "_Chunk",
+                        timeout: float = 5.0) -> bool:
+        """
+        Hand a chunk over to the writer thread, waiting for up to timeout
+        seconds for room in the handoff queue. Waiting happens in an
+        executor, so the loop is not blocked. Used by final flushes, which
+        all happen at once at shutdown and must not be dropped.
+        Returns False if the handoff queue stayed full.
+        """
+        loop = asyncio.get_running_loop()
+        handed_over = await loop.run_in_executor(
+            None, self._put, (logger, chunk), timeout
+        )
+        if not handed_over:
+            self.dropped_records += chunk.length
+        return handed_over
+
+    def _put(self, item: Any, timeout: float) -> bool:
+        """ Put an item in the handoff queue, waiting for room. """
+        try:
+            self.pending.put(item, timeout=timeout)
+        except queue.Full:
+            return False
+        return True
+
+    async def close(self, timeout: float = 5.0) -> bool:
+        """
+        Wait for pending chunks to be written, for up to timeout seconds.
+        Waiting happens in an executor, so the loop is not blocked.
+        Returns True if every chunk was written, and no records were
+        dropped or failed to be written.
+        """
+        loop = asyncio.get_running_loop()
+        joined = await loop.run_in_executor(None, self._join, timeout)
+        return joined and not self.dropped_records \
+            and not self.failed_records
+
+    def _join(self, timeout: float) -> bool:
+        """
+        Send the stop sentinel once pending chunks fit in the queue, and wait
+        for the thread to finish.
+        """
+        deadline = time.monotonic() + timeout
+        try:
+            self.pending.put(None, timeout=timeout)
+        except queue.Full:
+            return False
+        self.thread.join(max(0, deadline - time.monotonic()))
+        return not self.thread.is_alive()
+
+    def _run(self) -> None:
+        """
+        Write chunks as they become available until the stop sentinel is
+        received.
+        """
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+
+            logger, chunk = item
+            try:
+                logger._write_chunk(chunk)
+                logger.written_records += chunk.length
+            except Exception as exception:
+                logger.failed_records += chunk.length
+                self.failed_records += chunk.length
+                print(f"Error writing {logger.file_path}: {exception}")
+            finally:
+                logger._release(chunk)
+
 
 class Logger:
-    """Class to store sensor data into CSV file."""
+    """
+    Class to store sensor data into CSV file, or into a binary session log
+    if the file path has the session log extension ('.stlog').
+
+    Records are stored in a preallocated chunk of NumPy arrays, with one
+    typed column per field. Adding a record only writes each value into its
+    column, so it has a constant cost and allocates no memory. Full chunks
+    are handed over to a LogWriter thread, which builds the DataFrame and
+    writes it while the logger keeps filling a recycled chunk.
 
-    def __init__(self, file_path: str, max_record: int = 10000) -> None:
+    Slow streams can be logged in delta mode, by giving a resolution: a
+    record is only stored when a value changed by more than the resolution
+    since the last stored record. Every stored record counts how many
+    received records it stands for in an additional 'run' field, which
+    readers use to reconstruct the dense series (see session_log.py).
+    Delta mode only applies to session logs: CSV logs stay dense, since the
+    analysis notebooks read them with pd.read_csv().
+    """
+
+    def __init__(
+        self, file_path: str,
+        fields: Union[Sequence[Tuple[str, str]], None] = None,
+        max_record: int = 10000,
+        writer: Union[LogWriter, None] = None,
+        stream: str = "",
+        resolution: Union[float, Mapping[str, float], None] = None
+    ) -> None:
         """
         file_path is the path to the log file
+        fields is a sequence of (name, dtype) tuples describing each column
+        (see ST_LOG_FIELDS in constants.py). The first field holds the time
+        stamp of the record. If no fields are given, they are inferred from
+        the first record, using 8-byte ints for ticks and 8-byte floats for
+        every other value.
         max_record is the maximum number of records that can accumulate
         before they are automatically dumped to a file
+        writer is the LogWriter that writes full chunks. If none is given,
+        the logger starts its own, which is closed by Logger.close().
+        stream is the name of the ST stream, stored in session log headers.
+        resolution enables delta mode. It is either a single resolution for
+        every value, or a mapping of resolutions per field (see
+        ST_LOG_RESOLUTION in constants.py). Fields missing from the mapping
+        are stored whenever they change. It is ignored for CSV logs.
         """
-        self.data_frame_logger = None
         self.file_path = file_path
+        self.stream = stream
+        self.binary = file_path.endswith(session_log.EXTENSION)
         self.max_record = max_record
+        self.resolution = resolution if self.binary else None
+
+        self.owns_writer = writer is None
+        self.writer = writer if writer else LogWriter()
+
+        # Chunks that were written are returned to this pool to be reused.
+        # Appending and popping from a list are atomic operations, so the
+        # writer thread can safely return chunks to it.
+        self._pool = []
+        self.fields = None
+        self.chunk = None
+        if fields:
+            self._set_fields(fields)
 
-    async def add_record(self, data_frame: pd.DataFrame) -> None:
+        # In delta mode, the last received changed record is kept open, and
+        # run counts how many received records it stands for.
+        self._pending = None
+        self._run = 0
+
+        # Accounting of what happened to every record, and of the longest
+        # time the loop was held when handing over a chunk.
+        self.received_records = 0
+        self.stored_records = 0
+        self.written_records = 0
+        self.dropped_records = 0
+        self.failed_records = 0
+        self.max_stall = 0.0
+
+    def _set_fields(self, fields: Sequence[Tuple[str, str]]) -> None:
         """
-        Add_record uses the ability to combine two dataframes together
-        if the there is no dataframe created, the first dataframes forms the
-        main table.
+        Set the field layout and allocate the first chunk. In delta mode,
+        the run field is added, and the resolution of every value is set.
         """
-        if self.data_frame_logger is None:
-            self.data_frame_logger = data_frame
-        else:
-            self.data_frame_logger = pd.concat(
-                [self.data_frame_logger, data_frame],
-                axis=0, join='outer'
-            )
+        self.fields = tuple(fields)
+        names = [name for name, _ in fields[1:]]
+
+        # Values are read in a single call, in the order of the fields:
+        # by key from dictionaries, and by attribute from samples (see
+        # st_samples.py), which skips their mapping interface.
+        self._read_items = _reader(itemgetter, names)
+        self._read_attributes = _reader(attrgetter, names)
+
+        if self.resolution is not None:
+            self.fields += (session_log.RUN_FIELD,)
+
+            if isinstance(self.resolution, Mapping):
+                self._resolutions = [
+                    self.resolution.get(name, 0) for name in names
+                ]
+            else:
+                self._resolutions = [self.resolution] * len(names)
+
+        self.chunk = _Chunk(self.fields, self.max_record)
+
+    @property
+    def length(self) -> int:
+        """ Number of records in the current chunk. """
+        return self.chunk.length if self.chunk else 0
+
+    @property
+    def compression(self) -> float:
+        """ Ratio of received records to stored records. """
+        stored = self.stored_records + (1 if self._run else 0)
+        return self.received_records / stored if stored else 1.0
+
+    async def add_record(self, data: Tuple[int, Mapping]) -> None:
+        """
+        Add a (time stamp, values) tuple as retrieved from the SensorTile
+        to the current chunk. When the chunk is full, it is handed over to
+        the writer thread.
+        """
+        if not data or len(data) != 2:
+            # Raise a value error if invalid data is passed into the function
+            raise ValueError("Data is null or incorrect shape for logging.")
+
+        if self.chunk is None:
+            self._set_fields((("ticks", "<i8"),) + tuple(
+                (name, "<f8") for name in data[1]
+            ))
 
-        if len(self.data_frame_logger) > self.max_record:
-            await self.write_log()
-            self.data_frame_logger = None
+        self.received_records += 1
 
-    async def write_log(self) -> None:
+        if self.resolution is None:
+            if self._store(data[0], data[1], 0):
+                self._hand_over()
+            return
+
+        # Delta mode: extend the open run while values do not change.
+        if self._run and not self._changed(data[1]):
+            self._run += 1
+            return
+
+        if self._run and self._store(self._pending[0], self._pending[1],
+                                     self._run):
+            self._hand_over()
+        self._pending = data
+        self._run = 1
+
+    def _changed(self, values: Mapping) -> bool:
+        """
+        Whether any value moved beyond its resolution since the open run.
         """
-        Write data to a CSV file.
+        last = self._pending[1]
+        read = self._read_items if type(last) is dict \
+            else self._read_attributes
+        for value, last_value, resolution in zip(
+                read(values), read(last), self._resolutions):
+            if abs(value - last_value) > resolution:
+                return True
+        return False
+
+    def _store(self, ticks: int, values: Mapping, run: int) -> bool:
+        """
+        Write a record into the current chunk. Returns True if the chunk is
+        full, and must be handed over to the writer thread.
+        """
+        chunk = self.chunk
+        row = chunk.length
+        chunk.ticks[row] = ticks
+        read = self._read_items if type(values) is dict \
+            else self._read_attributes
+        for column, value in zip(chunk.value_columns, read(values)):
+            column[row] = value
+        if chunk.run is not None:
+            chunk.run[row] = run
+        chunk.length = row + 1
+        self.stored_records += 1
+        return chunk.length >= self.max_record
+
+    async def write_log(self, timeout: float = 5.0) -> None:
+        """
+        Hand all records over to the writer thread, including the open run
+        in delta mode, and continue with an empty chunk. Unlike full chunks,
+        the records wait for up to timeout seconds for room in the writer
+        queue, so that flushes at shutdown are not dropped.
         """
+        if self._run:
+            # The chunk always has room for a record, since it is handed
+            # over as soon as it is full.
+            self._store(self._pending[0], self._pending[1], self._run)
+            self._pending = None
+            self._run = 0
+
         # If there are no records to write, the logger just returns
-        if self.data_frame_logger is None:
+        if not self.length:
             return
-        # Write data to existing file.
-        elif os.path.isfile(self.file_path):
-            self.data_frame_logger.to_csv(
-                self.file_path, mode='a', header=False
-            )
-        # Create file if it doesn't exist.
+
+        # Records added while waiting go to the next chunk.
+        chunk = self.chunk
+        self.chunk = self._next_chunk()
+        if not await self.writer.hand_over(self, chunk, timeout):
+            self.dropped_records += chunk.length
+            self._release(chunk)
+
+    def _hand_over(self) -> None:
+        """
+        Hand the current chunk over to the writer thread, and continue with
+        an empty chunk. If the writer cannot keep up, the chunk is dropped.
+        """
+        # If there are no records to write, the logger just returns
+        if not self.length:
+            return
+
+        start = time.perf_counter()
+
+        chunk = self.chunk
+        if self.writer.submit(self, chunk):
+            self.chunk = self._next_chunk()
         else:
-            self.data_frame_logger.to_csv(
-                self.file_path, mode='a', header=True
+            # Backpressure: the records are discarded and the chunk is
+            # reused, so memory stays bounded.
+            self.dropped_records += chunk.length
+            chunk.length = 0
+
+        self.max_stall = max(self.max_stall, time.perf_counter() - start)
+
+    def _next_chunk(self) -> "_Chunk":
+        """ Empty chunk from the pool, or a new one. """
+        return self._pool.pop() if self._pool \
+            else _Chunk(self.fields, self.max_record)
+
+    async def close(self, timeout: float = 5.0) -> bool:
+        """
+        Hand over the remaining records, and if the logger owns its writer,
+        wait for up to timeout seconds for them to be written.
+        """
+        await self.write_log(timeout)
+        if self.owns_writer:
+            return await self.writer.close(timeout)
+        return True
+
+    def report(self) -> str:
+        """
+        Summary of the logged records and the longest loop stall.
+        """
+        return (
+            f"{os.path.basename(self.file_path)}: "
+            f"{self.written_records} records written, "
+            f"{self.dropped_records} dropped, "
+            f"{self.failed_records} failed, "
+            f"{self.length} unwritten; "
+            + (f"delta compression {self.compression:.1f}x; "
+               if self.resolution is not None else "")
+            + f"max flush stall {self.max_stall * 1000:.3f}ms"
+        )
+
+    def to_data_frame(self) -> pd.DataFrame:
+        """
+        Build a pandas DataFrame from the records of the current chunk.
+        """
+        if self.chunk is None:
+            return pd.DataFrame()
+        return self.chunk.to_data_frame()
+
+    def _write_chunk(self, chunk: "_Chunk") -> None:
+        """
+        Write the records of a chunk to the log file. Called from the writer
+        thread.
+        """
+        if self.binary:
+            session_log.append_records(
+                self.file_path, self.stream, self.fields,
+                chunk.columns, chunk.length
             )
+            return
+
+        data_frame = chunk.to_data_frame()
 
-    def new_record(self, data: Tuple[int, dict]) -> pd.DataFrame:
+        # Write data to existing file, or create the file (including the
+        # header) if it doesn't exist.
+        data_frame.to_csv(
+            self.file_path, mode='a',
+            header=not os.path.isfile(self.file_path)
+        )
+
+    def _release(self, chunk: "_Chunk") -> None:
         """
-        This method creates a pandas dataframe. The pandas dataframe
-        can be added as a record(s) to an existing dataframe.
+        Return a written chunk to the pool. Called from the writer thread.
         """
-        if data and len(data) == 2:
-            # Grabbing the column headings from the tuples
-            # lists can be concatenated through the addition sign
-            columns = ['ticks'] + list(data[1].keys())
-            # Retrieving the column values from the data tuple
-            all_data = [data[0]] + list(data[1].values())
+        chunk.length = 0
+        self._pool.append(chunk)
+
+
+def _reader(getter: Callable, names: Sequence[str]) -> Callable[[Any], tuple]:
+    """
+    Build an itemgetter or attrgetter that always returns a tuple of the
+    named values, even for a single name.
+    """
+    read = getter(*names)
+    if len(names) == 1:
+        return lambda values: (read(values),)
+    return read
 
-        else:
-            # Raise a value error if invalid data is passed into the function
-            raise ValueError("Data is null or incorrect shape for logging.")
 
-        # Using zip to create a new dictionary that form the row for the
-        # data frame
-        record = dict(zip(columns, all_data))
-        # Uniquely identify all the records by creating a UUID column
-        # Makes data matching more simple
-        record_uuid = uuid.uuid4()
+class _Chunk:
+    """
+    Preallocated block of records, with one typed column per field.
+    """
 
-        # returning a pandas dataframe to be merged with other data frames
-        data_frame = pd.DataFrame(record, index=[str(record_uuid)])
+    def __init__(self, fields: Sequence[Tuple[str, str]], size: int) -> None:
+        self.columns = {
+            name: np.zeros(size, dtype=dtype) for name, dtype in fields
+        }
+        # The time stamp column is filled from the first tuple value, and
+        # the rest from the values of the record, in the order of the
+        # fields. Keeping a list of columns avoids dictionary lookups per
+        # column. The run column of delta mode is filled by the logger.
+        self.ticks = self.columns[fields[0][0]]
+        self.run = self.columns.get(session_log.RUN_FIELD[0])
+        self.value_columns = [
+            self.columns[name] for name, _ in fields[1:]
+            if name != session_log.RUN_FIELD[0]
+        ]
+        self.length = 0
 
-        return data_frame
+    def to_data_frame(self) -> pd.DataFrame:
+        """
+        Build a pandas DataFrame from the records of the chunk.
+        The layout matches previously written logs: one column per field,
+        indexed by a UUID per record.
+        """
+        return session_log.records_to_data_frame({
+            name: column[:self.length]
+            for name, column in self.columns.items()
+        })
@@ -0,0 +1,72 @@
+"""
+Dirty-checking of synth parameter updates.
+
+Every pyo setter call crosses into the C layer and takes the lock of the
+audio server, even when the value barely changed (e.g., while the ST is
+still). A ParameterBinding remembers the last value sent to its setter, and
+skips updates that change less than a tolerance, absolute or relative to
+the last value. Updates are compared to the last value sent, so slow
+drifts are still sent once they add up to the tolerance. Sent and
+suppressed updates are counted, to tune the tolerances.
+"""
+
+# Python Libraries
+from typing import Callable, Iterable, Tuple, Union
+
+
+class ParameterBinding:
+    """ Setter of a synth parameter that skips insignificant updates. """
+
+    __slots__ = ('setter', 'args', 'tolerance', 'relative', 'name', 'last',
+                 'sent', 'suppressed')
+
+    def __init__(self, setter: Callable, args: Tuple = (),
+                 tolerance: float = 0.0, relative: bool = False,
+                 name: Union[str, None] = None) -> None:
+        """
+        setter is called with args followed by the value
+        tolerance is the largest change that is not sent. With the default
+        of 0, only repeated values are skipped.
+        relative is whether the tolerance is a fraction of the last value
+        (e.g., for frequencies) instead of an absolute change
+        name identifies the parameter in reports
+        """
+        self.setter = setter
+        self.args = tuple(args)
+        self.tolerance = tolerance
+        self.relative = relative
+        self.name = name if name is not None \
+            else getattr(setter, '__qualname__', repr(setter))
+        self.last = None
+        self.sent = 0
+        self.suppressed = 0
+
+    def send(self, value: float) -> bool:
+        """ Call the setter unless the value is within the tolerance. """
+        last = self.last
+        if last is not None:
+            limit = self.tolerance * abs(last) if self.relative \
+                else self.tolerance
+            if abs(value - last) <= limit:
+                self.suppressed += 1
+                return False
+        self.setter(*self.args, value)
+        self.last = value
+        self.sent += 1
+        return True
+
+    def invalidate(self) -> None:
+        """ Send the next value whatever it is (e.g., after a reset). """
+        self.last = None
+
+    def report(self) -> str:
+        """ Sent and suppressed updates for the console. """
+        total = self.sent + self.suppressed
+        share = self.suppressed / total * 100 if total else 0.0
+        return (f"{self.name}: {self.sent} sent, {self.suppressed} "
+                f"suppressed ({share:.0f}%)")
+
+
+def report_bindings(bindings: Iterable[ParameterBinding]) -> str:
+    """ Report of several bindings, one per line, for the console. """
+    return "\n".join(f"\t{binding.report()}" for binding in bindings)
@@ -0,0 +1,287 @@
+"""
+Declarative mappings of ST values to synth parameters.
+
+A mapping table (see ST_MAPPINGS in constants.py, or a JSON file with the
+same list) describes every mapping with:
+* 'source': name of the mapped value (e.g., 'r', 'theta', 'phi', or a
+  motion feature such as 'jerk', see st_features.py)
+* 'input': the ends of the input range, as numbers or keys of the mapping
+  ranges (e.g., ST_SETTINGS, or the calibrated ranges)
+* 'output': the ends of the output range, as numbers or [attribute, scale]
+  pairs, which scale an attribute of the synth read at every tick (e.g.,
+  ['pulse_rate', 0.9])
+* 'curve': 'linear' (default), 'log' (geometric interpolation between
+  positive ends, like pyo.Map), 'exp' (exponential with a 'steepness',
+  3 by default) or 'table' (piecewise linear 'points', as [input, output]
+  pairs with inputs between 0 and 1)
+* 'target': dotted path of the setter of the synth (e.g.,
+  'amp_env.setAttack'), with optional leading 'args' (e.g., [1, 0] for
+  'mixer.setAmp')
+* 'tolerance': largest change of the output that is not sent to the
+  setter (0 by default, which skips repeated values), relative to the last
+  sent value if 'relative' is true (see param_binding.py)
+
+Input values are clamped to their range, as np.interp does. The table is
+compiled once into plain float closures, so that mapping a tick does not
+re-read the table nor call NumPy for scalars. NaN values leave their
+parameters unchanged.
+"""
+
+# Python Libraries
+from bisect import bisect_right
+import json
+import math
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, \
+    Sequence, Set, Tuple, Union
+
+# Local Files
+from param_binding import ParameterBinding, report_bindings
+
+
+CURVES = ('linear', 'log', 'exp', 'table')
+
+
+class MappingSpec(NamedTuple):
+    """ Mapping of a source value to a synth setter (see module docstring). """
+    source: str
+    input: Tuple[Any, Any]
+    output: Tuple[Any, Any]
+    target: str
+    curve: str = 'linear'
+    args: Tuple = ()
+    steepness: float = 3.0
+    points: Tuple[Tuple[float, float], ...] = ()
+    tolerance: float = 0.0
+    relative: bool = False
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> "MappingSpec":
+        """ Validated mapping from an entry of a mapping table. """
+        try:
+            spec = cls(
+                source=str(config['source']),
+                input=tuple(config['input']),
+                output=tuple(config.get('output', (0.0, 1.0))),
+                target=str(config['target']),
+                curve=config.get('curve', 'linear'),
+                args=tuple(config.get('args', ())),
+                steepness=float(config.get('steepness', 3.0)),
+                points=tuple(
+                    (float(x), float(y)) for x, y in config.get('points', ())
+                ),
+                tolerance=float(config.get('tolerance', 0.0)),
+                relative=bool(config.get('relative', False)),
+            )
+        except (KeyError, TypeError, ValueError) as exception:
+            raise ValueError(f"Invalid mapping {config}: {exception!r}")
+
+        if len(spec.input) != 2 or len(spec.output) != 2:
+            raise ValueError(f"Mapping of {spec.source} to {spec.target} "
+                             "needs two input and two output ends.")
+        if spec.tolerance < 0:
+            raise ValueError(f"Mapping of {spec.source} to {spec.target} "
+                             "needs a positive tolerance.")
+        if spec.curve not in CURVES:
+            raise ValueError(f"Unknown curve '{spec.curve}', expected one "
+                             f"of {CURVES}.")
+        if spec.curve == 'table' and len(spec.points) < 2:
+            raise ValueError(f"Table mapping of {spec.source} to "
+                             f"{spec.target} needs at least two points.")
+        if spec.curve == 'log' and any(
+                not isinstance(end, (list, tuple)) and end <= 0
+                for end in spec.output):
+            raise ValueError(f"Log mapping of {spec.source} to "
+                             f"{spec.target} needs positive output ends.")
+        return spec
+
+
+def load_mappings(path: str) -> List[Dict[str, Any]]:
+    """ Mapping table saved as a JSON list. """
+    with open(path) as file:
+        table = json.load(file)
+    if not isinstance(table, list):
+        raise ValueError(f"{path} is not a list of mappings.")
+    return table
+
+
+class ParameterMapper:
+    """
+    Mapping table compiled against a synth and the mapping ranges. The
+    ranges are read at every tick, so that calibrated ranges (see
+    st_calibration.py) are used as soon as they are updated in place.
+    """
+
+    def __init__(self, table: Sequence[Union[Mapping[str, Any], MappingSpec]],
+                 root: Any, settings: Mapping[str, float]) -> None:
+        """
+        table is the list of mappings
+        root is the object the targets and output attributes belong to
+        (i.e., the Synth)
+        settings are the mapping ranges the input ends refer to
+        """
+        self.specs = [
+            spec if isinstance(spec, MappingSpec)
+            else MappingSpec.from_config(spec) for spec in table
+        ]
+        self.root = root
+        self.settings = settings
+        self.compiled = [self._compile(spec) for spec in self.specs]
+        self.bindings = [binding for _, binding in self.compiled]
+
+    @property
+    def sources(self) -> Set[str]:
+        """ Names of the values the mappings read. """
+        return {spec.source for spec in self.specs}
+
+    def evaluate(self, values: Mapping[str, float]) -> List[float]:
+        """ Output of every mapping, without setting the parameters. """
+        return [evaluate(values) for evaluate, _ in self.compiled]
+
+    def apply(self, values: Mapping[str, float]) -> None:
+        """
+        Set every mapped parameter from the source values, unless it
+        changes less than its tolerance.
+        """
+        for evaluate, binding in self.compiled:
+            value = evaluate(values)
+            if value == value:
+                binding.send(value)
+
+    def invalidate(self) -> None:
+        """ Send every parameter at the next tick. """
+        for binding in self.bindings:
+            binding.invalidate()
+
+    def report(self) -> str:
+        """ Sent and suppressed updates of every parameter. """
+        return report_bindings(self.bindings)
+
+    def _resolve(self, path: str) -> Any:
+        """ Attribute of the root at a dotted path. """
+        target = self.root
+        for name in path.split('.'):
+            try:
+                target = getattr(target, name)
+            except AttributeError:
+                raise ValueError(f"Mapping target '{path}' does not exist.")
+        return target
+
+    def _compile(self, spec: MappingSpec
+                 ) -> Tuple[Callable[[Mapping[str, float]], float],
+                            ParameterBinding]:
+        """ (evaluate, binding of the setter) of a mapping. """
+        settings = self.settings
+        for end in spec.input:
+            if isinstance(end, str) and end not in settings:
+                raise ValueError(f"Unknown mapping range '{end}' for "
+                                 f"{spec.source}.")
+        source = spec.source
+        low, high = spec.input
+        low_key = low if isinstance(low, str) else None
+        high_key = high if isinstance(high, str) else None
+
+        def normalize(values: Mapping[str, float]) -> float:
+            """ Source value in its range, between 0 and 1 (or NaN). """
+            x = values[source]
+            a = settings[low_key] if low_key is not None else low
+            b = settings[high_key] if high_key is not None else high
+            if a == b:
+                return 0.0 if x <= a else 1.0 if x > a else x
+            t = (x - a) / (b - a)
+            return 0.0 if t < 0.0 else 1.0 if t > 1.0 else t
+
+        curve = self._curve(spec)
+        binding = ParameterBinding(
+            self._resolve(spec.target), spec.args, spec.tolerance,
+            spec.relative, name=spec.target
+        )
+        return curve(normalize), binding
+
+    def _output(self, end: Any) -> Union[float, Callable[[], float]]:
+        """ Constant output end, or a function of a synth attribute. """
+        if isinstance(end, (list, tuple)):
+            attribute, scale = end
+            path, _, name = attribute.rpartition('.')
+            owner = self._resolve(path) if path else self.root
+            scale = float(scale)
+            return lambda: getattr(owner, name) * scale
+        return float(end)
+
+    def _curve(self, spec: MappingSpec) -> Callable:
+        """
+        Function making the evaluation of a mapping from its normalizing
+        function.
+        """
+        low, high = (self._output(end) for end in spec.output)
+        dynamic = callable(low) or callable(high)
+        low_end = low if callable(low) else (lambda: low)
+        high_end = high if callable(high) else (lambda: high)
+
+        if spec.curve == 'table':
+            xs = [x for x, _ in spec.points]
+            ys = [y for _, y in spec.points]
+            last = len(xs) - 1
+
+            def make(normalize):
+                def evaluate(values):
+                    t = normalize(values)
+                    if t != t:
+                        return t
+                    i = bisect_right(xs, t)
+                    if i == 0:
+                        return ys[0]
+                    if i > last:
+                        return ys[last]
+                    x0, x1 = xs[i - 1], xs[i]
+                    return ys[i - 1] + (ys[i] - ys[i - 1]) * (t - x0) \
+                        / (x1 - x0)
+                return evaluate
+            return make
+
+        if spec.curve == 'exp':
+            steepness = spec.steepness
+            scale = 1 / math.expm1(steepness)
+            shape = lambda t: math.expm1(steepness * t) * scale
+        else:
+            shape = None
+
+        if not dynamic:
+            # Constant ends are folded into the closure.
+            if spec.curve == 'log':
+                ratio = math.log(high / low)
+
+                def make(normalize):
+                    return lambda values: low * math.exp(
+                        ratio * normalize(values))
+            elif shape is not None:
+                span = high - low
+
+                def make(normalize):
+                    return lambda values: low + span * shape(
+                        normalize(values))
+            else:
+                span = high - low
+
+                def make(normalize):
+                    return lambda values: low + span * normalize(values)
+            return make
+
+        if spec.curve == 'log':
+            def make(normalize):
+                def evaluate(values):
+                    a = low_end()
+                    return a * (high_end() / a) ** normalize(values)
+                return evaluate
+        elif shape is not None:
+            def make(normalize):
+                def evaluate(values):
+                    a = low_end()
+                    return a + (high_end() - a) * shape(normalize(values))
+                return evaluate
+        else:
+            def make(normalize):
+                def evaluate(values):
+                    a = low_end()
+                    return a + (high_end() - a) * normalize(values)
+                return evaluate
+        return make
@@ -0,0 +1,132 @@
+"""
+Fixed-capacity ring buffer of rows (e.g., ST motion samples or hand
+landmarks) that exposes the most recent rows as a contiguous array, without
+copying, for windowed features and sequence models.
+
+Every row is written twice, at its position in the ring and one capacity
+further, so that the last rows of the ring are always contiguous in memory
+at the end of the second copy. Appending a row costs two row writes,
+whatever the capacity.
+"""
+
+# Python Libraries
+from typing import Mapping, Sequence, Union
+
+# Third-Party Libraries
+import numpy as np
+
+
+class WindowRing:
+    """
+    Last 'capacity' rows of a stream, of shape 'row_shape' (e.g., 126 for
+    the landmarks of two hands, or the number of fields of a sample).
+    window() views the most recent rows as a (rows, *row_shape) array. The
+    view is read-only, and is only valid until the following append: it
+    must be copied to be kept.
+    """
+
+    def __init__(self, capacity: int, row_shape: Union[int, Sequence[int]] = (),
+                 dtype=np.float64,
+                 fields: Union[Sequence[str], None] = None) -> None:
+        """
+        capacity is the number of rows kept
+        row_shape is the shape of every row, () for scalar rows
+        dtype is the type of the values
+        fields are the names of the columns of the rows, to append columns
+        of samples (see extend_columns())
+        """
+        if capacity < 1:
+            raise ValueError("WindowRing capacity must be positive")
+        if isinstance(row_shape, int):
+            row_shape = (row_shape,)
+        if fields is not None:
+            row_shape = (len(fields),)
+        self.capacity = capacity
+        self.row_shape = tuple(row_shape)
+        self.fields = tuple(fields) if fields is not None else None
+        self.data = np.zeros((2 * capacity,) + self.row_shape, dtype=dtype)
+        self.end = 0
+        self.count = 0
+        self.appended = 0
+
+    @classmethod
+    def for_fields(cls, fields: Sequence[str], capacity: int,
+                   dtype=np.float64) -> "WindowRing":
+        """ Ring of samples with the given fields (see st_samples.py). """
+        return cls(capacity, dtype=dtype, fields=fields)
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def full(self) -> bool:
+        return self.count == self.capacity
+
+    def clear(self) -> None:
+        """ Forget every row. """
+        self.end = 0
+        self.count = 0
+
+    def append(self, row) -> None:
+        """ Add a row, replacing the oldest one if the ring is full. """
+        end = self.end
+        data = self.data
+        data[end] = row
+        data[end + self.capacity] = row
+        end += 1
+        self.end = end if end < self.capacity else 0
+        if self.count < self.capacity:
+            self.count += 1
+        self.appended += 1
+
+    def append_sample(self, sample) -> None:
+        """ Add the fields of a sample (see st_samples.py) as a row. """
+        self.append([getattr(sample, field) for field in self.fields])
+
+    def extend(self, rows) -> None:
+        """
+        Add a block of rows, of shape (count, *row_shape), with at most two
+        copies per half of the ring.
+        """
+        rows = np.asarray(rows)
+        count = len(rows)
+        if not count:
+            return
+        self.appended += count
+        capacity, data, end = self.capacity, self.data, self.end
+        if count > capacity:
+            rows = rows[-capacity:]
+            count = capacity
+
+        first = min(count, capacity - end)
+        data[end:end + first] = rows[:first]
+        data[end + capacity:end + capacity + first] = rows[:first]
+        rest = count - first
+        if rest:
+            data[:rest] = rows[first:]
+            data[capacity:capacity + rest] = rows[first:]
+        self.end = (end + count) % capacity
+        self.count = min(self.count + count, capacity)
+
+    def extend_columns(self, columns: Mapping[str, np.ndarray]) -> None:
+        """
+        Add a block of samples as columns (e.g., SensorTile.take_block(),
+        see st_decode.py), keeping the fields of the ring.
+        """
+        self.extend(np.column_stack([columns[field] for field in self.fields]))
+
+    def window(self, length: Union[int, None] = None) -> np.ndarray:
+        """
+        Most recent rows, oldest first, as a contiguous read-only view: the
+        last length rows, or every row kept.
+        """
+        count = self.count if length is None else min(length, self.count)
+        stop = self.end + self.capacity
+        view = self.data[stop - count:stop]
+        view.flags.writeable = False
+        return view
+
+    def column(self, field: str, length: Union[int, None] = None
+               ) -> np.ndarray:
+        """ Most recent values of a field, as a read-only view. """
+        return self.window(length)[:, self.fields.index(field)]
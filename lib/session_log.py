@@ -0,0 +1,427 @@
+"""
+Compact binary session logs for SensorTile streams.
+
+A session log is an append-only file made of a small header followed by
+fixed-width little-endian records:
+
+    8 bytes     magic number b'STCVLOG\\0'
+    2 bytes     format version (uint16)
+    4 bytes     length of the JSON description that follows (uint32)
+    n bytes     JSON description: {"stream": ..., "fields": [[name, dtype]]}
+                padded with spaces so that records start at a multiple of 8
+
+Every record stores its fields packed in the described order, with the
+dtypes of ST_LOG_FIELDS in constants.py. Logs written in delta mode (see
+Logger) have an additional 'run' field, with the number of received records
+each stored record stands for. Readers expand them into the dense series.
+
+SessionLogReader memory-maps a session log, so that ranges of ticks or of
+time can be sliced out of multi-hour sessions without loading them, e.g.:
+
+    reader = SessionLogReader('renders/A_dorian_bpm100_00_motion.stlog')
+    window = reader.time_range(60, 65)     # view of records 60s to 65s
+    acc_x = window['acc_x']                # view of a single column
+"""
+
+# Python Libraries
+import json
+import os
+from struct import Struct
+from typing import Iterator, Mapping, Sequence, Tuple, Union
+import uuid
+
+# Third-Party Libraries
+import numpy as np
+import pandas as pd
+
+# Local Files
+from constants import ST_LOG_FIELDS, ST_TICK_PERIOD, ST_TICK_WRAP
+
+
+MAGIC = b'STCVLOG\0'
+VERSION = 1
+EXTENSION = '.stlog'
+
+# Field of delta mode logs counting the received records of each record.
+RUN_FIELD = ("run", "<u4")
+
+# Magic number, version and length of the JSON description.
+_PREAMBLE = Struct('<8sHI')
+
+# Computed sensor values are rounded to 2 decimals when they are received.
+# 4-byte float columns are rounded back to this precision when exported,
+# so that the written text matches the received values.
+FLOAT_DECIMALS = 2
+
+
+def record_dtype(fields: Sequence[Tuple[str, str]]) -> np.dtype:
+    """
+    Packed NumPy structured dtype for a sequence of (name, dtype) fields.
+    """
+    return np.dtype([(name, dtype) for name, dtype in fields])
+
+
+def encode_header(stream: str, fields: Sequence[Tuple[str, str]]) -> bytes:
+    """
+    Build the header of a session log.
+    """
+    description = json.dumps(
+        {"stream": stream, "fields": [list(field) for field in fields]}
+    ).encode()
+    # Pad the description so that records start 8-byte aligned.
+    padding = -(_PREAMBLE.size + len(description)) % 8
+    description += b' ' * padding
+
+    return _PREAMBLE.pack(MAGIC, VERSION, len(description)) + description
+
+
+def read_header(file_path: str) -> Tuple[dict, int]:
+    """
+    Read the header of a session log. Returns the JSON description and the
+    offset in bytes at which records start.
+    """
+    with open(file_path, 'rb') as log_file:
+        magic, version, length = _PREAMBLE.unpack(
+            log_file.read(_PREAMBLE.size)
+        )
+        if magic != MAGIC:
+            raise ValueError(f"{file_path} is not an STCV session log.")
+        if version != VERSION:
+            raise ValueError(
+                f"Unsupported session log version {version} in {file_path}."
+            )
+        description = json.loads(log_file.read(length))
+
+    description["fields"] = [tuple(field) for field in description["fields"]]
+    return description, _PREAMBLE.size + length
+
+
+def append_records(
+    file_path: str, stream: str, fields: Sequence[Tuple[str, str]],
+    columns: Mapping[str, np.ndarray], length: int
+) -> None:
+    """
+    Append the first length values of every column to a session log.
+    The header is written if the file does not exist yet.
+    """
+    records = np.empty(length, dtype=record_dtype(fields))
+    for name, _ in fields:
+        records[name] = columns[name][:length]
+
+    with open(file_path, 'ab') as log_file:
+        if log_file.tell() == 0:
+            log_file.write(encode_header(stream, fields))
+        log_file.write(records.tobytes())
+
+
+def append_bytes(
+    file_path: str, stream: str, fields: Sequence[Tuple[str, str]],
+    data: Union[bytes, bytearray, memoryview]
+) -> None:
+    """
+    Append records that are already packed in the layout of the given
+    fields to a session log. The header is written if the file does not
+    exist yet.
+    """
+    if len(data) % record_dtype(fields).itemsize:
+        raise ValueError("Data is not a whole number of records.")
+
+    with open(file_path, 'ab') as log_file:
+        if log_file.tell() == 0:
+            log_file.write(encode_header(stream, fields))
+        log_file.write(data)
+
+
+def read_records(
+    file_path: str, expand: bool = True
+) -> Tuple[dict, np.ndarray]:
+    """
+    Read a whole session log into memory. Returns the JSON description and
+    a structured array of records. Delta mode logs are expanded into the
+    dense series, unless expand is False.
+    """
+    description, offset = read_header(file_path)
+    records = np.fromfile(
+        file_path, dtype=record_dtype(description["fields"]), offset=offset
+    )
+    if expand and RUN_FIELD[0] in records.dtype.names:
+        records = expand_runs(records)
+    return description, records
+
+
+def expand_runs(records: np.ndarray) -> np.ndarray:
+    """
+    Reconstruct the dense series of a delta mode log. Every record is
+    repeated as many times as its run, and the time stamps of the repeated
+    records are interpolated between the start of consecutive runs. The
+    last run is spaced with the average period of the preceding records.
+    """
+    runs = records[RUN_FIELD[0]].astype(np.int64)
+    names = [name for name in records.dtype.names if name != RUN_FIELD[0]]
+    dtype = np.dtype([(name, records.dtype[name]) for name in names])
+
+    dense = np.empty(int(runs.sum()), dtype=dtype)
+    for name in names:
+        dense[name] = np.repeat(records[name], runs)
+    if not len(dense):
+        return dense
+
+    # Time stamps within each run.
+    tick_field = names[0]
+    starts = unwrap_ticks(records[tick_field])
+    preceding = len(dense) - runs[-1]
+    period = (starts[-1] - starts[0]) / preceding if preceding else 0
+    ends = np.append(starts[1:], starts[-1] + runs[-1] * period)
+
+    steps = np.arange(len(dense)) - np.repeat(np.cumsum(runs) - runs, runs)
+    ticks = np.repeat(starts, runs) + np.round(
+        steps * np.repeat((ends - starts) / runs, runs)
+    ).astype(np.int64)
+    dense[tick_field] = wrap_ticks(ticks, dense.dtype[tick_field])
+    return dense
+
+
+class SessionLogReader:
+    """
+    Memory-mapped reader of a session log.
+
+    Records are never loaded as a whole. Instead, a sparse index keeps the
+    unwrapped time stamp of one every index_stride records, so that tick and
+    time ranges are located by searching the index and then unwrapping a
+    single stride of ticks. Slices are returned as views of the mapped file.
+    The reader sees the records that existed when it was opened.
+    """
+
+    def __init__(self, file_path: str, index_stride: int = 4096) -> None:
+        """
+        file_path is the path to a session log
+        index_stride is the number of records between index entries
+        """
+        self.file_path = file_path
+        description, offset = read_header(file_path)
+        self.stream = description["stream"]
+        self.fields = description["fields"]
+        self.dtype = record_dtype(self.fields)
+
+        # Memory-mapping an empty region is not possible.
+        count = (os.path.getsize(file_path) - offset) // self.dtype.itemsize
+        self.records = np.memmap(
+            file_path, dtype=self.dtype, mode='r', offset=offset,
+            shape=(count,)
+        ) if count else np.empty(0, dtype=self.dtype)
+
+        # Delta mode logs are expanded into memory. They only hold slow
+        # streams, whose records rarely change.
+        if RUN_FIELD[0] in self.dtype.names:
+            self.records = expand_runs(self.records)
+            self.fields = [field for field in self.fields
+                           if field[0] != RUN_FIELD[0]]
+            self.dtype = self.records.dtype
+
+        # The first field holds the time stamp of every record.
+        self.tick_field = self.fields[0][0]
+        self.index_stride = index_stride
+        self._build_index()
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __getitem__(self, key) -> np.ndarray:
+        """
+        Index records by position or slice, or get a column by field name.
+        """
+        return self.records[key]
+
+    def _build_index(self) -> None:
+        """
+        Scan the time stamps one stride at a time, and keep the unwrapped
+        time stamp of the first record of every stride.
+        """
+        positions = np.arange(0, len(self), self.index_stride)
+        self.index_ticks = np.empty(len(positions), dtype=np.int64)
+
+        first = None
+        for i, position in enumerate(positions):
+            # Include the first record of the next stride, so that the
+            # unwrapped time stamp carries over to it.
+            ticks = unwrap_ticks(
+                self.records[self.tick_field][
+                    position:position + self.index_stride + 1
+                ],
+                first
+            )
+            self.index_ticks[i] = ticks[0]
+            first = ticks[-1]
+
+        self.index_positions = positions
+        # Unwrapped time stamp of the first record.
+        self.start_tick = int(self.index_ticks[0]) if len(self) else 0
+
+    def unwrapped_ticks(self, start: int = 0, stop: int = None) -> np.ndarray:
+        """
+        Unwrapped time stamps of the records from position start to stop.
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        if start >= stop:
+            return np.empty(0, dtype=np.int64)
+
+        stride = start // self.index_stride
+        position = self.index_positions[stride]
+        ticks = unwrap_ticks(
+            self.records[self.tick_field][position:stop],
+            int(self.index_ticks[stride])
+        )
+        return ticks[start - position:]
+
+    def position(self, tick: int, side: str = 'left') -> int:
+        """
+        Position of the first record with an unwrapped time stamp greater
+        than or equal to tick ('left'), or greater than tick ('right').
+        """
+        if not len(self):
+            return 0
+
+        # Last stride starting before the searched tick. The searched
+        # position is within that stride, or it is the start of the next.
+        stride = max(
+            int(np.searchsorted(self.index_ticks, tick, side)) - 1, 0
+        )
+        position = self.index_positions[stride]
+        ticks = self.unwrapped_ticks(position, position + self.index_stride)
+        return int(position + np.searchsorted(ticks, tick, side))
+
+    def tick_range(self, start: int, stop: int) -> np.ndarray:
+        """
+        View of the records with unwrapped time stamps from start
+        (inclusive) to stop (exclusive).
+        """
+        return self.records[self.position(start):self.position(stop)]
+
+    def time_range(self, start: float, stop: float) -> np.ndarray:
+        """
+        View of the records from start to stop seconds, relative to the
+        first record of the session.
+        """
+        return self.tick_range(
+            self.start_tick + int(np.ceil(start / ST_TICK_PERIOD)),
+            self.start_tick + int(np.ceil(stop / ST_TICK_PERIOD))
+        )
+
+    def iter_blocks(self, size: int = 4096) -> Iterator[np.ndarray]:
+        """
+        Iterate over views of consecutive blocks of records, e.g., for
+        replaying a session.
+        """
+        for start in range(0, len(self), size):
+            yield self.records[start:start + size]
+
+    def to_data_frame(self, start: int = 0, stop: int = None) -> pd.DataFrame:
+        """
+        Copy the records from position start to stop into a pandas
+        DataFrame with the layout of the CSV logs.
+        """
+        return records_to_data_frame(self.records[start:stop])
+
+
+def unwrap_ticks(ticks: np.ndarray, first: int = None) -> np.ndarray:
+    """
+    Unwrap ST time stamps into monotonic 8-byte ints. Any step backwards of
+    more than half the wrap range is treated as a wrap around.
+    first is the unwrapped value of the first time stamp, if known.
+    """
+    ticks = np.asarray(ticks, dtype=np.int64)
+    unwrapped = np.empty(len(ticks), dtype=np.int64)
+    if not len(ticks):
+        return unwrapped
+
+    steps = np.diff(ticks)
+    steps[steps < -ST_TICK_WRAP // 2] += ST_TICK_WRAP
+
+    unwrapped[0] = ticks[0] if first is None else first
+    np.cumsum(steps, out=unwrapped[1:])
+    unwrapped[1:] += unwrapped[0]
+    return unwrapped
+
+
+def wrap_ticks(ticks: np.ndarray, dtype: np.dtype) -> np.ndarray:
+    """
+    Wrap unwrapped time stamps back into the range of a 2-byte time stamp
+    field. Wider fields are left unwrapped.
+    """
+    if np.dtype(dtype).itemsize > 2:
+        return ticks
+    half = ST_TICK_WRAP // 2
+    return (ticks + half) % ST_TICK_WRAP - half
+
+
+def records_to_data_frame(
+    columns: Union[Mapping[str, np.ndarray], np.ndarray]
+) -> pd.DataFrame:
+    """
+    Build a pandas DataFrame with the layout of the CSV logs: one column
+    per field, indexed by a UUID per record. Columns may be given as a
+    mapping of arrays or as a structured array of records.
+    """
+    if isinstance(columns, np.ndarray):
+        columns = {name: columns[name] for name in columns.dtype.names}
+
+    data = {name: _export_column(column) for name, column in columns.items()}
+    length = len(next(iter(data.values()))) if data else 0
+    # Uniquely identify all the records by creating a UUID index.
+    # Makes data matching more simple
+    index = [str(uuid.uuid4()) for _ in range(length)]
+
+    return pd.DataFrame(data, index=index)
+
+
+def export_csv(log_path: str, csv_path: str) -> int:
+    """
+    Convert a session log into a CSV file with the layout written by the
+    Logger, for use in the analysis notebooks. Returns the record count.
+    """
+    _, records = read_records(log_path)
+    records_to_data_frame(records).to_csv(csv_path)
+    return len(records)
+
+
+def import_csv(
+    csv_path: str, log_path: str, stream: Union[str, None] = None
+) -> int:
+    """
+    Convert a CSV log into a session log. The stream is inferred from the
+    CSV columns if it is not given. Returns the record count.
+    """
+    data_frame = pd.read_csv(csv_path, index_col=0)
+    if stream is None:
+        stream = infer_stream(list(data_frame.columns))
+    fields = ST_LOG_FIELDS[stream]
+    if RUN_FIELD[0] in data_frame.columns:
+        fields += (RUN_FIELD,)
+
+    if os.path.exists(log_path):
+        os.remove(log_path)
+    columns = {name: data_frame[name].to_numpy() for name, _ in fields}
+    append_records(log_path, stream, fields, columns, len(data_frame))
+    return len(data_frame)
+
+
+def infer_stream(columns: Sequence[str]) -> str:
+    """
+    Find the ST stream whose logged fields match a list of column names.
+    The run field of delta mode logs is ignored.
+    """
+    columns = [name for name in columns if name != RUN_FIELD[0]]
+    for stream, fields in ST_LOG_FIELDS.items():
+        if [name for name, _ in fields] == list(columns):
+            return stream
+    raise ValueError(f"Columns do not match any ST stream: {columns}")
+
+
+def _export_column(values: np.ndarray) -> np.ndarray:
+    """
+    Copy a column for exporting. 4-byte floats are widened and rounded, so
+    that their text representation matches the values that were received.
+    """
+    if values.dtype.kind == 'f' and values.dtype.itemsize < 8:
+        return np.round(values.astype(np.float64), FLOAT_DECIMALS)
+    return np.array(values, dtype=values.dtype.newbyteorder('='))
@@ -1,17 +1,26 @@
 """ Bleak wrapper to get data from the STMicroelectronics SensorTile. """
 
 # Python Libraries
-from struct import unpack_from
+import asyncio
+import json
+import os
 from sys import platform
-from typing import Union
+import time
+from typing import Callable, List, Sequence, Union
 
 # Third-Party Libraries
 from bleak import BleakClient, BleakError, BleakScanner
-import numpy as np
 
 # Local Files
-from constants import ST_HANDLES
-from dropping_lifo_queue import DroppingLifoQueue
+from constants import ST_HANDLES, ST_NOTIFICATION_INTERVAL
+from latest_value import LatestValue
+from logger import LogWriter
+from st_capture import CaptureTap
+from st_clock import StreamClock, TICKS_FORMAT
+from st_decode import decode_environment, decode_environment_block, \
+    decode_motion, decode_motion_block, decode_quaternions, \
+    decode_quaternions_block, detect_layout, ENVIRONMENT_FORMAT, \
+    MOTION_FORMAT, PacketRing, QUATERNIONS_FORMAT
 
 
 class SensorTile():
@@ -26,58 +35,200 @@ class SensorTile():
         MacOS) of a SensorTile with the appropriate firmware name.
         The object also contains a BleakClient to send requests and receive
         data while the connections is kept alive in main.py.
-        The incoming data will be stored in individual asyncio LifoQueues
-        for retrieving the most recent available data in main.py as it becomes
-        available.
+        The incoming data will be stored in individual LatestValue cells
+        (see latest_value.py) for retrieving the most recent available data
+        in main.py as it becomes available.
 
         Every retrieved value is a tuple with the time stamp of
         the data collected as its first value (in ticks), and the
         second value depends on the data source, and matches the
         following info:
 
-        'environment' second tuple value is a dictionary.
-        Keys: 'pressure', 'humidity', 'temp1', 'temp2'
+        'environment' second tuple value is an EnvironmentSample.
+        Fields: 'pressure', 'humidity', 'temp1', 'temp2'
 
-        'motion' second tuple value is a dictionary.
-        Keys: 'acc_x', 'acc_y', 'acc_z',
-              'gyr_x', 'gyr_y', 'gyr_z',
-              'mag_x', 'mag_y', 'mag_z',
-              'r', 'theta', 'phi'
+        'motion' second tuple value is a MotionSample.
+        Fields: 'acc_x', 'acc_y', 'acc_z',
+                'gyr_x', 'gyr_y', 'gyr_z',
+                'mag_x', 'mag_y', 'mag_z',
+                'r', 'theta', 'phi'
 
-        'quaternions_data' second tuple is a dictionary.
-        Keys: 'i', 'j', 'k', 'roll', 'pitch', 'yaw'
+        'quaternions_data' second tuple value is a QuaternionSample.
+        Fields: 'raw_i', 'raw_j', 'raw_k',
+                'norm_w', 'norm_i', 'norm_j', 'norm_k',
+                'roll', 'pitch', 'yaw'
+
+        Samples expose their fields as attributes (e.g., motion.r), and
+        can also be read like dictionaries (e.g., motion['r']), see
+        st_samples.py.
         """
         self.address = address
-        self.client = BleakClient(self.address)
-        # A LiFo Queue will ensure that the most recent registered
-        # ST data is retrieved
-        self.environment_data = DroppingLifoQueue(maxsize=1)
-        self.motion_data = DroppingLifoQueue(maxsize=1)
-        self.quaternions_data = DroppingLifoQueue(maxsize=1)
+        self.client = self._new_client()
+
+        # Connection state, tracked by the disconnection callback, so that a
+        # supervisor can reconnect after a dropped link (see supervise()).
+        # closing is set when disconnecting on purpose.
+        self.connected = False
+        self.closing = False
+        self.disconnected = asyncio.Event()
+        self.recoveries = []
+        # A single-slot cell per stream ensures that the most recent
+        # registered ST data is retrieved (see latest_value.py)
+        self.environment_data = LatestValue()
+        self.motion_data = LatestValue()
+        self.quaternions_data = LatestValue()
 
         # In a relative quaternion, the initial value of the W (real)
         # component is 1. The information received from the ST is a
         # vector quaternion.
         self.quat_w = 1
 
-    async def ble_connect(self) -> None:
+        # Optional tap recording every notification at full rate, since the
+        # cells above only keep the most recent data.
+        self.capture = None
+
+        # Optional ring buffers of raw notifications, keyed by handle, for
+        # decoding in blocks. Block decoding keeps its own real quaternion
+        # component.
+        self.packet_rings = {}
+        self.block_quat_w = 1
+
+        # Callbacks of the handles that can be registered, and dispatch table
+        # of the registered ones. Notifications are routed with a single
+        # lookup, and those from handles that were not registered are only
+        # counted.
+        self.callbacks = {
+            ST_HANDLES['environment']: self._environment_callback,
+            ST_HANDLES['motion']: self._motion_callback,
+            ST_HANDLES['quaternions']: self._quaternions_callback,
+        }
+        self.dispatch = {}
+        self.unknown_notifications = 0
+
+        # Layout of the notifications of every handle, detected from its
+        # first notification: None for regular notifications, or the layout
+        # of packed notifications with several samples (see st_decode.py).
+        self.sizes = {
+            ST_HANDLES['environment']: ENVIRONMENT_FORMAT.size,
+            ST_HANDLES['motion']: MOTION_FORMAT.size,
+            ST_HANDLES['quaternions']: QUATERNIONS_FORMAT.size,
+        }
+        self.layouts = {}
+        self.malformed_notifications = 0
+
+        # Device time, clock alignment and timing metrics of every stream,
+        # keyed by handle (see st_clock.py).
+        self.clocks = {
+            ST_HANDLES[stream]: StreamClock(stream, interval)
+            for stream, interval in ST_NOTIFICATION_INTERVAL.items()
+        }
+
+        # Optional filter stage that smooths every motion sample at full
+        # rate, keeping the latest filtered values (see st_filters.py).
+        self.motion_filter = None
+        # Optional incremental motion features (jerk, energy, angular
+        # velocity, tilt rate) updated from every motion sample (see
+        # st_features.py).
+        self.motion_features = None
+
+    def _new_client(self) -> BleakClient:
+        """ BleakClient that reports disconnections to the SensorTile. """
+        return BleakClient(
+            self.address, disconnected_callback=self._disconnected_callback
+        )
+
+    async def ble_connect(self, timeout: float = 10.0) -> None:
         """ Connect to SensorTile and ensure connection was established. """
-        await self.client.connect()
+        self.disconnected.clear()
+        await self.client.connect(timeout=timeout)
         assert self.client.is_connected, "ST is not connected"
-        print("\tConnected to SensorTile")
+        self.connected = True
+        print(f"\tConnected to SensorTile {self.address}")
 
     async def ble_disconnect(self) -> None:
         """ Disconnect from SensorTile """
+        self.closing = True
         await self.client.disconnect()
-        print("\tDisconnected from SensorTile.\n")
+        print(f"\tDisconnected from SensorTile {self.address}.\n")
+
+    def _disconnected_callback(self, client: BleakClient) -> None:
+        """
+        Flag the lost connection, and wake up anything waiting for data with
+        None, so that consumers can keep using the last received values
+        while the ST reconnects.
+        """
+        self.connected = False
+        self.disconnected.set()
+        for queue in (self.environment_data, self.motion_data,
+                      self.quaternions_data):
+            queue.put_nowait(None)
+
+    async def supervise(
+        self, timeout: float = 3.0,
+        min_backoff: float = 0.5, max_backoff: float = 8.0
+    ) -> None:
+        """
+        Reconnect whenever the connection drops, until ble_disconnect() is
+        called, and re-enable the notifications of the registered handles.
+        Failed attempts are retried with an exponential backoff between
+        min_backoff and max_backoff seconds. The time to recover of every
+        reconnection is printed and kept in recoveries.
+        Meant to be run as a task for the whole performance.
+        """
+        while not self.closing:
+            await self.disconnected.wait()
+            if self.closing:
+                return
+
+            lost = time.monotonic()
+            print(f"\tLost connection to SensorTile {self.address}.")
+            backoff = min_backoff
+            while not self.closing:
+                try:
+                    # A fresh client avoids reusing the state of the dropped
+                    # connection. The firmware may have changed meanwhile.
+                    self.client = self._new_client()
+                    self.layouts.clear()
+                    await self.ble_connect(timeout)
+                    for char in self.dispatch:
+                        await self.client.start_notify(
+                            char, self._notification_callback
+                        )
+                    break
+                except Exception as exception:
+                    print(f"\tReconnection to {self.address} failed: "
+                          f"{exception}. Retrying in {backoff:.1f}s.")
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, max_backoff)
+            else:
+                return
 
-    async def start_notification(self, char: Union[int, str]) -> None:
+            self.recoveries.append(time.monotonic() - lost)
+            print(f"\tRecovered SensorTile {self.address} in "
+                  f"{self.recoveries[-1]:.2f}s.")
+
+    async def start_notification(
+        self, char: Union[int, str],
+        callback: Union[Callable[[bytearray], None], None] = None
+    ) -> None:
         """
-        Start receiving notifications from a given handle.
+        Start receiving notifications from a given handle, and register the
+        callback that decodes them in the dispatch table. callback defaults
+        to the callback of the ST stream of the handle, and allows adding
+        other streams. Callbacks are called synchronously with the data of
+        each notification.
         """
+        if callback is None:
+            callback = self.callbacks.get(char)
+        if callback is None:
+            print(f"Error: no callback for handle {char}")
+            return
+
+        self.dispatch[char] = callback
         try:
             await self.client.start_notify(char, self._notification_callback)
         except Exception as exception:
+            del self.dispatch[char]
             print(f"Error: {exception}")
 
     async def stop_notification(self, char: Union[int, str]) -> None:
@@ -88,232 +239,293 @@ class SensorTile():
             await self.client.stop_notify(char)
         except Exception as exception:
             print(f"Error: {exception}")
+        self.dispatch.pop(char, None)
+
+    def start_capture(self, path_prefix: str,
+                      writer: Union[LogWriter, None] = None) -> None:
+        """
+        Start recording every incoming notification, with its host arrival
+        time, into raw session logs named '<path_prefix>_<stream>_raw.stlog'.
+        """
+        self.capture = CaptureTap(path_prefix, writer)
+
+    async def stop_capture(
+        self, timeout: float = 5.0
+    ) -> Union[CaptureTap, None]:
+        """
+        Stop recording notifications and hand over the remaining ones to
+        the writer. If the capture owns its writer, wait for up to timeout
+        seconds for them to be written. Returns the stopped capture tap.
+        """
+        capture, self.capture = self.capture, None
+        if capture is not None:
+            await capture.close(timeout)
+        return capture
+
+    def enable_packet_rings(
+        self, streams: Sequence[str] = tuple(ST_HANDLES),
+        capacity: int = 4096
+    ) -> None:
+        """
+        Start buffering the raw notifications of the given streams
+        ('environment', 'motion' or 'quaternions'), so that they can be
+        decoded in blocks with take_block(). Only buffer the streams whose
+        blocks are taken, since every buffered notification is copied.
+        """
+        sizes = {
+            'environment': ENVIRONMENT_FORMAT.size,
+            'motion': MOTION_FORMAT.size,
+            'quaternions': QUATERNIONS_FORMAT.size,
+        }
+        self.packet_rings = {
+            ST_HANDLES[stream]: PacketRing(sizes[stream], capacity)
+            for stream in streams
+        }
+
+    def take_block(self, stream: str) -> dict:
+        """
+        Decode every buffered notification of a stream ('environment',
+        'motion' or 'quaternions') with NumPy, returning a dictionary of
+        columns.
+        """
+        block = self.packet_rings[ST_HANDLES[stream]].take()
+        if stream == 'environment':
+            return decode_environment_block(block)
+        if stream == 'motion':
+            return decode_motion_block(block)
+        columns, self.block_quat_w = \
+            decode_quaternions_block(block, self.block_quat_w)
+        return columns
 
     # Add data to Queue
-    async def _notification_callback(self, char: Union[int, str],
-                                    data: bytearray) -> None:
+    def _notification_callback(self, char: Union[int, str],
+                               data: bytearray) -> None:
         """
         Redirect incoming notification data to the adequate callback function.
+        This is a regular function, so Bleak calls it directly instead of
+        scheduling a coroutine per notification.
+        Packed notifications are split into the regular notifications of
+        their samples.
         """
-        # Route incoming characteristics to the appropriate callback functions
-        if char == ST_HANDLES['environment']:
-            await self._environment_callback(data)
-        elif char == ST_HANDLES['motion']:
-            await self._motion_callback(data)
-        else:
-            await self._quaternions_callback(data)
+        try:
+            layout = self.layouts[char]
+        except KeyError:
+            layout = self.layouts[char] = self._detect_layout(char, data)
+
+        if layout is None:
+            self._receive(char, data)
+            return
+        payloads = layout.unpack(data)
+        if payloads is None:
+            self.malformed_notifications += 1
+            return
+        for payload in payloads:
+            self._receive(char, payload)
+
+    def _detect_layout(self, char: Union[int, str], data: bytearray):
+        """ Layout of the notifications of a handle, from the first one. """
+        size = self.sizes.get(char)
+        layout = detect_layout(data, size) if size else None
+        if layout is not None:
+            print(f"\tReceiving packed notifications (version {data[0]}) "
+                  f"from handle {char} of {self.address}.")
+        return layout
+
+    def _receive(self, char: Union[int, str], data: bytearray) -> None:
+        """
+        Capture, buffer and decode the regular notification of a sample.
+        """
+        # Capture every notification before it is decoded.
+        if self.capture is not None:
+            self.capture.record(char, data)
+        if self.packet_rings:
+            ring = self.packet_rings.get(char)
+            if ring is not None:
+                ring.append(data)
 
-    async def _environment_callback(self, data: bytearray) -> None:
+        # Route incoming characteristics to the appropriate callback functions
+        callback = self.dispatch.get(char)
+        if callback is None:
+            self.unknown_notifications += 1
+            return
+        clock = self.clocks.get(char)
+        if clock is not None:
+            clock.update(TICKS_FORMAT.unpack_from(data)[0], time.monotonic())
+        callback(data)
+
+    def _environment_callback(self, data: bytearray) -> None:
         """
         Retrieve Environmental data from incoming bytearrays.
         The ST will send barometer data every 10ms.
         """
-        # Store incoming data in a dictionary
-        environment_data = {}
-
-        result = unpack_from('<hhhhh', data)
-
-        time_stamp = result[0]
-
-        # Pressure is represented by 4 bytes
-        environment_data['pressure'] = result[1]
-
-        environment_data['humidity'] = result[2]
-
-        # The order of the temp sensors is swapped in the ST GATT transfer.
-        environment_data['temp1'] = result[4]
-        environment_data['temp2'] = result[3]
-
         # Add data to Queue
-        self.environment_data.put_nowait((time_stamp, environment_data))
+        self.environment_data.put_nowait(decode_environment(data))
 
-    async def _motion_callback(self, data: bytearray) -> None:
+    def _motion_callback(self, data: bytearray) -> None:
         """
         Retrieve Motion data from incoming bytearrays.
         Accelerometer, gyroscope, and magnetometer data will be sent by the
         ST every 10ms. Each one of the three sensors has been set to their
         maximum ranges (please refer to STMicroelectronics documentation).
         In addition to the sensor data, the magnitude of each sensor is
-        being calculated.
+        being calculated (see st_decode.py).
         """
-        # Store incoming data in a dictionary
-        motion_data = {}
-
-        result = unpack_from('<hhhhhhhhhh', data)
-
-        time_stamp = result[0]
-
-        # Acceleration
-        motion_data['acc_x'] = result[1]
-        motion_data['acc_y'] = result[2]
-        motion_data['acc_z'] = result[3]
-
-        # Gyroscope
-        # Data is multiplied by 100 to compensate for the division
-        # applied in the firmware. This division is so that the
-        # gyroscope data fits in two bytes of data.
-        motion_data['gyr_x'] = result[4] * 100
-        motion_data['gyr_y'] = result[5] * 100
-        motion_data['gyr_z'] = result[6] * 100
-
-        # Magnetometer
-        # Incoming magnetometer data has the magnetometer offset
-        # subtracted from it prior to being sent.
-        motion_data['mag_x'] = result[7]
-        motion_data['mag_y'] = result[8]
-        motion_data['mag_z'] = result[9]
-
-
-        # Calculate Orientation
-
-        # * 'r' is radial distance (i.e., distance to origin), or magnitude
-        # * 'theta' is polar angle (i.e., angle with respect to polar axis)
-        # * 'phi' is azimuth angle (i.e., angle of rotation from initial
-        #   meridian plane)
-        # This implementation of magnitude is faster than alternatives.
-        # REF:
-        # https://stackoverflow.com/questions/9171158/how-do-you-get-the-magnitude-of-a-vector-in-numpy
-        motion_data['r'] = np.round(
-            np.sqrt(np.dot(result[1:4], result[1:4])), 2)
-        motion_data['theta'] = np.round(
-            np.degrees(np.arccos(motion_data['acc_z'] / motion_data['r'])),
-            2
-        )
-        motion_data['phi'] = np.round(
-            np.degrees(np.arctan2(motion_data['acc_y'], motion_data['acc_z'])),
-            2
-        )
+        motion = decode_motion(data)
+        device_time = self.clocks[ST_HANDLES['motion']].last_device
+        if self.motion_filter is not None:
+            self.motion_filter.update(motion[1], device_time)
+        if self.motion_features is not None:
+            self.motion_features.update(motion[1], device_time)
 
         # Add data to Queue
-        self.motion_data.put_nowait((time_stamp, motion_data))
+        self.motion_data.put_nowait(motion)
 
-    async def _quaternions_callback(self, data: bytearray) -> None:
+    def _quaternions_callback(self, data: bytearray) -> None:
         """
         Retrieve Quaternion data from incoming bytearrays.
-        A group of three quaternions will be sent by the ST every 30ms.
+        A single quaternion is sent by the ST every 10ms (see
+        ST_NOTIFICATION_INTERVAL in constants.py).
         Each received quaternion is a vector quaternion with values that
         are not constrained to unit length. However, when computing Euler
-        angles, these 3 components are normalized (see util.py).
+        angles, these 3 components are normalized (see st_decode.py).
         The stored quaternion values are the raw non-normalized values.
         """
-        # Store incoming data in independent dictionaries
-        # Initialize multiple dictionaries using a range for loop.
-        quat_data = {}
+        time_stamp, quat_data, self.quat_w = \
+            decode_quaternions(data, self.quat_w)
 
-        result = unpack_from('<hhhh', data)
-
-        # Retrieve time stamp
-        time_stamp = result[0]
-
-        # Retrieve First Quaternion
-        quat_data['raw_i'] = result[1]
-        quat_data['raw_j'] = result[2]
-        quat_data['raw_k'] = result[3]
+        # Add data to Queue.
+        self.quaternions_data.put_nowait((time_stamp, quat_data))
 
 
-        # Calculate Euler Angles
+async def find_sts(
+    firmware_name: str, max_devices: Union[int, None] = None,
+    scans: int = 1
+) -> List[str]:
+    """
+    Scan for every device that matches a given name, and return up to
+    max_devices addresses. If none is found, scan again up to scans times
+    in total, and return an empty list. Scanning never waits for the user,
+    so that unattended startups do not hang.
+    """
+    print("\n\tScanning BLE Devices")
 
-        # Normalize Incoming vector quaternion.
-        norm = np.sqrt(np.dot(result[1:], result[1:]))
-        vec_q = list(i / norm for i in result[1:]) \
-            if norm > 0 else list(result[1:])
+    for _ in range(scans):
+        addresses = await _scan_st_addresses(firmware_name)
+        if addresses:
+            if max_devices is not None and len(addresses) < max_devices:
+                print(f"\n\tFound {len(addresses)} of {max_devices} "
+                      "requested SensorTiles.")
+            return addresses[:max_devices]
 
-        # Add real component to the quaternion.
-        quat = [self.quat_w] + vec_q
+    print("""
+        No SensorTile was found.
+        Please make sure your SensorTile is on.
+        If that does not work, ensure you flashed the correct firmware.
+        """)
+    return []
 
-        # Normalize all 4 quaternion values.
-        norm = np.sqrt(np.dot(quat, quat))
-        quat = list(i / norm for i in quat)
 
-        quat_data['norm_w'] = np.round(quat[0], 2)
-        quat_data['norm_i'] = np.round(quat[1], 2)
-        quat_data['norm_j'] = np.round(quat[2], 2)
-        quat_data['norm_k'] = np.round(quat[3], 2)
+async def connect_all(
+    addresses: List[str], timeout: float = 10.0,
+    tile_class: Callable[[str], "SensorTile"] = None
+) -> List["SensorTile"]:
+    """
+    Create a SensorTile per address, and connect to all of them
+    concurrently. Returns the connected SensorTiles, in the order of the
+    addresses, skipping those that could not be connected.
+    tile_class creates the tile of an address, and defaults to SensorTile
+    (e.g., RemoteSensorTile in st_ingest.py connects in another process).
+    """
+    tile_class = tile_class or SensorTile
+    tiles = [tile_class(address) for address in addresses]
+    results = await asyncio.gather(
+        *(tile.ble_connect(timeout) for tile in tiles), return_exceptions=True
+    )
+
+    connected = []
+    for tile, result in zip(tiles, results):
+        if isinstance(result, Exception):
+            print(f"\tCould not connect to {tile.address}: {result}")
+        else:
+            connected.append(tile)
+    return connected
 
-        # Roll is the rotation about the x axis.
-        quat_data['roll'] = np.round(np.degrees(
-            np.arctan2(
-                2 * (quat[0] * quat[1] + quat[2] * quat[3]),
-                1 - 2 * (quat[1] ** 2 + quat[2] ** 2)
-            )),
-            2
-        )
 
-        # Pitch is the rotation about the y axis.
-        pitch = 2 * (quat[0] * quat[2] - quat[1] * quat[3])
-        # Prevent passing a value outside the arcsine input range,
-        # which is -1 to 1 inclusive.
-        if pitch > 1:
-            quat_data['pitch'] = np.round(np.degrees(np.arcsin(1)), 2)
-        elif pitch < -1:
-            quat_data['pitch'] = np.round(np.degrees(np.arcsin(-1)), 2)
-        else:
-            quat_data['pitch'] = np.round(np.degrees(np.arcsin(pitch)), 2)
-
-        # Yaw is the rotation about the z axis.
-        quat_data['yaw'] = np.round(np.degrees(
-            np.arctan2(
-                2 * (quat[0] * quat[3] + quat[1] * quat[2]),
-                1 - 2 * (quat[2] ** 2 + quat[3] ** 2)
-            )),
-            2
+async def connect_cached(
+    firmware_name: str, count: int, cache_path: str, timeout: float = 3.0,
+    tile_class: Callable[[str], "SensorTile"] = None, scans: int = 1
+) -> List["SensorTile"]:
+    """
+    Connect to count STs, trying the addresses of the last session first
+    with a short direct connection. Only if some of them cannot be reached,
+    scan for the missing ones, up to scans times (see find_sts()). The
+    addresses of the connected STs are saved for the next session.
+    tile_class is passed to connect_all().
+    """
+    start = time.monotonic()
+    cached = load_addresses(cache_path)[:count]
+    tiles = await connect_all(cached, timeout, tile_class) if cached else []
+
+    if len(tiles) < count:
+        print(f"\tConnected to {len(tiles)} of {count} SensorTiles from the "
+              "last session. Scanning for the rest.")
+        known = {tile.address for tile in tiles}
+        found = await find_sts(firmware_name, scans=scans)
+        addresses = [address for address in found if address not in known]
+        tiles += await connect_all(
+            addresses[:count - len(tiles)], tile_class=tile_class
         )
 
-        self.quat_w = quat[0]
+    if tiles:
+        save_addresses(cache_path, [tile.address for tile in tiles])
+    print(f"\tConnected to {len(tiles)} SensorTiles in "
+          f"{time.monotonic() - start:.2f}s.")
+    return tiles
 
-        # Add data to Queue.
-        self.quaternions_data.put_nowait((time_stamp, quat_data))
 
-
-async def find_st(firmware_name: str) -> Union[str, None]:
+def load_addresses(cache_path: str) -> List[str]:
     """
-    Scan for addresses that match a given name, and then verify that
-    the retrieved address is a string. If that is the case, then return
-    the address. If not, offer the user the possibility to search again.
+    Addresses saved by a previous session, or an empty list if there are
+    none or the file cannot be read.
     """
-    print("\n\tScanning BLE Devices")
-
-    while True:
-        # Find SensorTile address
-        address = await _scan_st_address(firmware_name)
+    if not os.path.isfile(cache_path):
+        return []
+    try:
+        with open(cache_path) as cache:
+            return [str(address) for address in json.load(cache)]
+    except (OSError, ValueError, TypeError) as exception:
+        print(f"\tIgnoring SensorTile address cache: {exception}")
+        return []
 
-        # Check if an address was returned, and break scan
-        # if ST address was found.
-        if address:
-            return address
 
-        print("""
-        No SensorTile was found.
-        Please make sure your SensorTile is on.
-        If that does not work, ensure you flashed the correct firmware.
-        """)
-
-        option = input("\tWould you like to scan again? (y/n) ")
-        if option.lower() == "n":
-            return None
+def save_addresses(cache_path: str, addresses: List[str]) -> None:
+    """ Save the addresses of the connected STs for the next session. """
+    try:
+        with open(cache_path, 'w') as cache:
+            json.dump(addresses, cache)
+    except OSError as exception:
+        print(f"\tCould not save SensorTile addresses: {exception}")
 
 
-async def _scan_st_address(firmware_name: str) -> str:
+async def _scan_st_addresses(firmware_name: str) -> List[str]:
     """
-    Scan for BLE devices that have the correct name property, and return
-    the MAC address (or the UUID address in MacOS) for devices that match
-    that name property.
+    Scan for BLE devices for the full scan timeout, and return the
+    addresses of every device that has the correct name property.
     """
     try:
-        # Scan BLE devices
-        device = await BleakScanner.find_device_by_filter(
-            lambda device, _: device.name == firmware_name,
-            timeout=10.0
-        )
-        # print(f"\n\tFound {str(len(devices))} devices.")
-        # Find SensorTile
-        if device:
-            print(f"\n\tFound SensorTile with {firmware_name} firmware.")
-            if platform == 'darwin':
-                print(f"\tUUID Address: {device.address}")
-            else:
-                print(f"\tMAC Address: {device.address}")
-            return device.address
-
+        devices = await BleakScanner.discover(timeout=10.0)
     except BleakError:
         print("\n\tPlease turn on your system's bluetooth device.\n")
+        return []
+
+    addresses = [
+        device.address for device in devices if device.name == firmware_name
+    ]
+    print(f"\n\tFound {len(addresses)} SensorTiles with "
+          f"{firmware_name} firmware.")
+    for address in addresses:
+        if platform == 'darwin':
+            print(f"\tUUID Address: {address}")
+        else:
+            print(f"\tMAC Address: {address}")
+    return addresses
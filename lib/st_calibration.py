@@ -0,0 +1,225 @@
+"""
+Streaming auto-calibration of the ranges of ST values mapped to synth
+parameters.
+
+The mapping ranges in ST_SETTINGS are fixed, so most performers only reach
+a part of each range. A RangeCalibrator estimates a low and a high
+percentile of every mapped value, and maps values between them. Percentiles
+are estimated from a histogram with a fixed number of bins per value, whose
+width is the resolution of the estimates, so memory does not grow with the
+duration of a session. Histograms are updated from blocks of samples taken
+in the performance loop (see SensorTile.take_block()), so the notification
+callbacks only buffer the notifications. Older samples can be
+forgotten with a half-life, so that ranges follow a performer who changes
+their way of moving.
+
+Calibrated ranges can be saved as a profile per performer, and are used as
+the starting ranges of their next session.
+"""
+
+# Python Libraries
+import json
+import math
+import os
+from typing import Dict, Mapping, Sequence, Tuple, Union
+
+# Third-Party Libraries
+import numpy as np
+
+
+class QuantileHistogram:
+    """
+    Histogram of a value between a minimum and a maximum, in bins of a
+    given resolution, to estimate its quantiles. Values outside the limits
+    are counted in the first or last bin, and NaN values are ignored.
+    """
+
+    def __init__(self, minimum: float, maximum: float, resolution: float,
+                 half_life: Union[float, None] = None) -> None:
+        """
+        minimum and maximum are the limits of the histogram
+        resolution is the width of every bin
+        half_life is the number of samples after which the weight of a
+        sample is halved, or None to weigh all samples equally
+        """
+        self.minimum = minimum
+        self.resolution = resolution
+        self.bins = max(1, math.ceil((maximum - minimum) / resolution))
+        self.counts = np.zeros(self.bins)
+        # Forgetting older samples is done by increasing the weight of every
+        # new sample, instead of decreasing every count.
+        self.growth = 2 ** (1 / half_life) if half_life else None
+        self.weight = 1.0
+        self.samples = 0
+
+    def add(self, values: Sequence[float]) -> None:
+        """
+        Add a block of values. Blocks taken in the performance loop hold a
+        few values, for which a Python loop is faster than NumPy calls.
+        """
+        if isinstance(values, np.ndarray):
+            values = values.tolist()
+        counts, minimum, resolution = self.counts, self.minimum, self.resolution
+        last, growth, weight = self.bins - 1, self.growth, self.weight
+        added = 0
+        for value in values:
+            if value != value:
+                continue
+            if growth:
+                weight *= growth
+            index = int((value - minimum) // resolution)
+            counts[0 if index < 0 else last if index > last else index] += \
+                weight
+            added += 1
+        self.samples += added
+
+        # Normalize the counts before the weights overflow.
+        if weight > 1e100:
+            counts /= weight
+            weight = 1.0
+        self.weight = weight
+
+    def quantiles(self, probabilities: Sequence[float]) -> np.ndarray:
+        """
+        Estimated quantiles, interpolated linearly inside their bins. NaN
+        before the first value.
+        """
+        cumulative = np.cumsum(self.counts)
+        total = cumulative[-1]
+        if total <= 0:
+            return np.full(len(probabilities), np.nan)
+        targets = np.asarray(probabilities) * total
+        bins = np.minimum(
+            np.searchsorted(cumulative, targets, side='left'), self.bins - 1
+        )
+        below = np.where(bins > 0, cumulative[bins - 1], 0.0)
+        inside = np.divide(targets - below, self.counts[bins],
+                           out=np.zeros(len(bins)),
+                           where=self.counts[bins] > 0)
+        return self.minimum + (bins + np.clip(inside, 0, 1)) * self.resolution
+
+
+class RangeCalibrator:
+    """
+    Mapping ranges of sample fields, between a low and a high percentile
+    of their values. Until warmup samples are received, the initial ranges
+    are used. The current ranges are kept in 'settings', with the keys of
+    ST_SETTINGS, so that it can replace ST_SETTINGS in the mappings.
+    """
+
+    def __init__(
+        self, ranges: Mapping[str, Tuple[str, str]],
+        settings: Mapping[str, float],
+        bins: Mapping[str, Tuple[float, float, float]],
+        low: float = 0.05, high: float = 0.95, warmup: int = 2000,
+        half_life: Union[float, None] = None, refresh: int = 100,
+        profile: Union[Mapping[str, float], None] = None
+    ) -> None:
+        """
+        ranges are the setting keys of the minimum and maximum of every
+        calibrated field (see ST_CALIBRATION_RANGES in constants.py)
+        settings are the initial ranges (e.g., ST_SETTINGS)
+        bins are the minimum, maximum and resolution of the histogram of
+        every field (see ST_CALIBRATION_BINS in constants.py)
+        low and high are the percentiles mapped to the range ends
+        warmup is the number of samples before the estimates are used
+        half_life is the number of samples after which the weight of a
+        sample is halved, or None to keep every sample
+        refresh is the number of samples between updates of the ranges
+        profile are the ranges saved for a performer, which replace the
+        initial ranges
+        """
+        self.ranges = dict(ranges)
+        self.settings = dict(settings)
+        if profile:
+            self.settings.update({
+                key: profile[key] for keys in self.ranges.values()
+                for key in keys if key in profile
+            })
+        self.probabilities = (low, high)
+        self.warmup = warmup
+        self.refresh = refresh
+        self.histograms = {
+            field: QuantileHistogram(*bins[field], half_life)
+            for field in self.ranges
+        }
+        self.samples = 0
+        self._next_refresh = max(warmup, 1)
+
+    @property
+    def warming_up(self) -> bool:
+        return self.samples < self.warmup
+
+    def update_block(self, columns: Mapping[str, np.ndarray]) -> None:
+        """ Add a block of samples, as columns (see st_decode.py). """
+        count = 0
+        for field, histogram in self.histograms.items():
+            values = columns[field]
+            count = len(values)
+            if count:
+                histogram.add(values)
+        self.samples += count
+        if self.samples >= self._next_refresh:
+            self._next_refresh = self.samples + self.refresh
+            self._set_ranges()
+
+    def _set_ranges(self) -> None:
+        """ Use the estimates as ranges, unless they are degenerate. """
+        for field, histogram in self.histograms.items():
+            minimum, maximum = histogram.quantiles(self.probabilities)
+            if minimum < maximum:
+                keys = self.ranges[field]
+                self.settings[keys[0]] = float(minimum)
+                self.settings[keys[1]] = float(maximum)
+
+    def profile(self) -> Dict[str, Union[float, int]]:
+        """ Current ranges and number of samples, to be saved. """
+        profile = {
+            key: float(self.settings[key])
+            for keys in self.ranges.values() for key in keys
+        }
+        profile["samples"] = self.samples
+        return profile
+
+    def report(self) -> str:
+        """ One-line summary of the ranges for the console. """
+        ranges = ", ".join(
+            f"{field} {self.settings[low]:.2f} to {self.settings[high]:.2f}"
+            for field, (low, high) in self.ranges.items()
+        )
+        state = "warming up" if self.warming_up else "calibrated"
+        return f"Ranges {state} after {self.samples} samples: {ranges}"
+
+
+def load_profile(path: str, performer: str) -> Dict[str, float]:
+    """
+    Calibrated ranges of a performer, or an empty dictionary if there are
+    none or the profiles cannot be read.
+    """
+    if not os.path.isfile(path):
+        return {}
+    try:
+        with open(path) as profiles:
+            return dict(json.load(profiles).get(performer, {}))
+    except (OSError, ValueError, TypeError, AttributeError) as exception:
+        print(f"\tIgnoring ST profiles: {exception}")
+        return {}
+
+
+def save_profile(path: str, performer: str,
+                 profile: Mapping[str, float]) -> None:
+    """ Save the calibrated ranges of a performer, keeping the others. """
+    profiles = {}
+    if os.path.isfile(path):
+        try:
+            with open(path) as file:
+                profiles = json.load(file)
+        except (OSError, ValueError) as exception:
+            print(f"\tReplacing unreadable ST profiles: {exception}")
+    profiles[performer] = dict(profile)
+    try:
+        with open(path, 'w') as file:
+            json.dump(profiles, file, indent=2)
+    except OSError as exception:
+        print(f"\tCould not save ST profile: {exception}")
+
@@ -0,0 +1,198 @@
+"""
+Full-rate capture of SensorTile notifications.
+
+The realtime path only keeps the latest value of every stream, so most
+notifications never reach the logs. A CaptureTap records every raw
+notification together with its host arrival time, into binary session logs
+whose records are the GATT payload (see ST_RAW_FIELDS in constants.py)
+followed by the arrival time in seconds of time.monotonic().
+"""
+
+# Python Libraries
+from struct import Struct
+import time
+from typing import Dict, Union
+
+# Local Files
+from constants import ST_HANDLES, ST_RAW_FIELDS
+from logger import LogWriter
+import session_log
+
+
+# Host arrival time appended to every captured payload.
+HOST_TIME_FIELD = ("host_time", "<f8")
+_HOST_TIME = Struct('<d')
+
+
+class CaptureTap:
+    """
+    Records every notification of the captured ST handles. Payloads are
+    copied into a preallocated bytearray per stream, which is handed over to
+    a LogWriter thread once it holds batch_size records.
+    """
+
+    def __init__(
+        self, path_prefix: str,
+        writer: Union[LogWriter, None] = None,
+        batch_size: int = 1000
+    ) -> None:
+        """
+        path_prefix is prepended to the file name of every stream, which is
+        named '<path_prefix>_<stream>_raw.stlog'
+        writer is the LogWriter that writes full batches. If none is given,
+        the tap starts its own, which is closed by CaptureTap.close().
+        batch_size is the number of notifications per written batch
+        """
+        self.owns_writer = writer is None
+        self.writer = writer if writer else LogWriter()
+
+        # Captured streams, keyed by their GATT handle.
+        self.streams = {
+            handle: _CaptureStream(
+                f"{path_prefix}_{stream}_raw{session_log.EXTENSION}",
+                stream, batch_size
+            )
+            for stream, handle in ST_HANDLES.items()
+        }
+
+    def record(self, char: Union[int, str], data: bytearray) -> None:
+        """
+        Capture a notification. Called by the SensorTile notification
+        callback, before the data is decoded.
+        """
+        arrival = time.monotonic()
+        stream = self.streams.get(char)
+        if stream is None:
+            return
+
+        size = stream.payload_size
+        if len(data) < size:
+            stream.malformed += 1
+            return
+
+        chunk = stream.chunk
+        offset = chunk.length * stream.record_size
+        chunk.data[offset:offset + size] = \
+            data if len(data) == size else data[:size]
+        _HOST_TIME.pack_into(chunk.data, offset + size, arrival)
+        chunk.length += 1
+
+        if chunk.length >= stream.batch_size:
+            stream.flush(self.writer)
+
+    async def close(self, timeout: float = 5.0) -> bool:
+        """
+        Hand over the remaining notifications, and if the tap owns its
+        writer, wait for up to timeout seconds for them to be written.
+        """
+        for stream in self.streams.values():
+            await stream.finish(self.writer, timeout)
+        if self.owns_writer:
+            return await self.writer.close(timeout)
+        return True
+
+    def report(self) -> Dict[str, str]:
+        """
+        Summary of the captured notifications of every stream that received
+        any.
+        """
+        return {
+            stream.stream: stream.report()
+            for stream in self.streams.values()
+            if stream.captured or stream.malformed
+        }
+
+
+class _CaptureStream:
+    """
+    Capture buffers and accounting of a single ST stream. It follows the
+    interface LogWriter expects from a Logger.
+    """
+
+    def __init__(self, file_path: str, stream: str, batch_size: int) -> None:
+        self.file_path = file_path
+        self.stream = stream
+        self.batch_size = batch_size
+
+        self.fields = ST_RAW_FIELDS[stream] + (HOST_TIME_FIELD,)
+        self.record_size = session_log.record_dtype(self.fields).itemsize
+        self.payload_size = self.record_size - _HOST_TIME.size
+
+        self._pool = []
+        self.chunk = self._new_chunk()
+
+        self.captured = 0
+        self.malformed = 0
+        self.written_records = 0
+        self.dropped_records = 0
+        self.failed_records = 0
+
+    def _new_chunk(self) -> "_RawChunk":
+        return _RawChunk(bytearray(self.batch_size * self.record_size))
+
+    def flush(self, writer: LogWriter) -> None:
+        """
+        Hand the current batch over to the writer, or drop it if the writer
+        cannot keep up.
+        """
+        chunk = self.chunk
+        if not chunk.length:
+            return
+
+        self.captured += chunk.length
+        if writer.submit(self, chunk):
+            self.chunk = self._pool.pop() if self._pool else self._new_chunk()
+        else:
+            self.dropped_records += chunk.length
+            chunk.length = 0
+
+    async def finish(self, writer: LogWriter, timeout: float) -> None:
+        """
+        Hand the last batch over to the writer, waiting for up to timeout
+        seconds for room in its queue instead of dropping it.
+        """
+        chunk = self.chunk
+        if not chunk.length:
+            return
+
+        self.captured += chunk.length
+        self.chunk = self._pool.pop() if self._pool else self._new_chunk()
+        if not await writer.hand_over(self, chunk, timeout):
+            self.dropped_records += chunk.length
+            self._release(chunk)
+
+    def report(self) -> str:
+        """
+        Summary of the captured notifications.
+        """
+        return (
+            f"{self.captured} captured, {self.written_records} written, "
+            f"{self.dropped_records} dropped, {self.failed_records} failed, "
+            f"{self.malformed} malformed"
+        )
+
+    def _write_chunk(self, chunk: "_RawChunk") -> None:
+        """
+        Append a batch to the session log. Called from the writer thread.
+        """
+        session_log.append_bytes(
+            self.file_path, f"raw_{self.stream}", self.fields,
+            memoryview(chunk.data)[:chunk.length * self.record_size]
+        )
+
+    def _release(self, chunk: "_RawChunk") -> None:
+        """
+        Return a written batch to the pool. Called from the writer thread.
+        """
+        chunk.length = 0
+        self._pool.append(chunk)
+
+
+class _RawChunk:
+    """
+    Batch of packed capture records.
+    """
+
+    def __init__(self, data: bytearray) -> None:
+        self.data = data
+        self.length = 0
@@ -0,0 +1,283 @@
+"""
+Alignment of the SensorTile clock with the host clock, and timing metrics
+of every ST stream.
+
+Every notification starts with a 2-byte time stamp in ticks of 8ms, which
+wraps around approximately every 524 seconds. Time stamps are unwrapped
+into a monotonic device time, which is related to time.monotonic() by an
+offset and a drift estimated online.
+
+BLE delivery only ever adds delay, so the offset is estimated from the
+fastest deliveries: the lowest host minus device time of each window of a
+few seconds. A line fitted through recent window minima gives the drift of
+the device clock. Latencies and ages are thus measured relative to the
+fastest observed delivery, not to the (unknown) time of measurement.
+"""
+
+# Python Libraries
+from collections import deque
+import math
+from struct import Struct
+from typing import Union
+
+# Local Files
+from constants import ST_TICK_PERIOD, ST_TICK_WRAP
+
+
+# Time stamp at the start of every notification.
+TICKS_FORMAT = Struct('<h')
+
+
+class TickUnwrapper:
+    """
+    Online unwrapping of ST time stamps into monotonic ints. Every time
+    stamp is placed at the unwrapped value nearest to the previous one, so
+    gaps of up to half the wrap range (approximately 262 seconds) are
+    supported.
+    """
+
+    def __init__(self) -> None:
+        self.last = None
+
+    def nearest(self, tick: int) -> int:
+        """
+        Unwrapped value of a time stamp, nearest to the last unwrapped time
+        stamp, without updating it. Used for time stamps retrieved later.
+        """
+        if self.last is None:
+            return tick
+        half = ST_TICK_WRAP // 2
+        return self.last + (tick - self.last + half) % ST_TICK_WRAP - half
+
+    def unwrap(self, tick: int) -> int:
+        """ Unwrap the next time stamp. """
+        self.last = self.nearest(tick)
+        return self.last
+
+
+class ClockSync:
+    """
+    Online estimate of the offset and drift between device time and host
+    time, both in seconds.
+    """
+
+    def __init__(self, window: float = 5.0, windows: int = 12) -> None:
+        """
+        window is the duration of device time in which the fastest delivery
+        is kept
+        windows is the number of window minima used to fit the drift
+        """
+        self.window = window
+        self.minima = deque(maxlen=windows)
+
+        # Fastest delivery of the current window, as (device, offset).
+        self._window_start = None
+        self._window_min = None
+
+        # Estimated line: host = device + offset + drift * (device - reference)
+        self.reference = 0.0
+        self.offset = None
+        self.drift = 0.0
+
+    def update(self, device_time: float, host_time: float) -> None:
+        """ Add the device and host time of a notification. """
+        offset = host_time - device_time
+        if self._window_min is None or offset < self._window_min[1]:
+            self._window_min = (device_time, offset)
+        if self._window_start is None:
+            self._window_start = device_time
+
+        if device_time - self._window_start >= self.window:
+            self.minima.append(self._window_min)
+            self._window_start = device_time
+            self._window_min = None
+            self._fit()
+        elif not self.minima:
+            # Until the first window is complete, use its fastest delivery.
+            self.reference, self.offset = self._window_min
+
+    def _fit(self) -> None:
+        """ Fit a line through the window minima (least squares). """
+        count = len(self.minima)
+        if count < 2:
+            self.reference, self.offset = self.minima[-1]
+            return
+
+        mean_device = sum(device for device, _ in self.minima) / count
+        mean_offset = sum(offset for _, offset in self.minima) / count
+        spread = sum((device - mean_device) ** 2 for device, _ in self.minima)
+        if spread > 0:
+            self.drift = sum(
+                (device - mean_device) * (offset - mean_offset)
+                for device, offset in self.minima
+            ) / spread
+
+        # The line is anchored at the most recent minimum, so that the
+        # offset follows the latest fastest delivery.
+        self.reference, self.offset = self.minima[-1]
+
+    def to_host(self, device_time: float) -> float:
+        """ Host time corresponding to a device time. """
+        return device_time + self.offset \
+            + self.drift * (device_time - self.reference)
+
+
+class RunningStats:
+    """ Online mean, standard deviation and maximum (Welford). """
+
+    __slots__ = ('count', 'mean', '_squares', 'max')
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.mean = 0.0
+        self._squares = 0.0
+        self.max = -math.inf
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._squares += delta * (value - self.mean)
+        if value > self.max:
+            self.max = value
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self._squares / self.count) if self.count else 0.0
+
+    def summary(self, scale: float = 1000) -> dict:
+        """ Mean, standard deviation and maximum, in milliseconds. """
+        if not self.count:
+            return {"mean": None, "std": None, "max": None}
+        return {
+            "mean": round(self.mean * scale, 3),
+            "std": round(self.std * scale, 3),
+            "max": round(self.max * scale, 3),
+        }
+
+
+class StreamClock:
+    """
+    Device time, clock alignment and timing metrics of an ST stream: packet
+    rate, gaps and dropped packets, latency jitter, and age of the samples
+    at consumption.
+    """
+
+    def __init__(self, stream: str, interval: float,
+                 gap_intervals: float = 3) -> None:
+        """
+        stream is the name of the ST stream
+        interval is the nominal time between notifications, in seconds
+        gap_intervals is the number of intervals without notifications that
+        counts as a gap
+        """
+        self.stream = stream
+        self.interval = interval
+        self.gap = gap_intervals * interval + ST_TICK_PERIOD
+
+        self.unwrapper = TickUnwrapper()
+        self.sync = ClockSync()
+
+        self.packets = 0
+        self.gaps = 0
+        self.first_device = None
+        self.last_device = None
+        self.first_host = None
+        self.last_host = None
+
+        # Delay of each delivery over the fastest one, and age of the
+        # samples when they are retrieved.
+        self.latency = RunningStats()
+        self.age_at_use = RunningStats()
+
+    def update(self, tick: int, host_time: float) -> float:
+        """
+        Add a notification with its time stamp and host arrival time.
+        Returns its device time in seconds.
+        """
+        device_time = self.unwrapper.unwrap(tick) * ST_TICK_PERIOD
+
+        if self.last_device is None:
+            self.first_device = device_time
+            self.first_host = host_time
+        elif device_time - self.last_device > self.gap:
+            self.gaps += 1
+        self.last_device = device_time
+        self.last_host = host_time
+        self.packets += 1
+
+        self.sync.update(device_time, host_time)
+        self.latency.add(host_time - self.sync.to_host(device_time))
+        return device_time
+
+    def device_time(self, tick: int) -> float:
+        """ Device time of a time stamp received recently. """
+        return self.unwrapper.nearest(tick) * ST_TICK_PERIOD
+
+    def age(self, tick: int, host_time: float) -> Union[float, None]:
+        """
+        Age in seconds of a sample at a host time: the time since it would
+        have arrived with the fastest delivery. None until the clock has
+        received a notification.
+        """
+        if self.sync.offset is None:
+            return None
+        return host_time - self.sync.to_host(self.device_time(tick))
+
+    def consumed(self, tick: int, host_time: float) -> Union[float, None]:
+        """
+        Record the retrieval of a sample at a host time, and return its age
+        in seconds (see age()).
+        """
+        age = self.age(tick, host_time)
+        if age is not None:
+            self.age_at_use.add(age)
+        return age
+
+    @property
+    def dropped(self) -> int:
+        """
+        Notifications missing for the nominal interval, between the first
+        and last received ones. Counted over the whole stream, since a time
+        stamp resolution of 8ms cannot tell a single missing 10ms interval.
+        """
+        if self.last_device is None:
+            return 0
+        expected = round(
+            (self.last_device - self.first_device) / self.interval
+        ) + 1
+        return max(0, expected - self.packets)
+
+    @property
+    def rate(self) -> float:
+        """ Received notifications per second of host time. """
+        if self.packets < 2 or self.last_host == self.first_host:
+            return 0.0
+        return (self.packets - 1) / (self.last_host - self.first_host)
+
+    def summary(self) -> dict:
+        """ Metrics of the stream, with times in milliseconds. """
+        return {
+            "stream": self.stream,
+            "packets": self.packets,
+            "rate_hz": round(self.rate, 2),
+            "gaps": self.gaps,
+            "dropped": self.dropped,
+            "offset_s": self.sync.offset,
+            "drift_ppm": round(self.sync.drift * 1e6, 2),
+            "latency_ms": self.latency.summary(),
+            "age_ms": self.age_at_use.summary(),
+        }
+
+    def report(self) -> str:
+        """ One-line summary for the console. """
+        if not self.packets:
+            return f"{self.stream}: no notifications"
+        latency, age = self.latency.summary(), self.age_at_use.summary()
+        return (
+            f"{self.stream}: {self.packets} packets at {self.rate:.1f}Hz, "
+            f"{self.gaps} gaps, {self.dropped} dropped; "
+            f"drift {self.sync.drift * 1e6:.1f}ppm; "
+            f"latency jitter {latency['std']}ms (max {latency['max']}ms); "
+            f"age at use {age['mean']}ms (max {age['max']}ms)"
+        )
@@ -0,0 +1,448 @@
+"""
+Decoders for the GATT notifications of the STMicroelectronics SensorTile.
+
+The format of every notification is precompiled into a struct.Struct, and
+values are computed with the 'math' module, since scalar NumPy calls are
+several times slower for single values. Results match the values that
+were previously computed with NumPy, once rounded to 2 decimals, except
+for quaternions: their norm is a plain sum of squares, while np.dot may
+sum with fused multiply-adds depending on the platform. The norms then
+differ in the last bit, so rounded quaternion values can differ by 0.01
+at rounding ties (about 0.2% of packets, see bench_decode.py).
+
+Buffered notifications can also be decoded in blocks with NumPy. Both paths
+evaluate the same formulas (see orientation, normalize_quaternion and
+euler_angles), only swapping the elementary functions: 'SCALAR' uses the
+math module, and 'BLOCK' uses NumPy ufuncs.
+"""
+
+# Python Libraries
+import math
+from struct import Struct
+from typing import Callable, Dict, NamedTuple, Tuple, Union
+
+# Third-Party Libraries
+import numpy as np
+
+# Local Files
+from st_samples import EnvironmentSample, MotionSample, QuaternionSample
+
+
+# Precompiled GATT formats. Every value is a 2-byte little-endian int,
+# starting with the time stamp (see ST_RAW_FIELDS in constants.py).
+ENVIRONMENT_FORMAT = Struct('<hhhhh')
+MOTION_FORMAT = Struct('<hhhhhhhhhh')
+QUATERNIONS_FORMAT = Struct('<hhhh')
+
+# Same factor used by np.degrees, so that conversions are identical.
+_RAD_TO_DEG = 180.0 / math.pi
+
+
+def round2(value: float) -> float:
+    """
+    Round to 2 decimals the way np.round does: scale, round half to even,
+    and scale back.
+    """
+    # NaN cannot be rounded to an int.
+    if value != value:
+        return value
+    return round(value * 100) / 100
+
+
+def _divide(dividend: float, divisor: float) -> float:
+    """ Division that yields NaN for a null divisor, like NumPy. """
+    return dividend / divisor if divisor else math.nan
+
+
+class Backend(NamedTuple):
+    """
+    Elementary functions used to evaluate the decoding formulas.
+    """
+    sqrt: Callable
+    acos: Callable
+    asin: Callable
+    atan2: Callable
+    divide: Callable
+    clip: Callable
+    round2: Callable
+
+
+SCALAR = Backend(
+    math.sqrt, math.acos, math.asin, math.atan2, _divide,
+    lambda value: min(max(value, -1.0), 1.0),
+    round2,
+)
+
+BLOCK = Backend(
+    np.sqrt, np.arccos, np.arcsin, np.arctan2, np.divide,
+    lambda values: np.clip(values, -1.0, 1.0),
+    lambda values: np.rint(values * 100) / 100,
+)
+
+
+################
+### FORMULAS ###
+################
+
+def orientation(
+    acc_x, acc_y, acc_z, m: Backend = SCALAR
+) -> Tuple[float, float, float]:
+    """
+    Spherical coordinates of the acceleration vector, rounded to 2 decimals:
+    * 'r' is radial distance (i.e., distance to origin), or magnitude
+    * 'theta' is polar angle (i.e., angle with respect to polar axis)
+    * 'phi' is azimuth angle (i.e., angle of rotation from initial
+      meridian plane)
+    A null magnitude has no defined polar angle, so theta is NaN.
+    """
+    # The sum of squares of ints is exact, like the previous np.dot.
+    r = m.round2(m.sqrt(acc_x * acc_x + acc_y * acc_y + acc_z * acc_z))
+    theta = m.round2(m.acos(m.divide(acc_z, r)) * _RAD_TO_DEG)
+    phi = m.round2(m.atan2(acc_y, acc_z) * _RAD_TO_DEG)
+    return r, theta, phi
+
+
+def normalize_quaternion(
+    quat_w: float, raw_i: int, raw_j: int, raw_k: int
+) -> Tuple[float, float, float, float]:
+    """
+    Normalize the incoming vector quaternion, add the real component, and
+    normalize all 4 quaternion values.
+    """
+    norm = math.sqrt(raw_i * raw_i + raw_j * raw_j + raw_k * raw_k)
+    if norm > 0:
+        i, j, k = raw_i / norm, raw_j / norm, raw_k / norm
+    else:
+        i, j, k = raw_i, raw_j, raw_k
+
+    norm = math.sqrt(quat_w * quat_w + i * i + j * j + k * k)
+    return quat_w / norm, i / norm, j / norm, k / norm
+
+
+def euler_angles(w, i, j, k, m: Backend = SCALAR) -> Tuple[float, float, float]:
+    """
+    Roll, pitch and yaw (rotations about the x, y and z axes) of a unit
+    quaternion, in degrees rounded to 2 decimals.
+    """
+    roll = m.round2(m.atan2(
+        2 * (w * i + j * k),
+        1 - 2 * (i * i + j * j)
+    ) * _RAD_TO_DEG)
+
+    # Prevent passing a value outside the arcsine input range,
+    # which is -1 to 1 inclusive.
+    pitch = m.round2(m.asin(m.clip(2 * (w * j - i * k))) * _RAD_TO_DEG)
+
+    yaw = m.round2(m.atan2(
+        2 * (w * k + i * j),
+        1 - 2 * (j * j + k * k)
+    ) * _RAD_TO_DEG)
+
+    return roll, pitch, yaw
+
+
+##########################
+### PER-PACKET DECODING ###
+##########################
+
+def decode_environment(data: bytearray) -> Tuple[int, EnvironmentSample]:
+    """
+    Decode an environment notification into its time stamp and values.
+    """
+    time_stamp, pressure, humidity, temp2, temp1 = \
+        ENVIRONMENT_FORMAT.unpack_from(data)
+
+    # The order of the temp sensors is swapped in the ST GATT transfer.
+    return time_stamp, EnvironmentSample(pressure, humidity, temp1, temp2)
+
+
+def decode_motion(data: bytearray) -> Tuple[int, MotionSample]:
+    """
+    Decode a motion notification into its time stamp and values, including
+    the orientation computed from the accelerometer.
+    """
+    time_stamp, acc_x, acc_y, acc_z, gyr_x, gyr_y, gyr_z, \
+        mag_x, mag_y, mag_z = MOTION_FORMAT.unpack_from(data)
+
+    r, theta, phi = orientation(acc_x, acc_y, acc_z)
+
+    # Gyroscope data is multiplied by 100 to compensate for the division
+    # applied in the firmware.
+    return time_stamp, MotionSample(
+        acc_x, acc_y, acc_z,
+        gyr_x * 100, gyr_y * 100, gyr_z * 100,
+        mag_x, mag_y, mag_z,
+        r, theta, phi,
+    )
+
+
+def decode_quaternions(
+    data: bytearray, quat_w: float
+) -> Tuple[int, QuaternionSample, float]:
+    """
+    Decode a quaternion notification into its time stamp and values,
+    including Euler angles. quat_w is the real component of the previous
+    quaternion. Returns the real component of the decoded quaternion as
+    well, to be used for the next notification.
+    """
+    time_stamp, raw_i, raw_j, raw_k = QUATERNIONS_FORMAT.unpack_from(data)
+
+    w, i, j, k = normalize_quaternion(quat_w, raw_i, raw_j, raw_k)
+    roll, pitch, yaw = euler_angles(w, i, j, k)
+
+    return time_stamp, QuaternionSample(
+        raw_i, raw_j, raw_k,
+        round2(w), round2(i), round2(j), round2(k),
+        roll, pitch, yaw,
+    ), w
+
+
+######################
+### BLOCK DECODING ###
+######################
+
+def words(data: Union[bytes, bytearray, memoryview], size: int) -> np.ndarray:
+    """
+    View contiguous notifications of size bytes as a (packets, values)
+    array of 2-byte ints, without copying.
+    """
+    return np.frombuffer(data, dtype='<i2').reshape(-1, size // 2)
+
+
+def decode_environment_block(block: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Decode a (packets, 5) block of environment notifications into columns.
+    """
+    return {
+        'ticks': block[:, 0],
+        'pressure': block[:, 1],
+        'humidity': block[:, 2],
+        'temp1': block[:, 4],
+        'temp2': block[:, 3],
+    }
+
+
+def decode_motion_block(block: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Decode a (packets, 10) block of motion notifications into columns.
+    """
+    # Widen the values, so that squares and gyroscope values don't overflow.
+    wide = block.astype(np.int64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r, theta, phi = orientation(wide[:, 1], wide[:, 2], wide[:, 3], BLOCK)
+
+    return {
+        'ticks': block[:, 0],
+        'acc_x': block[:, 1],
+        'acc_y': block[:, 2],
+        'acc_z': block[:, 3],
+        'gyr_x': wide[:, 4] * 100,
+        'gyr_y': wide[:, 5] * 100,
+        'gyr_z': wide[:, 6] * 100,
+        'mag_x': block[:, 7],
+        'mag_y': block[:, 8],
+        'mag_z': block[:, 9],
+        'r': r,
+        'theta': theta,
+        'phi': phi,
+    }
+
+
+def decode_quaternions_block(
+    block: np.ndarray, quat_w: float
+) -> Tuple[Dict[str, np.ndarray], float]:
+    """
+    Decode a (packets, 4) block of quaternion notifications into columns.
+    quat_w is the real component of the quaternion preceding the block.
+    Returns the real component of the last quaternion as well.
+    """
+    raw = block[:, 1:].astype(np.int64)
+
+    # Normalize the vector quaternions, keeping null ones as they are.
+    norm = np.sqrt((raw * raw).sum(axis=1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vector = np.where(norm[:, None] > 0, raw / norm[:, None], raw)
+    i, j, k = vector[:, 0], vector[:, 1], vector[:, 2]
+
+    # Every real component depends on the previous one, so the norms are
+    # computed in sequence, in the same order of operations as
+    # normalize_quaternion.
+    norms = np.empty(len(block))
+    real = np.empty(len(block))
+    w = float(quat_w)
+    for index, (ii, jj, kk) in enumerate(zip(
+            (i * i).tolist(), (j * j).tolist(), (k * k).tolist())):
+        norm = math.sqrt(w * w + ii + jj + kk)
+        w = w / norm
+        norms[index] = norm
+        real[index] = w
+    i, j, k = i / norms, j / norms, k / norms
+
+    roll, pitch, yaw = euler_angles(real, i, j, k, BLOCK)
+
+    return {
+        'ticks': block[:, 0],
+        'raw_i': block[:, 1],
+        'raw_j': block[:, 2],
+        'raw_k': block[:, 3],
+        'norm_w': BLOCK.round2(real),
+        'norm_i': BLOCK.round2(i),
+        'norm_j': BLOCK.round2(j),
+        'norm_k': BLOCK.round2(k),
+        'roll': roll,
+        'pitch': pitch,
+        'yaw': yaw,
+    }, w
+
+
+#############################
+### PACKED NOTIFICATIONS ###
+#############################
+
+# Packed notifications carry several consecutive samples of a stream, to
+# reduce the number of notifications per second. Layout (version 1), with
+# little-endian values:
+#   uint8 version, uint8 count, int16 base time stamp,
+#   uint8 time stamp delta of every sample from the base,
+#   int16 values of every sample, in the order of the regular notifications
+# Regular notifications always have a different size than packed ones.
+PACKED_VERSION = 1
+PACKED_HEADER = Struct('<BBh')
+
+
+class PackedLayout:
+    """
+    Packed notifications of a stream with a number of 2-byte values per
+    sample, besides the time stamp. Packed samples are unpacked into the
+    payloads of regular notifications, so they are decoded the same way.
+    """
+
+    def __init__(self, values: int) -> None:
+        self.values = values
+        self.sample = Struct('<' + 'h' * (values + 1))
+        # Precompiled formats, keyed by the number of samples.
+        self.formats = {}
+
+    def _format(self, count: int) -> Struct:
+        packed = self.formats.get(count)
+        if packed is None:
+            packed = self.formats[count] = Struct(
+                f'<BBh{count}B{count * self.values}h'
+            )
+        return packed
+
+    def size(self, count: int) -> int:
+        """ Size in bytes of a notification with count samples. """
+        return PACKED_HEADER.size + count * (1 + 2 * self.values)
+
+    def unpack(self, data: bytearray) -> Union[list, None]:
+        """
+        Payloads of the regular notifications of the samples in a packed
+        notification, or None if the notification is malformed.
+        """
+        if len(data) < PACKED_HEADER.size:
+            return None
+        version, count, _ = PACKED_HEADER.unpack_from(data)
+        if version != PACKED_VERSION or len(data) != self.size(count):
+            return None
+
+        fields = self._format(count).unpack_from(data)
+        base, values, pack = fields[2], self.values, self.sample.pack
+        start = 3 + count
+        payloads = []
+        for index, delta in enumerate(fields[3:start]):
+            # Time stamps wrap around as 2-byte signed values.
+            time_stamp = (base + delta + 32768) % 65536 - 32768
+            offset = start + index * values
+            payloads.append(pack(time_stamp, *fields[offset:offset + values]))
+        return payloads
+
+    def pack(self, block: np.ndarray) -> bytes:
+        """
+        Pack a (samples, values) block of regular notifications (see
+        words()), whose time stamps span less than 256 ticks.
+        """
+        time_stamps = block[:, 0].astype(np.int64)
+        deltas = (time_stamps - time_stamps[0]) % 65536
+        if deltas.max() > 255:
+            raise ValueError("Packed samples span more than 255 ticks.")
+        return self._format(len(block)).pack(
+            PACKED_VERSION, len(block), int(time_stamps[0]),
+            *deltas.tolist(), *block[:, 1:].ravel().tolist()
+        )
+
+
+def detect_layout(
+    data: bytearray, size: int
+) -> Union[PackedLayout, None]:
+    """
+    Layout of the notifications of a stream, detected from its first
+    notification: None for regular notifications of size bytes, or the
+    packed layout of their values.
+    """
+    if len(data) == size or not data or data[0] != PACKED_VERSION:
+        return None
+    return PackedLayout(size // 2 - 1)
+
+
+class PacketRing:
+    """
+    Contiguous byte ring buffer of fixed-size notifications, decoded in
+    blocks. When the ring is full, the oldest packets are overwritten and
+    counted as overwritten.
+    """
+
+    def __init__(self, packet_size: int, capacity: int = 4096) -> None:
+        """
+        packet_size is the size in bytes of every notification
+        capacity is the number of packets held by the ring
+        """
+        self.packet_size = packet_size
+        self.capacity = capacity
+        self.buffer = bytearray(packet_size * capacity)
+
+        # Total number of appended and read packets. Their difference is
+        # the number of pending packets.
+        self.written = 0
+        self.read = 0
+        self.overwritten = 0
+        self.malformed = 0
+
+    def __len__(self) -> int:
+        return self.written - self.read
+
+    def append(self, data: bytearray) -> None:
+        """
+        Copy a notification into the ring.
+        """
+        size = self.packet_size
+        if len(data) < size:
+            self.malformed += 1
+            return
+
+        offset = (self.written % self.capacity) * size
+        self.buffer[offset:offset + size] = \
+            data if len(data) == size else data[:size]
+        self.written += 1
+
+        if self.written - self.read > self.capacity:
+            self.read += 1
+            self.overwritten += 1
+
+    def take(self) -> np.ndarray:
+        """
+        Return the pending packets as a (packets, values) array of 2-byte
+        ints, and mark them as read. The array is a copy, since the ring is
+        overwritten by the following notifications.
+        """
+        start = self.read % self.capacity
+        count = len(self)
+        self.read = self.written
+
+        block = words(self.buffer, self.packet_size)
+        if start + count <= self.capacity:
+            return block[start:start + count].copy()
+        return np.concatenate(
+            (block[start:], block[:start + count - self.capacity])
+        )
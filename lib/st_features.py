@@ -0,0 +1,232 @@
+"""
+Incremental motion features for gestures such as shakes and flicks, besides
+the instantaneous orientation of the acceleration ('r', 'theta', 'phi'):
+* 'jerk' is the RMS of the rate of change of the acceleration vector over a
+  short window, in mg/s
+* 'energy' is the RMS deviation of the acceleration magnitude from its mean
+  over the same window, in mg
+* 'angular_velocity' is the magnitude of the gyroscope vector, in dps
+* 'tilt_rate' is the rate of change of the polar angle, in degrees/s
+
+Every feature is updated in constant time per sample, from running sums
+over ring buffers. The batch variant computes the same features over a
+logged session with NumPy, so offline analysis sees what the performance
+used.
+"""
+
+# Python Libraries
+from array import array
+import math
+from typing import Dict, Iterator, Mapping, Union
+
+# Third-Party Libraries
+import numpy as np
+
+# Local Files
+from constants import ST_NOTIFICATION_INTERVAL, ST_TICK_PERIOD
+
+
+class _RunningWindow:
+    """
+    Mean and mean of squares of the last values of a stream, from running
+    sums. The sums are recomputed whenever the ring wraps around, so that
+    rounding errors do not accumulate over a session.
+    """
+
+    __slots__ = ('ring', 'size', 'count', 'index', 'sum', 'squares')
+
+    def __init__(self, size: int) -> None:
+        self.ring = array('d', [0.0] * size)
+        self.size = size
+        self.reset()
+
+    def reset(self) -> None:
+        self.count = 0
+        self.index = 0
+        self.sum = 0.0
+        self.squares = 0.0
+
+    def push(self, value: float) -> None:
+        ring, index = self.ring, self.index
+        if self.count == self.size:
+            old = ring[index]
+            self.sum -= old
+            self.squares -= old * old
+        else:
+            self.count += 1
+        ring[index] = value
+        self.sum += value
+        self.squares += value * value
+
+        self.index = index + 1
+        if self.index == self.size:
+            self.index = 0
+            self.sum = math.fsum(ring)
+            self.squares = math.fsum(value * value for value in ring)
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    @property
+    def mean_squares(self) -> float:
+        return self.squares / self.count if self.count else 0.0
+
+
+class MotionFeatures(Mapping):
+    """
+    Motion features updated from every motion sample (see st_samples.py).
+    The latest values are attributes (e.g., 'features.jerk'), and the
+    extractor is a read-only mapping of the same names (e.g.,
+    'features["jerk"]'), so that they can be mapped like sample values.
+    """
+
+    FIELDS = ('jerk', 'energy', 'angular_velocity', 'tilt_rate')
+
+    def __init__(self, window: float = 0.2,
+                 interval: float = ST_NOTIFICATION_INTERVAL['motion'],
+                 gap_intervals: float = 3) -> None:
+        """
+        window is the duration of the windows of jerk and energy, in seconds
+        interval is the nominal time between samples, in seconds
+        gap_intervals is the number of intervals without samples that
+        counts as a gap. Rates of change are computed with the nominal
+        interval, since time stamps have a resolution of 8ms, and with the
+        actual time across gaps.
+        """
+        self.size = max(1, round(window / interval))
+        self.interval = interval
+        self.gap = gap_intervals * interval + ST_TICK_PERIOD
+
+        self.jerks = _RunningWindow(self.size)
+        self.radii = _RunningWindow(self.size)
+        self.reset()
+
+    def reset(self) -> None:
+        """ Forget previous samples. """
+        self.jerks.reset()
+        self.radii.reset()
+        self.previous = None
+        self.samples = 0
+        self.jerk = 0.0
+        self.energy = 0.0
+        self.angular_velocity = 0.0
+        self.tilt_rate = 0.0
+
+    def __getitem__(self, key: str) -> float:
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.FIELDS)
+
+    def __len__(self) -> int:
+        return len(self.FIELDS)
+
+    def update(self, sample, time: Union[float, None] = None) -> None:
+        """
+        Add a motion sample taken at a device time in seconds (see
+        st_clock.py).
+        """
+        acc_x, acc_y, acc_z = sample.acc_x, sample.acc_y, sample.acc_z
+        theta = sample.theta
+
+        previous = self.previous
+        if previous is not None:
+            period = self.interval
+            if time is not None and previous[0] is not None \
+                    and time - previous[0] > self.gap:
+                period = time - previous[0]
+            jerk = math.sqrt(
+                (acc_x - previous[1]) ** 2 + (acc_y - previous[2]) ** 2
+                + (acc_z - previous[3]) ** 2
+            ) / period
+            self.jerks.push(jerk * jerk)
+            self.jerk = math.sqrt(self.jerks.mean)
+
+            tilt_rate = (theta - previous[4]) / period
+            # Undefined polar angles (null acceleration) have no rate.
+            self.tilt_rate = tilt_rate if tilt_rate == tilt_rate else 0.0
+        self.previous = (time, acc_x, acc_y, acc_z, theta)
+
+        radii = self.radii
+        radii.push(sample.r)
+        self.energy = math.sqrt(max(radii.mean_squares - radii.mean ** 2, 0.0))
+
+        self.angular_velocity = math.sqrt(
+            sample.gyr_x * sample.gyr_x + sample.gyr_y * sample.gyr_y
+            + sample.gyr_z * sample.gyr_z
+        ) / 1000
+        self.samples += 1
+
+    def batch(self, columns: Mapping[str, np.ndarray],
+              times: Union[np.ndarray, None] = None) -> Dict[str, np.ndarray]:
+        """
+        Features of every sample of a logged session, as columns, from the
+        first sample. columns are motion columns (see st_decode.py), and
+        times are device times in seconds (e.g., unwrapped ticks times
+        ST_TICK_PERIOD).
+        """
+        acc = np.column_stack([
+            np.asarray(columns[name], dtype=np.float64)
+            for name in ('acc_x', 'acc_y', 'acc_z')
+        ])
+        count = len(acc)
+        periods = np.full(count, self.interval)
+        if times is not None and count > 1:
+            steps = np.diff(np.asarray(times, dtype=np.float64))
+            periods[1:] = np.where(steps > self.gap, steps, self.interval)
+
+        # The first sample has no rates of change.
+        jerks = np.full(count, np.nan)
+        jerks[1:] = np.sqrt(
+            (np.diff(acc, axis=0) ** 2).sum(axis=1)
+        ) / periods[1:]
+        jerk = np.sqrt(_window_mean(jerks * jerks, self.size))
+        jerk[np.isnan(jerk)] = 0.0
+
+        radii = np.asarray(columns['r'], dtype=np.float64)
+        energy = np.sqrt(np.maximum(
+            _window_mean(radii * radii, self.size)
+            - _window_mean(radii, self.size) ** 2, 0.0
+        ))
+
+        gyr = np.column_stack([
+            np.asarray(columns[name], dtype=np.float64)
+            for name in ('gyr_x', 'gyr_y', 'gyr_z')
+        ])
+        angular_velocity = np.sqrt((gyr * gyr).sum(axis=1)) / 1000
+
+        theta = np.asarray(columns['theta'], dtype=np.float64)
+        tilt_rate = np.zeros(count)
+        tilt_rate[1:] = np.diff(theta) / periods[1:]
+        tilt_rate[np.isnan(tilt_rate)] = 0.0
+
+        return {
+            'jerk': jerk,
+            'energy': energy,
+            'angular_velocity': angular_velocity,
+            'tilt_rate': tilt_rate,
+        }
+
+    def report(self) -> str:
+        """ Latest features for the console. """
+        values = ", ".join(
+            f"{name} {getattr(self, name):.1f}" for name in self.FIELDS
+        )
+        return f"Motion features after {self.samples} samples: {values}"
+
+
+def _window_mean(values: np.ndarray, size: int) -> np.ndarray:
+    """
+    Mean of the last size values at every sample, ignoring NaN values (NaN
+    if there are none), like _RunningWindow over the defined values.
+    """
+    padded = np.concatenate((np.full(size - 1, np.nan), values))
+    windows = np.lib.stride_tricks.sliding_window_view(padded, size)
+    defined = ~np.isnan(windows)
+    counts = defined.sum(axis=1)
+    sums = np.where(defined, windows, 0.0).sum(axis=1)
+    return np.divide(sums, counts, out=np.full(len(values), np.nan),
+                     where=counts > 0)
@@ -0,0 +1,294 @@
+"""
+Streaming smoothing filters for ST values, applied between the SensorTile
+and the mapping of values to synth parameters.
+
+Every filter processes a vector of channels (e.g., 'r', 'theta' and 'phi')
+per sample in constant time, with its state kept in compact arrays.
+Parameters are either a single value for every channel or a sequence with a
+value per channel. The batch variant runs the same filter over a logged
+session, so offline analysis sees exactly what the performance used.
+Undefined values (NaN, e.g., theta with a null acceleration) are skipped,
+and the filtered value of their channel is held.
+"""
+
+# Python Libraries
+from abc import ABC, abstractmethod
+from array import array
+import bisect
+import math
+from operator import attrgetter
+from typing import Sequence, Union
+
+# Third-Party Libraries
+import numpy as np
+
+
+Parameter = Union[float, Sequence[float]]
+
+
+def _per_channel(value: Parameter, channels: int) -> array:
+    """ Array with a parameter value per channel. """
+    if isinstance(value, (int, float)):
+        return array('d', [value] * channels)
+    if len(value) != channels:
+        raise ValueError(f"Expected {channels} values, got {len(value)}.")
+    return array('d', value)
+
+
+class _Filter(ABC):
+    """
+    Base class of the filters. Subclasses implement __call__ and reset.
+    """
+
+    def __init__(self, channels: int) -> None:
+        self.channels = channels
+
+    @abstractmethod
+    def __call__(self, values: Sequence[float],
+                 time: Union[float, None] = None) -> array:
+        """
+        Filter the values of a sample taken at a time in seconds, and
+        return the filtered values. The returned array is reused.
+        """
+
+    @abstractmethod
+    def reset(self) -> None:
+        """ Forget previous samples. """
+
+    def batch(self, values: np.ndarray,
+              times: Union[np.ndarray, None] = None) -> np.ndarray:
+        """
+        Filter a (samples, channels) array from the first sample, with the
+        same results as filtering every sample as it arrives.
+        """
+        self.reset()
+        filtered = np.empty((len(values), self.channels))
+        rows = values.tolist()
+        if times is None:
+            for i, row in enumerate(rows):
+                filtered[i] = self(row)
+        else:
+            for i, (row, time) in enumerate(zip(rows, times.tolist())):
+                filtered[i] = self(row, time)
+        return filtered
+
+
+class EMAFilter(_Filter):
+    """
+    Exponential moving average. alpha is the weight of every new value,
+    between 0 (frozen) and 1 (no smoothing).
+    """
+
+    def __init__(self, channels: int, alpha: Parameter = 0.2) -> None:
+        super().__init__(channels)
+        self.alpha = _per_channel(alpha, channels)
+        self.state = array('d', [0.0] * channels)
+        self.started = False
+
+    def __call__(self, values, time=None) -> array:
+        state = self.state
+        if not self.started:
+            state[:] = array('d', values)
+            self.started = True
+            return state
+        for i, alpha in enumerate(self.alpha):
+            value = values[i]
+            if value != value:
+                continue
+            if state[i] != state[i]:
+                state[i] = value
+            else:
+                state[i] += alpha * (value - state[i])
+        return state
+
+    def reset(self) -> None:
+        self.started = False
+
+
+class OneEuroFilter(_Filter):
+    """
+    One euro filter (Casiez et al., 2012): a low-pass filter whose cutoff
+    frequency rises with the speed of the signal, smoothing jitter at rest
+    while keeping fast movements responsive.
+    min_cutoff is the cutoff frequency at rest, in Hz
+    beta is the increase of the cutoff frequency per unit of speed
+    d_cutoff is the cutoff frequency used to smooth the speed, in Hz
+    rate is the sample rate used when samples have no time
+    """
+
+    def __init__(self, channels: int, min_cutoff: Parameter = 1.0,
+                 beta: Parameter = 0.01, d_cutoff: Parameter = 1.0,
+                 rate: float = 100) -> None:
+        super().__init__(channels)
+        self.min_cutoff = _per_channel(min_cutoff, channels)
+        self.beta = _per_channel(beta, channels)
+        self.d_cutoff = _per_channel(d_cutoff, channels)
+        self.period = 1 / rate
+
+        self.state = array('d', [0.0] * channels)
+        self.speed = array('d', [0.0] * channels)
+        self.time = None
+        self.started = False
+
+    @staticmethod
+    def _alpha(cutoff: float, period: float) -> float:
+        """ Smoothing factor of a low-pass filter for a sample period. """
+        return 1 / (1 + 1 / (2 * math.pi * cutoff * period))
+
+    def __call__(self, values, time=None) -> array:
+        state, speed = self.state, self.speed
+        if not self.started:
+            state[:] = array('d', values)
+            self.time = time
+            self.started = True
+            return state
+
+        period = self.period
+        if time is not None and self.time is not None and time > self.time:
+            period = time - self.time
+        self.time = time
+
+        alpha = self._alpha
+        for i in range(self.channels):
+            value = values[i]
+            if value != value:
+                continue
+            if state[i] != state[i]:
+                state[i] = value
+                continue
+            speed[i] += alpha(self.d_cutoff[i], period) \
+                * ((value - state[i]) / period - speed[i])
+            cutoff = self.min_cutoff[i] + self.beta[i] * abs(speed[i])
+            state[i] += alpha(cutoff, period) * (value - state[i])
+        return state
+
+    def reset(self) -> None:
+        self.speed[:] = array('d', [0.0] * self.channels)
+        self.time = None
+        self.started = False
+
+
+class MedianFilter(_Filter):
+    """
+    Median of the last size values of every channel, which removes spikes
+    without smoothing edges. Until size values are received, the median of
+    the received ones is used.
+    """
+
+    def __init__(self, channels: int, size: int = 5) -> None:
+        super().__init__(channels)
+        self.size = size
+        # Ring of the last values, and the same values kept sorted, per
+        # channel.
+        self.ring = array('d', [0.0] * (size * channels))
+        self.sorted = [[] for _ in range(channels)]
+        self.count = 0
+        self.state = array('d', [0.0] * channels)
+
+    def __call__(self, values, time=None) -> array:
+        size, ring, state = self.size, self.ring, self.state
+        slot = self.count % size
+        full = self.count >= size
+        self.count += 1
+
+        for i, window in enumerate(self.sorted):
+            value = values[i]
+            if value != value:
+                # Repeat the last median instead of an undefined value.
+                value = state[i]
+            position = i * size + slot
+            if full:
+                del window[bisect.bisect_left(window, ring[position])]
+            ring[position] = value
+            bisect.insort(window, value)
+
+            middle = len(window) // 2
+            state[i] = window[middle] if len(window) % 2 \
+                else (window[middle - 1] + window[middle]) / 2
+        return state
+
+    def reset(self) -> None:
+        self.count = 0
+        self.state[:] = array('d', [0.0] * self.channels)
+        for window in self.sorted:
+            window.clear()
+
+
+FILTERS = {
+    "ema": EMAFilter,
+    "one_euro": OneEuroFilter,
+    "median": MedianFilter,
+}
+
+
+def make_filter(name: str, channels: int, **settings) -> _Filter:
+    """ Create a filter by name (see FILTERS). """
+    return FILTERS[name](channels, **settings)
+
+
+class FilterStage:
+    """
+    Filter stage over named fields of ST samples (see st_samples.py).
+    The latest filtered values are kept in 'values', in the order of the
+    fields.
+
+    The stage also counts distinct parameter updates: how often a value
+    changes by at least its resolution, before and after filtering. Every
+    distinct update is a parameter change that has to reach the synth.
+    """
+
+    def __init__(self, fields: Sequence[str], smoothing: _Filter,
+                 resolution: Parameter = 0.5) -> None:
+        """
+        fields are the names of the filtered sample values
+        smoothing is the filter applied to them
+        resolution is the smallest change of a value that counts as a
+        distinct parameter update
+        """
+        self.fields = tuple(fields)
+        self.filter = smoothing
+        self.read = attrgetter(*self.fields)
+        self.resolution = _per_channel(resolution, len(self.fields))
+
+        self.values = array('d', [math.nan] * len(self.fields))
+        self.samples = 0
+        self.raw_updates = [0] * len(self.fields)
+        self.filtered_updates = [0] * len(self.fields)
+        self._raw_steps = [None] * len(self.fields)
+        self._filtered_steps = [None] * len(self.fields)
+
+    def update(self, sample, time: Union[float, None] = None) -> array:
+        """
+        Filter the fields of a sample taken at a time in seconds, and
+        return the filtered values.
+        """
+        raw = self.read(sample)
+        if len(self.fields) == 1:
+            raw = (raw,)
+        filtered = self.filter(raw, time)
+        self.values[:] = filtered
+        self.samples += 1
+
+        # Count the changes of the quantized values.
+        for i, resolution in enumerate(self.resolution):
+            if raw[i] == raw[i]:
+                step = math.floor(raw[i] / resolution)
+                if step != self._raw_steps[i]:
+                    self._raw_steps[i] = step
+                    self.raw_updates[i] += 1
+            if filtered[i] == filtered[i]:
+                step = math.floor(filtered[i] / resolution)
+                if step != self._filtered_steps[i]:
+                    self._filtered_steps[i] = step
+                    self.filtered_updates[i] += 1
+        return self.values
+
+    def report(self) -> str:
+        """ Distinct parameter updates per field, before and after. """
+        updates = ", ".join(
+            f"{name} {raw} -> {filtered}"
+            for name, raw, filtered in zip(
+                self.fields, self.raw_updates, self.filtered_updates)
+        )
+        return (f"{type(self.filter).__name__} over {self.samples} samples, "
+                f"distinct updates: {updates}")
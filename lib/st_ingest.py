@@ -0,0 +1,518 @@
+"""
+SensorTile ingestion in a separate process, publishing decoded samples to
+the main process through shared memory.
+
+BLE callbacks, decoding, the performance loop, computer vision and logging
+otherwise share a single interpreter, so notifications wait for the GIL
+whenever the loop or the CV thread are busy. A RemoteSensorTile runs a
+SensorTile (or a SimulatedSensorTile) in its own process instead. Every
+decoded sample is written into a SampleRing of its stream: a ring of fixed
+size records in a multiprocessing.shared_memory block, with a sequence
+number per slot. The main process reads the latest samples or a window of
+them as NumPy records, without pickling or locks.
+
+Writes follow a sequence lock: the slot sequence is invalidated, the record
+is written, the slot sequence is set to the index of the record, and the
+write counter is increased. A record is only accepted by a reader if the
+sequence of its slot matches its index both before and after copying it.
+"""
+
+# Python Libraries
+import asyncio
+import multiprocessing
+from multiprocessing import shared_memory
+from operator import attrgetter
+import queue
+import signal
+import time
+from typing import Dict, Sequence, Tuple, Union
+
+# Third-Party Libraries
+import numpy as np
+
+# Local Files
+from constants import ST_HANDLES, ST_LOG_FIELDS, ST_NOTIFICATION_INTERVAL
+from st_clock import StreamClock
+from st_samples import EnvironmentSample, MotionSample, QuaternionSample
+
+
+SAMPLES = {
+    "environment": EnvironmentSample,
+    "motion": MotionSample,
+    "quaternions": QuaternionSample,
+}
+
+# Size of the ring header, which holds the write counter. A full cache line
+# keeps it apart from the slot sequences.
+_HEADER_SIZE = 64
+
+
+def record_dtype(stream: str) -> np.dtype:
+    """
+    Record of a stream in a SampleRing: the logged fields, with floats
+    widened to 8 bytes so that values are read back exactly, followed by the
+    host time in seconds of time.monotonic() at which the sample was decoded.
+    """
+    return np.dtype([
+        (name, '<f8' if np.dtype(dtype).kind == 'f' else dtype)
+        for name, dtype in ST_LOG_FIELDS[stream]
+    ] + [("host_time", "<f8")])
+
+
+class SampleRing:
+    """
+    Ring of decoded samples of a stream in shared memory, written by a
+    single process and read by any number of processes. When the ring is
+    full, the oldest records are overwritten.
+    """
+
+    def __init__(self, stream: str, capacity: int = 1024,
+                 name: Union[str, None] = None) -> None:
+        """
+        stream is the name of the ST stream
+        capacity is the number of records held by the ring
+        name is the name of an existing ring to attach to. If none is given,
+        a new ring is created, which is removed by unlink().
+        """
+        self.stream = stream
+        self.capacity = capacity
+        self.dtype = record_dtype(stream)
+        self.sample = SAMPLES[stream]
+        self.read_sample = attrgetter(*self.sample.FIELDS)
+
+        size = _HEADER_SIZE + capacity * (8 + self.dtype.itemsize)
+        self.owner = name is None
+        self.memory = shared_memory.SharedMemory(
+            name=name, create=self.owner, size=size if self.owner else 0
+        )
+        self.name = self.memory.name
+
+        buffer = self.memory.buf
+        self.counter = np.ndarray((1,), np.int64, buffer)
+        self.sequences = np.ndarray((capacity,), np.int64, buffer,
+                                    _HEADER_SIZE)
+        self.records = np.ndarray((capacity,), self.dtype, buffer,
+                                  _HEADER_SIZE + capacity * 8)
+        if self.owner:
+            self.counter[0] = 0
+            self.sequences[:] = -1
+
+        # Records of the reader that were overwritten before being read.
+        self.overruns = 0
+
+    def __len__(self) -> int:
+        """ Total number of written records. """
+        return int(self.counter[0])
+
+    def put_nowait(self, item: Union[Tuple[int, object], None]) -> None:
+        """
+        Write a (time stamp, sample) tuple, as put in the SensorTile queues,
+        so that a ring can replace a queue in the ingestion process. None,
+        which wakes up queue consumers on disconnections, is ignored.
+        """
+        if item is None:
+            return
+        time_stamp, sample = item
+        index = int(self.counter[0])
+        slot = index % self.capacity
+
+        self.sequences[slot] = -1
+        self.records[slot] = (time_stamp, *self.read_sample(sample),
+                              time.monotonic())
+        self.sequences[slot] = index
+        self.counter[0] = index + 1
+
+    def read_since(self, index: int) -> Tuple[np.ndarray, int]:
+        """
+        Copy the records written from a given index on. Returns the records
+        and the index following the last one. Records that were already
+        overwritten, or that are overwritten while copying, are skipped and
+        counted in overruns.
+        """
+        end = int(self.counter[0])
+        start = max(index, end - self.capacity)
+        if start >= end:
+            return self.records[:0].copy(), end
+
+        indices = np.arange(start, end)
+        slots = indices % self.capacity
+        before = self.sequences[slots]
+        records = self.records[slots]
+        after = self.sequences[slots]
+        valid = (before == indices) & (after == indices)
+
+        self.overruns += start - index
+        if not valid.all():
+            self.overruns += int(len(valid) - valid.sum())
+            records = records[valid]
+        return records, end
+
+    def window(self, count: int) -> np.ndarray:
+        """ Copy of the last count records, oldest first. """
+        records, _ = self.read_since(max(0, len(self) - count))
+        return records
+
+    def latest(self) -> Union[Tuple[int, object], None]:
+        """
+        Last record as a (time stamp, sample) tuple, or None if no valid
+        record has been written yet.
+        """
+        for _ in range(3):
+            index = int(self.counter[0]) - 1
+            if index < 0:
+                return None
+            slot = index % self.capacity
+            if self.sequences[slot] != index:
+                continue
+            row = self.records[slot].item()
+            if self.sequences[slot] == index:
+                return row[0], self.sample(*row[1:-1])
+        return None
+
+    def close(self) -> None:
+        """ Release the views of the shared memory, and detach from it. """
+        self.counter = self.sequences = self.records = None
+        self.memory.close()
+
+    def unlink(self) -> None:
+        """ Remove the shared memory of a ring created by this process. """
+        if self.owner:
+            self.memory.unlink()
+
+
+class RingQueue:
+    """
+    Consumer side of a SampleRing, with the get() interface of the
+    SensorTile queues: it returns the most recent sample, and waits for a
+    new one if none arrived since the previous call.
+    Every new record updates the stream clock of the tile, and the motion
+    filter for motion samples, so that they still see every notification.
+    """
+
+    def __init__(self, tile: "RemoteSensorTile", ring: SampleRing,
+                 poll: float = 0.001) -> None:
+        self.tile = tile
+        self.ring = ring
+        self.poll = poll
+        self.clock = tile.clocks[ST_HANDLES[ring.stream]]
+        self.next = 0
+
+    def get_nowait(self) -> Tuple[int, object]:
+        """
+        Most recent sample received since the previous call. Raises
+        asyncio.QueueEmpty if there is none, like the SensorTile queues.
+        """
+        records, self.next = self.ring.read_since(self.next)
+        if not len(records):
+            raise asyncio.QueueEmpty
+
+        rows = records.tolist()
+        clock, sample = self.clock, self.ring.sample
+        stages = [
+            stage for stage in (self.tile.motion_filter,
+                                self.tile.motion_features)
+            if stage is not None
+        ] if self.ring.stream == "motion" else []
+        for row in rows:
+            device_time = clock.update(row[0], row[-1])
+            if stages:
+                value = sample(*row[1:-1])
+                for stage in stages:
+                    stage.update(value, device_time)
+        return rows[-1][0], sample(*rows[-1][1:-1])
+
+    async def get(self) -> Union[Tuple[int, object], None]:
+        """
+        Most recent sample, waiting for one if none was received since the
+        previous call. Returns None if the ST is disconnected meanwhile.
+        """
+        while True:
+            try:
+                return self.get_nowait()
+            except asyncio.QueueEmpty:
+                if not self.tile.connected:
+                    return None
+            await asyncio.sleep(self.poll)
+
+
+class RemoteSensorTile:
+    """
+    SensorTile running in an ingestion process, with the interface of a
+    SensorTile used by main.py. Notifications, decoding, captures and
+    reconnections happen in the ingestion process. Stream clocks and the
+    motion filter are updated in this process, as samples are read.
+    """
+
+    def __init__(self, address: str, replay: Union[dict, None] = None,
+                 capacity: int = 1024, poll: float = 0.001) -> None:
+        """
+        address is the address of the ST
+        replay are the arguments of a SimulatedSensorTile (see
+        st_simulator.py) to replay streams instead of connecting to an ST
+        capacity is the number of samples held by the ring of every stream
+        poll is the time between checks for new samples while waiting
+        """
+        self.address = address
+        self.replay = replay
+        self.capacity = capacity
+        self.closing = False
+
+        self.rings = {
+            stream: SampleRing(stream, capacity) for stream in ST_HANDLES
+        }
+        self.clocks = {
+            ST_HANDLES[stream]: StreamClock(stream, interval)
+            for stream, interval in ST_NOTIFICATION_INTERVAL.items()
+        }
+        self.motion_filter = None
+        self.motion_features = None
+        self.block_next = {}
+        self.environment_data = RingQueue(
+            self, self.rings["environment"], poll)
+        self.motion_data = RingQueue(self, self.rings["motion"], poll)
+        self.quaternions_data = RingQueue(
+            self, self.rings["quaternions"], poll)
+
+        # State reported by the ingestion process with every reply.
+        self.unknown_notifications = 0
+        self.malformed_notifications = 0
+        self.recoveries = []
+
+        # The process is spawned, so that it does not inherit the event
+        # loop, threads or camera of this process.
+        self.context = multiprocessing.get_context("spawn")
+        self._connected = self.context.Value('b', False, lock=False)
+        self.commands = self.context.Queue()
+        self.replies = self.context.Queue()
+        self.process = None
+
+    @property
+    def connected(self) -> bool:
+        return bool(self._connected.value) and self.process is not None \
+            and self.process.is_alive()
+
+    async def _reply(self, command: str, timeout: Union[float, None] = None):
+        """
+        Wait for the reply of the ingestion process to a command, and
+        update the reported state. Returns the result of the command, or
+        None if the process exits or the timeout expires first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                name, result, state = self.replies.get_nowait()
+            except queue.Empty:
+                if not self.process.is_alive() and self.replies.empty():
+                    return None
+                if deadline is not None and time.monotonic() > deadline:
+                    return None
+                await asyncio.sleep(0.01)
+                continue
+            self.unknown_notifications = state["unknown_notifications"]
+            self.malformed_notifications = state["malformed_notifications"]
+            self.recoveries = state["recoveries"]
+            if name == command:
+                return result
+
+    async def _request(self, command: str, argument=None,
+                       timeout: Union[float, None] = 10.0):
+        """ Send a command to the ingestion process and wait for its reply. """
+        if self.process is None or not self.process.is_alive():
+            return None
+        self.commands.put((command, argument))
+        return await self._reply(command, timeout)
+
+    async def ble_connect(self, timeout: float = 10.0) -> None:
+        """
+        Start the ingestion process, and wait for it to connect to the ST.
+        """
+        self.process = self.context.Process(
+            target=_ingest,
+            args=(self.address, self.replay, timeout, self.capacity,
+                  {stream: ring.name for stream, ring in self.rings.items()},
+                  self.commands, self.replies, self._connected),
+            name=f"st_ingest_{self.address}", daemon=True,
+        )
+        self.process.start()
+        error = await self._reply("connect")
+        if error is not None or not self.connected:
+            self.process.join(timeout=1.0)
+            self._release_rings()
+            raise ConnectionError(
+                error or f"Ingestion process of {self.address} exited."
+            )
+
+    async def ble_disconnect(self) -> None:
+        """
+        Disconnect from the ST, stop the ingestion process and remove the
+        shared memory.
+        """
+        self.closing = True
+        await self._request("close")
+        self.process.join(timeout=5.0)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self._release_rings()
+
+    def _release_rings(self) -> None:
+        for ring in self.rings.values():
+            ring.close()
+            ring.unlink()
+
+    def enable_packet_rings(
+        self, streams: Sequence[str] = tuple(ST_HANDLES),
+        capacity: int = 4096
+    ) -> None:
+        """
+        Start keeping track of the samples of the given streams taken in
+        blocks with take_block(). The rings of the ingestion process already
+        hold the samples, up to their capacity.
+        """
+        self.block_next = {
+            stream: len(self.rings[stream]) for stream in streams
+        }
+
+    def take_block(self, stream: str) -> dict:
+        """
+        Samples of a stream received since the previous block, as a
+        dictionary of columns.
+        """
+        records, self.block_next[stream] = \
+            self.rings[stream].read_since(self.block_next[stream])
+        return {name: records[name] for name in records.dtype.names}
+
+    async def supervise(self, *args, **kwargs) -> None:
+        """
+        Reconnections are supervised in the ingestion process.
+        """
+
+    async def start_notification(self, char: Union[int, str],
+                                 callback=None) -> None:
+        """
+        Start receiving notifications from a given handle. Only the default
+        callbacks of the ST streams are supported, since callbacks run in
+        the ingestion process.
+        """
+        if callback is not None:
+            print(f"Error: custom callbacks are not supported by the "
+                  f"ingestion process (handle {char})")
+            return
+        await self._request("start", char)
+
+    async def stop_notification(self, char: Union[int, str]) -> None:
+        """ Stop receiving notifications from a given handle. """
+        await self._request("stop", char)
+
+    def start_capture(self, path_prefix: str, writer=None) -> None:
+        """
+        Record every notification in the ingestion process, which writes
+        the raw session logs with its own writer thread.
+        """
+        self.commands.put(("capture", path_prefix))
+
+    async def stop_capture(
+        self, timeout: float = 5.0
+    ) -> Union["CaptureSummary", None]:
+        """
+        Stop recording notifications, and wait for up to timeout seconds
+        for them to be written. Returns the summary of the capture.
+        """
+        report = await self._request("stop_capture", timeout, timeout + 5.0)
+        return CaptureSummary(report) if report is not None else None
+
+
+class CaptureSummary:
+    """ Report of a capture tap that ran in the ingestion process. """
+
+    def __init__(self, summary: Dict[str, str]) -> None:
+        self.summary = summary
+
+    def report(self) -> Dict[str, str]:
+        return self.summary
+
+
+def _ingest(address: str, replay: Union[dict, None], timeout: float,
+            capacity: int, ring_names: Dict[str, str],
+            commands, replies, connected) -> None:
+    """ Entry point of the ingestion process. """
+    # Keyboard interrupts are handled by the main process, which stops the
+    # ingestion process once its logs are written.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_ingest_session(
+        address, replay, timeout, capacity, ring_names,
+        commands, replies, connected
+    ))
+
+
+async def _ingest_session(address, replay, timeout, capacity, ring_names,
+                          commands, replies, connected,
+                          poll: float = 0.02) -> None:
+    """
+    Connect to the ST, publish its samples in the rings, and run the
+    commands of the main process until it requests to close.
+    """
+    # Imported here, so that the main process does not need Bleak for
+    # replays.
+    from st_ble import SensorTile
+    from st_simulator import SimulatedSensorTile
+
+    def reply(command, result=None):
+        replies.put((command, result, {
+            "unknown_notifications": tile.unknown_notifications,
+            "malformed_notifications": tile.malformed_notifications,
+            "recoveries": tile.recoveries,
+        }))
+
+    tile = SensorTile(address) if replay is None \
+        else SimulatedSensorTile(address=address, **replay)
+    rings = {
+        stream: SampleRing(stream, capacity, name)
+        for stream, name in ring_names.items()
+    }
+    # The rings replace the queues, so the default callbacks publish every
+    # decoded sample.
+    tile.environment_data = rings["environment"]
+    tile.motion_data = rings["motion"]
+    tile.quaternions_data = rings["quaternions"]
+
+    try:
+        await tile.ble_connect(timeout)
+    except Exception as exception:
+        reply("connect", f"Could not connect to {address}: {exception}")
+        for ring in rings.values():
+            ring.close()
+        return
+    connected.value = True
+    reply("connect")
+    supervisor = asyncio.create_task(tile.supervise())
+
+    try:
+        while True:
+            connected.value = tile.connected
+            try:
+                command, argument = commands.get_nowait()
+            except queue.Empty:
+                await asyncio.sleep(poll)
+                continue
+
+            if command == "start":
+                await tile.start_notification(argument)
+                reply(command)
+            elif command == "stop":
+                await tile.stop_notification(argument)
+                reply(command)
+            elif command == "capture":
+                tile.start_capture(argument)
+            elif command == "stop_capture":
+                capture = await tile.stop_capture(argument)
+                reply(command, capture.report() if capture else None)
+            elif command == "close":
+                break
+    finally:
+        supervisor.cancel()
+        connected.value = False
+        await tile.ble_disconnect()
+        reply("close")
+        for ring in rings.values():
+            ring.close()
@@ -0,0 +1,117 @@
+"""
+Typed records of the values decoded from SensorTile notifications.
+
+Samples store their values in slots instead of a per-instance dictionary,
+so they are smaller and faster to create than the dictionaries previously
+put in the SensorTile queues. Values are read as attributes (e.g.,
+'motion.r'), and samples remain read-only mappings of the same key names
+(e.g., 'motion["r"]'), so code that used the dictionaries keeps working.
+"""
+
+# Python Libraries
+from collections.abc import Mapping
+from typing import Iterator, Tuple
+
+
+class _Sample(Mapping):
+    """
+    Read-only mapping interface over the slots of a sample. FIELDS lists
+    the names of the values in the order they are logged.
+    """
+    __slots__ = ()
+    FIELDS: Tuple[str, ...] = ()
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.FIELDS)
+
+    def __len__(self) -> int:
+        return len(self.FIELDS)
+
+    def __contains__(self, key) -> bool:
+        return key in self.FIELDS
+
+    def __repr__(self) -> str:
+        values = ", ".join(
+            f"{name}={getattr(self, name)!r}" for name in self.FIELDS
+        )
+        return f"{type(self).__name__}({values})"
+
+
+class EnvironmentSample(_Sample):
+    """ Barometer, hygrometer and thermometer values. """
+    __slots__ = FIELDS = ('pressure', 'humidity', 'temp1', 'temp2')
+
+    def __init__(
+        self, pressure: int, humidity: int, temp1: int, temp2: int
+    ) -> None:
+        self.pressure = pressure
+        self.humidity = humidity
+        self.temp1 = temp1
+        self.temp2 = temp2
+
+
+class MotionSample(_Sample):
+    """
+    Accelerometer, gyroscope and magnetometer values, and the orientation
+    of the acceleration vector in spherical coordinates.
+    """
+    __slots__ = FIELDS = (
+        'acc_x', 'acc_y', 'acc_z',
+        'gyr_x', 'gyr_y', 'gyr_z',
+        'mag_x', 'mag_y', 'mag_z',
+        'r', 'theta', 'phi',
+    )
+
+    def __init__(
+        self,
+        acc_x: int, acc_y: int, acc_z: int,
+        gyr_x: int, gyr_y: int, gyr_z: int,
+        mag_x: int, mag_y: int, mag_z: int,
+        r: float, theta: float, phi: float
+    ) -> None:
+        self.acc_x = acc_x
+        self.acc_y = acc_y
+        self.acc_z = acc_z
+        self.gyr_x = gyr_x
+        self.gyr_y = gyr_y
+        self.gyr_z = gyr_z
+        self.mag_x = mag_x
+        self.mag_y = mag_y
+        self.mag_z = mag_z
+        self.r = r
+        self.theta = theta
+        self.phi = phi
+
+
+class QuaternionSample(_Sample):
+    """
+    Raw vector quaternion, normalized quaternion, and Euler angles.
+    """
+    __slots__ = FIELDS = (
+        'raw_i', 'raw_j', 'raw_k',
+        'norm_w', 'norm_i', 'norm_j', 'norm_k',
+        'roll', 'pitch', 'yaw',
+    )
+
+    def __init__(
+        self,
+        raw_i: int, raw_j: int, raw_k: int,
+        norm_w: float, norm_i: float, norm_j: float, norm_k: float,
+        roll: float, pitch: float, yaw: float
+    ) -> None:
+        self.raw_i = raw_i
+        self.raw_j = raw_j
+        self.raw_k = raw_k
+        self.norm_w = norm_w
+        self.norm_i = norm_i
+        self.norm_j = norm_j
+        self.norm_k = norm_k
+        self.roll = roll
+        self.pitch = pitch
+        self.yaw = yaw
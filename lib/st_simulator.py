@@ -0,0 +1,392 @@
+"""
+Simulated SensorTile that replays recorded session logs or synthetic data,
+for runs and benchmarks without a SensorTile or Bluetooth.
+
+The simulated tile is a SensorTile whose BleakClient is replaced, so
+notifications, logging, capture and reconnection go through the same code.
+Replays either emit raw GATT notifications through the notification
+callback, which exercises decoding as well, or put the logged samples
+straight into the queues.
+"""
+
+# Python Libraries
+import asyncio
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+
+# Third-Party Libraries
+import numpy as np
+import pandas as pd
+
+# Local Files
+from constants import ST_HANDLES, ST_RAW_FIELDS, ST_TICK_PERIOD
+import session_log
+from st_ble import SensorTile
+from st_decode import decode_environment_block, decode_motion_block, \
+    decode_quaternions_block, PackedLayout
+from st_samples import EnvironmentSample, MotionSample, QuaternionSample
+
+
+SAMPLES = {
+    "environment": EnvironmentSample,
+    "motion": MotionSample,
+    "quaternions": QuaternionSample,
+}
+
+
+class ReplayStream:
+    """
+    Notifications of a single ST stream, both as raw GATT packets and as
+    decoded values, with their unwrapped time stamps.
+    """
+
+    def __init__(self, stream: str, words: np.ndarray,
+                 columns: Union[Dict[str, np.ndarray], None] = None) -> None:
+        """
+        stream is the name of the ST stream
+        words is a (packets, values) array of 2-byte ints in the layout of
+        the GATT notifications (see ST_RAW_FIELDS in constants.py)
+        columns are the decoded values of every packet. If they are not
+        given, they are decoded from the packets.
+        """
+        self.stream = stream
+        self.handle = ST_HANDLES[stream]
+        self.words = np.ascontiguousarray(words, dtype='<i2')
+        self.ticks = session_log.unwrap_ticks(self.words[:, 0])
+        self.columns = columns if columns is not None \
+            else _decode(stream, self.words)
+
+        self._packets = None
+        self._samples = None
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    @property
+    def packets(self) -> List[bytearray]:
+        """ GATT notification payload of every packet. """
+        if self._packets is None:
+            size = self.words.shape[1] * 2
+            data = self.words.tobytes()
+            self._packets = [
+                bytearray(data[offset:offset + size])
+                for offset in range(0, len(data), size)
+            ]
+        return self._packets
+
+    def packed(self, count: int) -> Tuple[np.ndarray, List[bytes]]:
+        """
+        Packed notifications of count consecutive packets (see
+        st_decode.py), and the unwrapped time stamp of the last packet of
+        each, when it is sent. The last notification may hold fewer packets.
+        """
+        layout = PackedLayout(self.words.shape[1] - 1)
+        starts = range(0, len(self), count)
+        payloads = [
+            layout.pack(self.words[start:start + count]) for start in starts
+        ]
+        ends = np.minimum(np.arange(len(payloads)) * count + count,
+                          len(self)) - 1
+        return self.ticks[ends], payloads
+
+    def shifted(self, ticks: int) -> "ReplayStream":
+        """
+        Same stream with time stamps later by ticks, wrapped like the time
+        stamps of the ST, so that repeated replays keep the ST clock
+        increasing.
+        """
+        words = self.words.copy()
+        words[:, 0] = session_log.wrap_ticks(self.ticks + ticks, '<i2')
+        return ReplayStream(self.stream, words, self.columns)
+
+    @property
+    def samples(self) -> list:
+        """
+        (time stamp, sample) tuple of every packet, as put in the queues of
+        the SensorTile.
+        """
+        if self._samples is None:
+            sample = SAMPLES[self.stream]
+            values = zip(*(
+                self.columns[name].tolist() for name in sample.FIELDS
+            ))
+            self._samples = [
+                (time_stamp, sample(*row)) for time_stamp, row in
+                zip(self.words[:, 0].tolist(), values)
+            ]
+        return self._samples
+
+    @classmethod
+    def from_log(cls, file_path: str) -> "ReplayStream":
+        """
+        Load a CSV log or a session log, including the raw logs written by
+        capture taps. Logged values are replayed as they were logged.
+        Raw replays of logged quaternions are decoded again, and differ from
+        the logged values: the real component depends on every previous
+        notification, including those that were not logged.
+        """
+        if file_path.endswith(session_log.EXTENSION):
+            description, records = session_log.read_records(file_path)
+            stream = description["stream"]
+            # 4-byte floats are widened and rounded back to the values that
+            # were received.
+            columns = {
+                name: np.round(records[name].astype(np.float64),
+                               session_log.FLOAT_DECIMALS)
+                if records[name].dtype.kind == 'f' else records[name]
+                for name in records.dtype.names
+            }
+        else:
+            data_frame = pd.read_csv(file_path, index_col=0)
+            stream = session_log.infer_stream(list(data_frame.columns))
+            if session_log.RUN_FIELD[0] in data_frame.columns:
+                # Delta mode CSV logs of earlier versions hold sparse
+                # records.
+                records = session_log.expand_runs(
+                    data_frame.to_records(index=False)
+                )
+                columns = {name: records[name] for name in records.dtype.names}
+            else:
+                columns = {
+                    name: data_frame[name].to_numpy()
+                    for name in data_frame.columns
+                }
+
+        if stream.startswith("raw_"):
+            stream = stream[len("raw_"):]
+            words = np.column_stack([
+                columns[name] for name, _ in ST_RAW_FIELDS[stream]
+            ])
+            return cls(stream, words)
+
+        return cls(stream, _encode(stream, columns), columns)
+
+    @classmethod
+    def synthetic(cls, stream: str, seconds: float, rate: float = 100,
+                  seed: int = 0) -> "ReplayStream":
+        """
+        Generate smooth, slightly noisy notifications of a stream at a given
+        rate in Hz, starting at a time stamp close to the wrap around.
+        """
+        rng = np.random.default_rng(seed)
+        count = int(seconds * rate)
+        time = np.arange(count) / rate
+        ticks = (np.round(time / ST_TICK_PERIOD).astype(np.int64) + 65000)
+
+        def wave(amplitude, period, phase=0.0, noise=0.0):
+            values = amplitude * np.sin(2 * np.pi * time / period + phase)
+            if noise:
+                values += rng.normal(0, noise, count)
+            return values
+
+        if stream == "environment":
+            values = [
+                1013 + wave(2, 600), 45 + wave(3, 900),
+                260 + wave(5, 1200), 255 + wave(5, 1200),
+            ]
+        elif stream == "motion":
+            # Gravity slowly turning around the hand, with gestures on top.
+            tilt = wave(np.pi / 2, 20)
+            turn = 2 * np.pi * time / 30
+            acc = [
+                1000 * np.sin(tilt) * np.cos(turn) + wave(300, 1.7, 0, 10),
+                1000 * np.sin(tilt) * np.sin(turn) + wave(300, 2.3, 1, 10),
+                1000 * np.cos(tilt) + wave(300, 3.1, 2, 10),
+            ]
+            gyr = [wave(200, 2.9, phase, 5) for phase in (0, 1, 2)]
+            mag = [wave(400, 30, phase, 3) for phase in (0, 2, 4)]
+            values = acc + gyr + mag
+        else:
+            values = [wave(8000, period, 0, 50) for period in (7, 11, 13)]
+
+        words = np.column_stack(
+            [session_log.wrap_ticks(ticks, '<i2')]
+            + [np.clip(np.rint(value), -32768, 32767) for value in values]
+        ).astype('<i2')
+        return cls(stream, words)
+
+
+class SimulatedSensorTile(SensorTile):
+    """
+    SensorTile that replays streams instead of connecting to an ST.
+    Notifications start when the tile connects, and are only delivered for
+    the handles with started notifications.
+    """
+
+    def __init__(
+        self, streams: Sequence[ReplayStream], speed: Union[float, None] = 1,
+        raw: bool = True, repeat: bool = False,
+        address: str = "SIMULATED", start_time: Union[float, None] = None,
+        packing: Union[int, None] = None
+    ) -> None:
+        """
+        streams are the replayed streams, which share the ST clock
+        speed is the replay speed relative to real time, or None to replay
+        as fast as possible
+        raw sends GATT notifications through the notification callback,
+        so that packets are decoded. Otherwise, the replayed samples are put
+        into the queues directly.
+        repeat replays the streams in a loop until the tile disconnects.
+        start_time is the time.monotonic() value at which the first packet
+        is due, which allows aligning replays across processes. It defaults
+        to the time the tile connects.
+        packing is the number of samples per packed notification, for raw
+        replays, or None to send a notification per sample.
+        """
+        self.streams = list(streams)
+        self.speed = speed
+        self.raw = raw
+        self.repeat = repeat
+        self.start_time = start_time
+        self.packing = packing
+        # Set when a replay of every stream is complete.
+        self.replay_done = asyncio.Event()
+        super().__init__(address)
+
+    def _new_client(self) -> "_SimulatedClient":
+        """ Stand-in for the BleakClient that replays the streams. """
+        return _SimulatedClient(self)
+
+
+class _SimulatedClient:
+    """
+    Subset of the BleakClient interface used by SensorTile.
+    """
+
+    def __init__(self, tile: SimulatedSensorTile) -> None:
+        self.tile = tile
+        self.is_connected = False
+        self.notify = {}
+        self.task = None
+
+    async def connect(self, timeout: float = 10.0) -> bool:
+        self.is_connected = True
+        self.task = asyncio.create_task(self._replay())
+        return True
+
+    async def disconnect(self) -> bool:
+        if self.task is not None:
+            self.task.cancel()
+        if self.is_connected:
+            self.is_connected = False
+            self.tile._disconnected_callback(self)
+        return True
+
+    async def start_notify(self, char: int, callback: Callable) -> None:
+        self.notify[char] = callback
+
+    async def stop_notify(self, char: int) -> None:
+        self.notify.pop(char, None)
+
+    async def _replay(self) -> None:
+        """
+        Deliver the packets of every stream in the order of their time
+        stamps, paced by the time stamps at the replay speed.
+        """
+        tile = self.tile
+        streams = [stream for stream in tile.streams if len(stream)]
+        if not streams:
+            tile.replay_done.set()
+            return
+
+        def deliver(streams: List[ReplayStream]) -> list:
+            """ Payload and time stamp of every notification of streams. """
+            if tile.raw and tile.packing:
+                return [stream.packed(tile.packing) for stream in streams]
+            return [
+                (stream.ticks, stream.packets if tile.raw else stream.samples)
+                for stream in streams
+            ]
+
+        deliveries = deliver(streams)
+        payloads = [payload for _, payload in deliveries]
+
+        # Merge the streams into a single sequence of events.
+        ticks = np.concatenate([ticks for ticks, _ in deliveries])
+        sources = np.concatenate([
+            np.full(len(payload), index)
+            for index, payload in enumerate(payloads)
+        ])
+        rows = np.concatenate([np.arange(len(payload)) for payload in payloads])
+        order = np.argsort(ticks, kind='stable')
+        first = min(stream.ticks[0] for stream in streams)
+        delays = ((ticks[order] - first) * ST_TICK_PERIOD).tolist()
+        events = list(zip(sources[order].tolist(), rows[order].tolist()))
+        # Ticks of a whole replay, plus one packet, for repetitions.
+        span = int(max(stream.ticks[-1] for stream in streams) - first + 1)
+        duration = span * ST_TICK_PERIOD
+
+        queues = {
+            "environment": tile.environment_data,
+            "motion": tile.motion_data,
+            "quaternions": tile.quaternions_data,
+        }
+        handles = [stream.handle for stream in streams]
+        targets = [queues[stream.stream] for stream in streams]
+
+        # The loop time is time.monotonic().
+        loop = asyncio.get_running_loop()
+        start = tile.start_time if tile.start_time is not None \
+            else loop.time()
+        repetition = 0
+        while True:
+            for index, ((source, row), delay) in enumerate(
+                    zip(events, delays)):
+                if tile.speed:
+                    wait = start + delay / tile.speed - loop.time()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                elif index % 64 == 0:
+                    # Let consumers run when replaying as fast as possible.
+                    await asyncio.sleep(0)
+
+                handle = handles[source]
+                callback = self.notify.get(handle)
+                if callback is None:
+                    continue
+                if tile.raw:
+                    callback(handle, payloads[source][row])
+                else:
+                    targets[source].put_nowait(payloads[source][row])
+
+            tile.replay_done.set()
+            if not tile.repeat:
+                return
+            if tile.speed:
+                start += duration / tile.speed
+            else:
+                start = loop.time()
+
+            # Repetitions continue the time stamps of the previous one, so
+            # that the clock of the ST keeps increasing across replays
+            # longer than the wrap around of its time stamps.
+            repetition += 1
+            payloads = [payload for _, payload in deliver([
+                stream.shifted(repetition * span) for stream in streams
+            ])]
+
+
+def _encode(stream: str, columns: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Rebuild the GATT notifications of logged values.
+    """
+    words = []
+    for name, _ in ST_RAW_FIELDS[stream]:
+        column = np.asarray(columns[name])
+        if name.startswith("gyr_"):
+            # Gyroscope values are divided by 100 in the firmware.
+            column = column / 100
+        words.append(np.rint(column).astype(np.int64))
+    return np.column_stack(words).astype('<i2')
+
+
+def _decode(stream: str, words: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Decode GATT notifications into columns, the way the SensorTile decodes
+    them from the start of a session.
+    """
+    if stream == "environment":
+        return decode_environment_block(words)
+    if stream == "motion":
+        return decode_motion_block(words)
+    columns, _ = decode_quaternions_block(words, 1)
+    return columns
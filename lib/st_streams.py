@@ -0,0 +1,95 @@
+"""
+Non-blocking retrieval of the latest samples of several ST streams.
+
+Awaiting the queue of every stream in turn blocks the performance loop
+until each stream has a new sample, so the loop runs at the pace of the
+slowest stream. A StreamReader instead returns the latest sample of every
+enabled stream in a single call that never waits, together with whether it
+is new since the previous call and its staleness.
+"""
+
+# Python Libraries
+import asyncio
+import time
+from typing import Dict, NamedTuple, Sequence, Union
+
+# Local Files
+from constants import ST_HANDLES
+
+
+class StreamReading(NamedTuple):
+    """
+    Latest sample of a stream.
+    ticks is the time stamp of the sample
+    sample is the sample (see st_samples.py)
+    fresh is whether the sample was received since the previous reading
+    staleness is the age of the sample in seconds: the time since it would
+    have arrived with the fastest delivery (see st_clock.py), or None until
+    the clock of the stream is aligned
+    """
+    ticks: int
+    sample: object
+    fresh: bool
+    staleness: Union[float, None]
+
+    @property
+    def item(self) -> tuple:
+        """ (time stamp, sample) tuple, as retrieved from the queues. """
+        return self.ticks, self.sample
+
+
+class StreamReader:
+    """
+    Latest samples of the enabled streams of a SensorTile (or of a
+    RemoteSensorTile, see st_ingest.py). The last sample of every stream is
+    kept, so readings remain available while the ST reconnects.
+    """
+
+    def __init__(self, tile, streams: Sequence[str] = tuple(ST_HANDLES)
+                 ) -> None:
+        """
+        tile is the SensorTile whose queues are read
+        streams are the names of the enabled streams
+        """
+        self.tile = tile
+        self.streams = tuple(streams)
+        self.queues = {
+            stream: getattr(tile, f"{stream}_data") for stream in self.streams
+        }
+        self.clocks = {
+            stream: tile.clocks[ST_HANDLES[stream]] for stream in self.streams
+        }
+        self.last = dict.fromkeys(self.streams)
+
+    def read(self, host_time: Union[float, None] = None
+             ) -> Dict[str, Union[StreamReading, None]]:
+        """
+        Latest sample of every enabled stream, or None for streams without
+        any received sample. New samples are recorded as consumed by the
+        stream clocks at host_time, which defaults to now.
+        """
+        if host_time is None:
+            host_time = time.monotonic()
+        readings = {}
+        for stream, queue in self.queues.items():
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                item = None
+
+            clock = self.clocks[stream]
+            # None is put into the queues when the connection drops.
+            fresh = item is not None
+            if fresh:
+                self.last[stream] = item
+                staleness = clock.consumed(item[0], host_time)
+            elif self.last[stream] is not None:
+                item = self.last[stream]
+                staleness = clock.age(item[0], host_time)
+            else:
+                readings[stream] = None
+                continue
+            readings[stream] = StreamReading(
+                item[0], item[1], fresh, staleness
+            )
+        return readings
@@ -14,7 +14,7 @@ import pyo
 
 # Local Files
 from constants import BASE_MULT_OPTIONS, BPM_SUBDIVISIONS, SCALES, \
-    SUBDIVISION_OPTIONS, TONAL_CENTER_OPTIONS
+    SUBDIVISION_OPTIONS, SYNTH_FILTER_RANGE, TONAL_CENTER_OPTIONS
 
 
 class Synth():
@@ -90,10 +90,11 @@ class Synth():
 
         self._print_properties()
 
-        # Maps inputs between 0 and 1 to a range of 20Hz to 20kHz using
-        # a logarithmic scale.
+        # Maps inputs between 0 and 1 to a range of 200Hz to 20kHz using
+        # a logarithmic scale. The ST mappings use the same range (see
+        # ST_MAPPINGS in constants.py).
         # REF: http://ajaxsoundstudio.com/pyodoc/api/classes/map.html
-        self.filt_map = pyo.Map(200.0, 20000.0, 'log')
+        self.filt_map = pyo.Map(*SYNTH_FILTER_RANGE, 'log')
 
         # Create an envelope generator.
         self.amp_env = pyo.Adsr(attack=0.01,
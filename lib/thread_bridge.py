@@ -0,0 +1,101 @@
+"""
+Thread-safe handoff of the latest value of a worker thread (e.g., the frame
+thread of the Screen) to the asyncio event loop.
+
+Producers in any thread overwrite a pending value, and the event loop is
+woken up once per batch of values with call_soon_threadsafe(), instead of
+once per value, so that a fast producer cannot flood the loop with
+callbacks. In the loop, the latest value is delivered to a LatestValue cell
+(see latest_value.py), which consumers read or await.
+"""
+
+# Python Libraries
+import asyncio
+import threading
+import time
+from typing import Any, Union
+
+# Local Files
+from latest_value import LatestValue
+
+
+_NOTHING = object()
+
+
+class CoalescingBridge:
+    """
+    Latest value published by worker threads, delivered to the event loop.
+    'latest' is the LatestValue cell of the delivered values, whose time is
+    when each value was published.
+    published counts the values published, coalesced the values replaced
+    by a newer one before the loop delivered them, and deliveries the
+    wake-ups of the loop.
+    """
+
+    def __init__(self, loop: Union[asyncio.AbstractEventLoop, None] = None
+                 ) -> None:
+        """
+        loop is the event loop of the consumers, by default the running
+        loop, so the bridge must then be created in a coroutine.
+        """
+        self.loop = loop if loop is not None else asyncio.get_running_loop()
+        self.latest = LatestValue()
+        self.published = 0
+        self.coalesced = 0
+        self.deliveries = 0
+
+        self._lock = threading.Lock()
+        self._pending = _NOTHING
+        self._pending_time = 0.0
+        self._scheduled = False
+        self._closed = False
+
+    def publish(self, value: Any) -> None:
+        """
+        Replace the pending value, from any thread. The loop is only woken
+        up if no delivery is scheduled yet.
+        """
+        host_time = time.monotonic()
+        with self._lock:
+            if self._pending is not _NOTHING:
+                self.coalesced += 1
+            self._pending = value
+            self._pending_time = host_time
+            self.published += 1
+            if self._scheduled or self._closed:
+                return
+            self._scheduled = True
+        try:
+            self.loop.call_soon_threadsafe(self._deliver)
+        except RuntimeError:
+            # The loop is closed: values are no longer delivered.
+            self._closed = True
+
+    def _deliver(self) -> None:
+        """ Deliver the latest pending value, in the loop. """
+        with self._lock:
+            value, self._pending = self._pending, _NOTHING
+            host_time = self._pending_time
+            self._scheduled = False
+        if value is not _NOTHING:
+            self.deliveries += 1
+            self.latest.put_nowait(value, host_time)
+
+    def read(self) -> Any:
+        """ Latest delivered value, None before the first one. """
+        return self.latest.value
+
+    async def get(self) -> Any:
+        """ Latest delivered value, waiting for a new one if it was read. """
+        return await self.latest.get()
+
+    def close(self) -> None:
+        """ Stop waking up the loop, e.g., before it is closed. """
+        with self._lock:
+            self._closed = True
+
+    def report(self) -> str:
+        """ Counters for the console. """
+        return (f"{self.published} values published, "
+                f"{self.deliveries} delivered to the loop, "
+                f"{self.coalesced} coalesced")
@@ -7,18 +7,31 @@ audio DSP library.
 # Python Libraries
 import argparse
 import asyncio
+import json
 import signal
 import sys
+import time
 
 # Third-Party Libraries
 import numpy as np
 
 # Local Files
 sys.path.append('lib')
-from lib.constants import ST_FIRMWARE_NAME, ST_HANDLES, ST_SETTINGS
+from lib.constants import ST_ADDRESS_CACHE, ST_CALIBRATION_BINS, \
+    ST_CALIBRATION_RANGES, ST_CALIBRATION_SETTINGS, ST_FEATURE_SETTINGS, \
+    ST_FILTER_RESOLUTION, ST_FILTER_SETTINGS, ST_FIRMWARE_NAME, \
+    ST_HANDLES, ST_LOG_FIELDS, ST_LOG_RESOLUTION, ST_MAPPINGS, \
+    ST_NOTIFICATION_INTERVAL, ST_PROFILES, ST_SETTINGS
 from lib.cv_screen import Screen
-from lib.logger import Logger
-from lib.st_ble import find_st, SensorTile
+from lib.logger import Logger, LogWriter
+from lib.param_mapping import load_mappings, ParameterMapper
+from lib.st_ble import connect_cached
+from lib.st_calibration import load_profile, RangeCalibrator, save_profile
+from lib.st_features import MotionFeatures
+from lib.st_filters import FilterStage, make_filter
+from lib.st_ingest import RemoteSensorTile
+from lib.st_simulator import ReplayStream, SimulatedSensorTile
+from lib.st_streams import StreamReader
 from lib.synth import Synth
 
 
@@ -37,6 +50,49 @@ parser.add_argument('--cv', action=argparse.BooleanOptionalAction,
                     default=True, help="Computer vision toggle")
 parser.add_argument('--fps', action=argparse.BooleanOptionalAction,
                     default=False, help="Display FPS.")
+parser.add_argument('-nt', '--tiles',
+                    type=int, default=1,
+                    help="Number of SensorTiles to connect (e.g., one per hand).")
+parser.add_argument('--replay', nargs='*', default=None, metavar='LOG',
+                    help="Replay ST logs (CSV or stlog) instead of connecting "
+                         "to a SensorTile. Without logs, synthetic data is "
+                         "replayed in a loop.")
+parser.add_argument('--replay_speed', type=float, default=1.0,
+                    help="Replay speed relative to real time.")
+parser.add_argument('--ingest_process', action=argparse.BooleanOptionalAction,
+                    default=False,
+                    help="Receive and decode ST data in a separate process.")
+parser.add_argument('--capture', action=argparse.BooleanOptionalAction,
+                    default=False,
+                    help="Record every ST notification at full rate.")
+parser.add_argument('--smoothing', type=str, default="none",
+                    choices=["none", "ema", "one_euro", "median"],
+                    help="Smoothing filter of the ST motion values mapped "
+                         "to synth parameters.")
+parser.add_argument('--calibrate', action=argparse.BooleanOptionalAction,
+                    default=False,
+                    help="Calibrate the ranges of the ST motion values "
+                         "mapped to synth parameters while performing.")
+parser.add_argument('--performer', type=str, default=None,
+                    help="Name of the calibration profile to start from "
+                         "and to save.")
+parser.add_argument('--warmup', type=float,
+                    default=ST_CALIBRATION_SETTINGS["warmup"],
+                    help="Seconds of ST data before calibrated ranges "
+                         "are used.")
+parser.add_argument('--features', action=argparse.BooleanOptionalAction,
+                    default=False,
+                    help="Extract jerk, energy, angular velocity and tilt "
+                         "rate from every ST motion sample.")
+parser.add_argument('--mappings', type=str, default=None, metavar='JSON',
+                    help="Mappings of ST values to synth parameters, "
+                         "instead of ST_MAPPINGS in constants.py.")
+parser.add_argument('--metrics', action=argparse.BooleanOptionalAction,
+                    default=False,
+                    help="Print ST timing metrics every 10 seconds.")
+parser.add_argument('-lf', '--log_format',
+                    type=str, default="csv", choices=["csv", "stlog"],
+                    help="ST log format: CSV or binary session log.")
 
 # Synth Args
 parser.add_argument('-sr', '--sample_rate',
@@ -118,16 +174,30 @@ async def main():
     # Init SensorTile
     print("\n\n##### Initializing Controllers #####\n")
 
-    # Find ST address
-    st_address = await find_st(ST_FIRMWARE_NAME) if args.st else False
-
-    # Connect to SensorTile if an address was found.
-    if st_address:
-        print("\n\tInitializing SensorTile\n")
-        # Create a SensorTile object, and connect via
-        sensor_tile = SensorTile(st_address)
-        # Connect to ST
-        await sensor_tile.ble_connect()
+    # Connect to the requested number of STs concurrently, trying the
+    # addresses of the last session before scanning. Each SensorTile object
+    # has its own queues, so tiles[n] addresses the n-th ST.
+    tiles = []
+    st_start = time.monotonic()
+    if args.replay is not None:
+        # A simulated ST replays logs or synthetic data through the same
+        # queues, without Bluetooth.
+        print("\n\tInitializing simulated SensorTile\n")
+        streams = [ReplayStream.from_log(path) for path in args.replay] \
+            or [ReplayStream.synthetic(stream, 600) for stream in ST_HANDLES]
+        replay = {"streams": streams, "speed": args.replay_speed,
+                  "repeat": not args.replay}
+        tiles = [RemoteSensorTile("SIMULATED", replay=replay)] \
+            if args.ingest_process else [SimulatedSensorTile(**replay)]
+        await tiles[0].ble_connect()
+    elif args.st:
+        print("\n\tInitializing SensorTiles\n")
+        # Optionally, every ST is received and decoded in its own process,
+        # which publishes samples through shared memory (see st_ingest.py).
+        tiles = await connect_cached(
+            ST_FIRMWARE_NAME, args.tiles, ST_ADDRESS_CACHE,
+            tile_class=RemoteSensorTile if args.ingest_process else None
+        )
 
 
     # Init Computer Vision
@@ -154,18 +224,97 @@ async def main():
     # Get audio and log file path.
     out_path = synth.get_render_path()
 
-    if st_address:
+    if tiles:
         # Enable notifications of SensorTile data and create logger for
         # DataFrames containing SensorTile data from each activated handle.
+        # All loggers share a writer thread, so that writing to files does
+        # not block the performance loop.
+        log_writer = LogWriter()
+        # Loggers of every ST, keyed by stream.
+        st_dfls = []
+        tile_paths = []
+        # Latest sample of every stream of every ST, retrieved without
+        # waiting for any of them.
+        readers = []
+
+        for n, sensor_tile in enumerate(tiles):
+            # With several STs, the logs of each one are numbered.
+            tile_path = f"{out_path}_st{n}" if len(tiles) > 1 else out_path
+            tile_paths.append(tile_path)
+
+            dfls = {}
+            for stream, handle in ST_HANDLES.items():
+                await sensor_tile.start_notification(handle)
+                # The environment barely changes, so it is logged in delta
+                # mode.
+                dfls[stream] = Logger(
+                    f"{tile_path}_{stream}.{args.log_format}",
+                    ST_LOG_FIELDS[stream],
+                    writer=log_writer, stream=stream,
+                    resolution=ST_LOG_RESOLUTION.get(stream))
+            st_dfls.append(dfls)
+            readers.append(StreamReader(sensor_tile, ST_HANDLES))
+
+            # Record every notification of the enabled handles, independently
+            # of how often the performance loop retrieves data.
+            if args.capture:
+                sensor_tile.start_capture(tile_path, writer=log_writer)
+
+            # Smooth the motion values mapped to synth parameters, at the
+            # full notification rate.
+            if args.smoothing != "none":
+                fields = ('r', 'theta', 'phi')
+                sensor_tile.motion_filter = FilterStage(
+                    fields,
+                    make_filter(args.smoothing, len(fields),
+                                **ST_FILTER_SETTINGS[args.smoothing]),
+                    [ST_FILTER_RESOLUTION[field] for field in fields]
+                )
 
-        # await sensor_tile.start_notification(ST_HANDLES['environment'])
-        # environment_dfl = data_frame_logger(f"{out_path}_environment.csv")
-
-        await sensor_tile.start_notification(ST_HANDLES['motion'])
-        motion_dfl = Logger(f"{out_path}_motion.csv")
-
-        # await sensor_tile.start_notification(ST_HANDLES['quaternions'])
-        # quaternions_dfl = data_frame_logger(f"{out_path}_quaternions.csv")
+            # Update the motion features at the full notification rate.
+            if args.features:
+                sensor_tile.motion_features = MotionFeatures(
+                    **ST_FEATURE_SETTINGS)
+
+        # Calibrate the mapping ranges of the first ST from blocks of its
+        # buffered notifications, starting from the profile of the performer.
+        calibrator = None
+        if args.calibrate:
+            tiles[0].enable_packet_rings(('motion',))
+            rate = 1 / ST_NOTIFICATION_INTERVAL["motion"]
+            half_life = ST_CALIBRATION_SETTINGS["half_life"]
+            calibrator = RangeCalibrator(
+                ST_CALIBRATION_RANGES, ST_SETTINGS, ST_CALIBRATION_BINS,
+                ST_CALIBRATION_SETTINGS["low"],
+                ST_CALIBRATION_SETTINGS["high"],
+                warmup=round(args.warmup * rate),
+                half_life=half_life * rate if half_life else None,
+                profile=load_profile(ST_PROFILES, args.performer)
+                if args.performer else None
+            )
+
+        # Compile the mappings of ST values to synth parameters, reading the
+        # calibrated ranges when calibrating.
+        mapper = ParameterMapper(
+            load_mappings(args.mappings) if args.mappings else ST_MAPPINGS,
+            synth, calibrator.settings if calibrator is not None
+            else ST_SETTINGS
+        )
+        sources = {"r", "theta", "phi"}
+        if args.features:
+            sources.update(MotionFeatures.FIELDS)
+        if not mapper.sources <= sources:
+            raise ValueError("Unknown mapping sources: "
+                             f"{sorted(mapper.sources - sources)}")
+        # Values of the first ST read by the mappings.
+        mapped = {}
+
+        # Reconnect STs whose connection drops during the performance.
+        supervisors = [
+            asyncio.create_task(sensor_tile.supervise())
+            for sensor_tile in tiles
+        ]
+        print(f"\tSensorTiles ready in {time.monotonic() - st_start:.2f}s.")
 
     # Start recording of the new audio file.
     synth.server.recstart(f"{out_path}.wav")
@@ -181,72 +330,61 @@ async def main():
 
     print("\n\n##### Starting performance #####\n")
 
+    # Last motion data received from each ST.
+    motions = [None] * len(tiles)
+    next_metrics = time.monotonic() + 10
+
     # The running method of a keyboard listener returns a boolean depending
     # on whether the listener is running or not.
     while True:
         # Get and log ST data
-        if st_address:
-            # Get data from Queues, create data frames, and add to logger.
-
-            # environment = await sensor_tile.environment_data.get()
-            # environment_dataframe = environment_dfl.new_record(environment)
-            # await environment_dfl.add_record(environment_dataframe)
-
-            motion = await sensor_tile.motion_data.get()
-            motion_dataframe = motion_dfl.new_record(motion)
-            await motion_dfl.add_record(motion_dataframe)
-
-            # quaternions = await sensor_tile.quaternions_data.get()
-            # quaternions_dataframe = quaternions_dfl.new_record(quaternions)
-            # await quaternions_dfl.add_record(quaternions_dataframe)
+        if tiles:
+            # Get the latest data of every stream of every ST, without
+            # waiting for new data, and log the new samples. While an ST
+            # reconnects, the last received values are kept.
+            for n, reader in enumerate(readers):
+                readings = reader.read()
+                for stream, reading in readings.items():
+                    if reading is not None and reading.fresh:
+                        await st_dfls[n][stream].add_record(reading.item)
+                if readings['motion'] is not None:
+                    motions[n] = readings['motion']
+
+            if calibrator is not None:
+                calibrator.update_block(tiles[0].take_block('motion'))
+
+            if args.metrics and time.monotonic() >= next_metrics:
+                next_metrics += 10
+                for sensor_tile in tiles:
+                    for clock in sensor_tile.clocks.values():
+                        if clock.packets:
+                            print(f"\t{sensor_tile.address} {clock.report()}")
+                    if sensor_tile.motion_features is not None:
+                        print(f"\t{sensor_tile.address} "
+                              f"{sensor_tile.motion_features.report()}")
+                print("\tSynth parameter updates:")
+                print(mapper.report())
+
+        # The synth is controlled by the first ST. The data of the other
+        # STs is available as motions[n], and their motion features as
+        # tiles[n].motion_features (e.g., tiles[n].motion_features["jerk"]).
+        if motions and motions[0] is not None:
+            motion = motions[0].sample
+            if tiles[0].motion_filter is not None:
+                r, theta, phi = tiles[0].motion_filter.values
+            else:
+                r, theta, phi = motion.r, motion.theta, motion.phi
 
 
             #############################################
             ### Set Synth values from ST motion data. ###
             #############################################
 
-            # The magnitude of acceleration will control various parameters
-            # of the envelope generator, including attack, amplitude
-            # multiplier, and duration.
-            synth.amp_env.setAttack(float(np.interp(
-                motion[1]['r'],
-                (ST_SETTINGS["min_acc_magnitude"], ST_SETTINGS["max_acc_magnitude"]),
-                (synth.pulse_rate * 0.9, 0.01)
-            )))
-
-            synth.amp_env.setMul(float(np.interp(
-                motion[1]['r'],
-                (ST_SETTINGS["min_acc_magnitude"], ST_SETTINGS["max_acc_magnitude"]),
-                (0.25, 0.707)
-            )))
-
-            synth.amp_env.setDur(float(np.interp(
-                motion[1]['r'],
-                (ST_SETTINGS["min_acc_magnitude"], ST_SETTINGS["max_acc_magnitude"]),
-                (synth.pulse_rate * 0.9, 0.1)
-            )))
-
-            # Set the amplitude of the delay effect in the mixer.
-            synth.mixer.setAmp(1, 0, float(np.interp(
-                motion[1]['r'],
-                (ST_SETTINGS["min_acc_magnitude"], ST_SETTINGS["max_acc_magnitude"]),
-                (0.1, 0.5)
-            )))
-
-            # The polar angle controls the low-pass filter cutoff frequency.
-            synth.filt.setFreq(synth.filt_map.get(float(np.interp(
-                motion[1]['theta'],
-                (ST_SETTINGS["min_tilt"], ST_SETTINGS["max_tilt"]),
-                (0, 1)
-            ))))
-
-            # The Azimuth angle controls the balance of reverb's dry and wet
-            # signals (i.e., unaffected and affected signals respectively).
-            synth.reverb.setBal(float(np.interp(
-                motion[1]['phi'],
-                (ST_SETTINGS["min_azimuth"], ST_SETTINGS["max_azimuth"]),
-                (0, 0.707)
-            )))
+            # The mappings are described in ST_MAPPINGS (see constants.py).
+            mapped["r"], mapped["theta"], mapped["phi"] = r, theta, phi
+            if tiles[0].motion_features is not None:
+                mapped.update(tiles[0].motion_features)
+            mapper.apply(mapped)
 
         # Read image from the camera for processing and displaying it.
         # This includes all visual GUI controls.
@@ -257,46 +395,49 @@ async def main():
             ### Update Synth parameters based on CV controllers. ###
             ########################################################
 
-            # Update synth BPM if it changed in the GUI.
-            if synth.bpm != 60 / screen.bpm_slider.bpm:
-                synth.set_bpm(screen.bpm_slider.bpm)
-                # Apply new BPM to the pulsing rate.
-                synth.set_pulse_rate()
-
-            # Update synth subdivision it changed in the GUI.
-            if synth.subdivision != \
-               screen.subdivision_buttons.value:
-                synth.set_subdivision(screen.subdivision_buttons.value)
-                # Apply new subdivision to the pulsing rate.
-                synth.set_pulse_rate()
-
-            # Update synth octave base if it changed in the GUI.
-            if synth.base_key != screen.oct_base_buttons.value:
-                synth.set_base(
-                    synth.tonal_center,
-                    screen.oct_base_buttons.value
-                )
-                screen.oct_range_buttons.set_max_value(
-                    synth.base_mult_and_range[1]
-                )
-
-            # Update synth octave range if it changed in the GUI.
-            if synth.oct_range != screen.oct_range_buttons.value:
-                synth.set_oct_range(screen.oct_range_buttons.value)
-                # Apply new octave range to the scale. The first value of
-                # the scale tuple contains the name of the scale.
-                synth.set_scale(synth.scale[0])
-                # Because octave range has constrains based on the octave
-                # base, and the GUI element is unconstrained, it needs to
-                # be updated in case there was any truncation applied when
-                # updating the synth's octave range.
-                screen.oct_range_buttons.set_max_value(
-                    synth.base_mult_and_range[1]
-                )
-
-            # Update synth scale if it changed in the GUI.
-            if synth.scale[0] != screen.scales_menu.get_value():
-                synth.set_scale(screen.scales_menu.get_value())
+            # Control values handed over by the frame thread, only when a
+            # new frame was delivered.
+            controls = screen.new_controls()
+            if controls is not None:
+                # Update synth BPM if it changed in the GUI.
+                if synth.bpm != 60 / controls.bpm:
+                    synth.set_bpm(controls.bpm)
+                    # Apply new BPM to the pulsing rate.
+                    synth.set_pulse_rate()
+
+                # Update synth subdivision it changed in the GUI.
+                if synth.subdivision != controls.subdivision:
+                    synth.set_subdivision(controls.subdivision)
+                    # Apply new subdivision to the pulsing rate.
+                    synth.set_pulse_rate()
+
+                # Update synth octave base if it changed in the GUI.
+                if synth.base_key != controls.oct_base:
+                    synth.set_base(
+                        synth.tonal_center,
+                        controls.oct_base
+                    )
+                    screen.oct_range_buttons.set_max_value(
+                        synth.base_mult_and_range[1]
+                    )
+
+                # Update synth octave range if it changed in the GUI.
+                if synth.oct_range != controls.oct_range:
+                    synth.set_oct_range(controls.oct_range)
+                    # Apply new octave range to the scale. The first value of
+                    # the scale tuple contains the name of the scale.
+                    synth.set_scale(synth.scale[0])
+                    # Because octave range has constrains based on the octave
+                    # base, and the GUI element is unconstrained, it needs to
+                    # be updated in case there was any truncation applied when
+                    # updating the synth's octave range.
+                    screen.oct_range_buttons.set_max_value(
+                        synth.base_mult_and_range[1]
+                    )
+
+                # Update synth scale if it changed in the GUI.
+                if synth.scale[0] != controls.scale:
+                    synth.set_scale(controls.scale)
 
         # Update synth values. Numpy random module is used as opposed
         # to Python's 'random' library, since Numpy will compute random
@@ -320,21 +461,73 @@ async def main():
     synth.server.recstop()
     synth.stop_server()
 
-    # Stop ST
-    if st_address:
-        # Stop notification characteristics and write logs to .csv files.
-
-        # await sensor_tile.stop_notification(ST_HANDLES['environment'])
-        # await environment_dfl.write_log()
-
-        await sensor_tile.stop_notification(ST_HANDLES['motion'])
-        await motion_dfl.write_log()
-
-        # await sensor_tile.stop_notification(ST_HANDLES['quaternions'])
-        # await quaternions_dfl.write_log()
+    # The frame thread keeps running as a daemon, so stop it from waking up
+    # the event loop once it closes.
+    if screen:
+        screen.updates.close()
 
-        # Disconnect from ST.
-        await sensor_tile.ble_disconnect()
+    # Stop ST
+    if tiles:
+        # Stop reconnecting, stop notification characteristics and write
+        # logs to files.
+        for supervisor in supervisors:
+            supervisor.cancel()
+        captures = []
+        for n, sensor_tile in enumerate(tiles):
+            for stream, handle in ST_HANDLES.items():
+                await sensor_tile.stop_notification(handle)
+                await st_dfls[n][stream].write_log()
+
+            # Hand over the remaining captured notifications.
+            captures.append(await sensor_tile.stop_capture())
+
+        # Wait for the writer thread to finish pending writes.
+        if not await log_writer.close(timeout=5.0):
+            print("\tNot every record was written, see the reports below.")
+        for sensor_tile, dfls, capture in zip(tiles, st_dfls, captures):
+            for dfl in dfls.values():
+                print(f"\t{dfl.report()}")
+            if capture:
+                for stream, summary in capture.report().items():
+                    print(f"\tCaptured {stream}: {summary}")
+            if sensor_tile.unknown_notifications:
+                print(f"\tIgnored {sensor_tile.unknown_notifications} "
+                      "notifications from unregistered handles.")
+            if sensor_tile.malformed_notifications:
+                print(f"\tDropped {sensor_tile.malformed_notifications} "
+                      "malformed packed notifications.")
+            if sensor_tile.recoveries:
+                print(f"\tRecovered {sensor_tile.address} "
+                      f"{len(sensor_tile.recoveries)} times, in up to "
+                      f"{max(sensor_tile.recoveries):.2f}s.")
+            if sensor_tile.motion_filter is not None:
+                print(f"\t{sensor_tile.motion_filter.report()}")
+            if sensor_tile.motion_features is not None:
+                print(f"\t{sensor_tile.motion_features.report()}")
+        print("\tSynth parameter updates:")
+        print(mapper.report())
+        if calibrator is not None:
+            print(f"\t{calibrator.report()}")
+            if args.performer:
+                save_profile(ST_PROFILES, args.performer, calibrator.profile())
+
+        # Print and save the timing metrics of the enabled streams.
+        for sensor_tile, tile_path in zip(tiles, tile_paths):
+            clocks = [clock for clock in sensor_tile.clocks.values()
+                      if clock.packets]
+            for clock in clocks:
+                print(f"\t{clock.report()}")
+            with open(f"{tile_path}_clock.json", 'w') as metrics_file:
+                json.dump({
+                    "address": sensor_tile.address,
+                    "recoveries_s": sensor_tile.recoveries,
+                    "streams": [clock.summary() for clock in clocks],
+                }, metrics_file, indent=2)
+
+        # Disconnect from all STs.
+        await asyncio.gather(
+            *(sensor_tile.ble_disconnect() for sensor_tile in tiles)
+        )
 
     print("\n##### Performance Complete #####\n\n")
 